@@ -1,53 +1,259 @@
 # main.py
 import os
+import glob
+import shutil
 import argparse
+import json
+import functools
+import random
 # --- 수정된 부분: 모든 모듈을 'modules' 폴더에서 가져오도록 변경 ---
 from modules import config
+from modules import preprocess as preprocess_module
+from modules import vector_store as vector_store_module
+from modules import ingredient_index as ingredient_index_module
+from modules import quantized_index as quantized_index_module
+from modules import recipe_store, utils_docstore
 from modules.crawler import RecipeCrawler
-from modules.preprocess import DataPreprocessor
+from modules.preprocess import clean_crawl_file, merge_cleaned_files
 from modules.vector_store import VectorStoreManager
-from modules.retriever import AdvancedRetriever
 from modules.llm_handler import LLMHandler
+from modules.pipeline import Stage, Pipeline
+from modules.profiler import PipelineProfiler
+from modules.quantized_index import QuantizedIndex
+from modules import index_versions
+from modules.corpus import CorpusManager, get_corpus
 from langchain.storage import InMemoryStore # --- 추가된 부분 ---
 
-from modules.utils_docstore import register_parent_docs
+from modules.shared_store import create_backend
+from modules.scheduler import RequestScheduler
+from modules.streaming_ingest import StreamingIngestor
+
+# 크롤링할 페이지 구간 (시작 페이지, 끝 페이지)
+CRAWL_RANGES = [(1, 3), (11, 20), (21, 30), (31, 40), (41, 50), (51, 60)]
+
+
+def crawl_all(corpus):
+    os.makedirs(corpus.crawled_dir, exist_ok=True)
+    crawler = RecipeCrawler(search_query=corpus.search_query)
+    for start_page, end_page in CRAWL_RANGES:
+        crawler.run(start_page=start_page, end_page=end_page,
+                    output_filename=os.path.join(corpus.crawled_dir,
+                                                 f"{corpus.name}_recipes_{start_page}-{end_page}.json"))
+
+
+def build_index(corpus, parent_data_file, scheduler):
+    # 실행 중인 앱이 쓰는 DB는 건드리지 않고 새 버전 폴더에 만든 뒤 CURRENT를 교체
+    version = index_versions.create_version(corpus)
+    vectorstore = VectorStoreManager(persist_directory=version.chroma_path, scheduler=scheduler).build(
+        docstore=InMemoryStore(), json_path=parent_data_file)
+    if not vectorstore:
+        shutil.rmtree(version.path, ignore_errors=True)
+        raise RuntimeError("벡터 DB 구축에 실패했습니다.")
+    version.add_parents(parent_data_file)
+    version.add_file(corpus.ingredient_index_file)
+    index_versions.publish(version)
+    index_versions.gc_versions(corpus, backend=create_backend())
+
+
+def build_quantized_index(corpus, parent_data_file):
+    version = index_versions.resolve_version(corpus, parent_data_file)
+    if version is None:
+        raise RuntimeError("양자화할 색인 버전이 없습니다.")
+    if os.path.exists(version.quantized_path):
+        shutil.rmtree(version.quantized_path)
+    vectorstore = VectorStoreManager(persist_directory=version.chroma_path).load()
+    if QuantizedIndex.build_from_chroma(vectorstore, path=version.quantized_path) is None:
+        raise RuntimeError("양자화 색인 생성에 실패했습니다.")
+    # 같은 버전을 다시 배포해 실행 중인 앱이 양자화 색인까지 포함해 다시 불러오도록 함
+    if version.name != index_versions.LEGACY_VERSION:
+        index_versions.publish(version)
+
+
+def migrate_index_metadata(corpus, parent_data_file):
+    # 예전 방식(부모 메타데이터 전체 복사)으로 구축된 DB라면 한 번만 메타데이터를 축소
+    # (VACUUM까지 하므로 이 프로세스/앱에서 DB를 열기 전에 실행)
+    version = index_versions.resolve_version(corpus, parent_data_file)
+    if version is None:
+        return
+    vs_manager = VectorStoreManager(persist_directory=version.chroma_path)
+    if vs_manager.has_slim_metadata():
+        return
+    print(f"INFO: 색인 버전 '{version.name}'의 청크 메타데이터를 변환합니다. (실행 중인 앱이 있다면 먼저 종료하세요)")
+    docstore = InMemoryStore()
+    if version.parents_path:
+        utils_docstore.register_parent_docs(docstore, vs_manager._load_documents_from_json(version.parents_path))
+    vs_manager.migrate_chunk_metadata(docstore)
+
+
+# 양자화 리포트용 질문 형태 (사용자가 실제로 묻는 방식)
+QUESTION_TEMPLATES = ["{} 만드는 법 알려줘", "{} 레시피", "{} 어떻게 만들어?", "{}에 어떤 재료가 들어가?"]
+
+
+# 유료 임베딩 API를 다시 호출하고 새 색인 버전을 배포하는 단계 (--profile만으로는 강제 재실행하지 않음)
+PAID_STAGES = ("index", "quantize")
+
+
+def stages_to_force(stages, rebuild_db, profile):
+    """캐시와 상관없이 다시 실행할 단계 이름"""
+    if profile:
+        # 캐시를 쓴 단계는 측정할 수 없으므로 크롤링을 뺀 단계를 다시 실행하되,
+        # 색인/양자화는 --rebuild-db를 함께 줄 때만 (아니면 캐시 사용, 측정 안 함으로 표시)
+        return [stage.name for stage in stages if rebuild_db or stage.name not in PAID_STAGES]
+    return ["index"] if rebuild_db else []
+
+
+def title_index_updater(snapshot):
+    """스트리밍으로 색인된 레시피를 스냅샷의 제목 색인에 더하는 콜백 (제목 색인이 없으면 None)"""
+    title_index = snapshot.title_index
+    if title_index is None:
+        return None
+    return lambda doc: title_index.add(doc.metadata['doc_id'], doc.metadata['title'])
+
+
+def sample_questions(docstore, size=200, seed=0):
+    """색인된 레시피 중 일부의 제목으로 질문을 만듭니다. (저장된 청크 벡터가 아닌 새 질문 임베딩으로 recall 측정)"""
+    doc_ids = sorted(docstore.yield_keys())
+    picked = random.Random(seed).sample(doc_ids, min(size, len(doc_ids)))
+    titles = [doc.metadata.get('title', '') for doc in docstore.mget(picked) if doc is not None]
+    return [QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(title) for i, title in enumerate(titles) if title]
+
+
+def count_recipes(*paths):
+    """JSON 레시피 파일들의 레시피 수 (프로파일링 시 단계별 처리량 계산용)"""
+    total = 0
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                total += len(json.load(f))
+    return total
+
+
+def preprocess_stages(corpus, compact_store):
+    """크롤링 파일별 정제(병렬) → 병합/중복 제거 단계를 만듭니다."""
+    crawl_files = sorted(glob.glob(os.path.join(corpus.crawled_dir, '*.json')))
+    stages, cleaned_files = [], []
+    for path in crawl_files:
+        cleaned_path = os.path.join(corpus.cleaned_dir, os.path.basename(path))
+        cleaned_files.append(cleaned_path)
+        stages.append(Stage(
+            f"clean:{os.path.basename(path)}",
+            functools.partial(clean_crawl_file, path, cleaned_path),
+            inputs=[path], outputs=[cleaned_path], code=[preprocess_module]
+        ))
+
+    outputs = [corpus.merged_file, corpus.ingredient_index_file]
+    if compact_store:
+        outputs.append(corpus.record_file)
+    stages.append(Stage(
+        "preprocess",
+        functools.partial(
+            merge_cleaned_files, cleaned_files, corpus.merged_file,
+            record_filepath=corpus.record_file if compact_store else None,
+            ingredient_index_filepath=corpus.ingredient_index_file
+        ),
+        inputs=cleaned_files, outputs=outputs,
+        params={'similarity_threshold': config.SIMILARITY_THRESHOLD, 'compact_store': compact_store},
+        code=[preprocess_module, recipe_store, ingredient_index_module],
+        deps=[stage.name for stage in stages],
+        items=functools.partial(count_recipes, *cleaned_files)
+    ))
+    return stages
+
 
 # --- 추가/수정된 부분 ---
-def main(rebuild_db: bool, until_step: str):
+def main(rebuild_db: bool, until_step: str, compact_store: bool = False, dry_run: bool = False,
+         quantize_report: bool = False, stream: bool = False, corpus_name: str = None,
+         profile: bool = False, profile_cprofile: bool = False):
     """
     QA 엔진의 전체 실행 흐름을 제어하는 메인 함수.
+    각 단계는 입력 내용/설정/코드가 바뀐 경우에만 다시 실행됩니다.
+    stream=True이면 크롤링을 미리 끝내지 않고, 대화하는 동안 새 레시피를 바로 색인에 추가합니다.
+    corpus_name으로 크롤링/색인할 레시피 모음을 고르며, 대화 중에는 질문마다 알맞은 모음으로 검색합니다.
+    profile=True이면 크롤링을 뺀 단계를 캐시와 상관없이 다시 실행하며 시간/메모리/처리량을 재서 리포트로 저장합니다.
+    임베딩 API를 호출하고 새 버전을 배포하는 색인/양자화 단계는 rebuild_db=True일 때만 다시 실행합니다.
     """
-    # 1. 크롤링
-    if not os.path.exists(config.CRAWLED_DATA_DIR) or not os.listdir(config.CRAWLED_DATA_DIR):
-        print("--- 1. 데이터 크롤링 시작 ---")
-        os.makedirs(config.CRAWLED_DATA_DIR, exist_ok=True)
-        crawler = RecipeCrawler()
-        crawler.run(start_page=1, end_page=3, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_1-3.json"))
-        crawler.run(start_page=11, end_page=20, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_11-20.json"))
-        crawler.run(start_page=21, end_page=30, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_21-30.json"))
-        crawler.run(start_page=31, end_page=40, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_31-40.json"))
-        crawler.run(start_page=41, end_page=50, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_41-50.json"))
-        crawler.run(start_page=51, end_page=60, output_filename=os.path.join(config.CRAWLED_DATA_DIR, "baek_recipes_51-60.json"))
+    corpus = get_corpus(corpus_name)
+    if len(config.CORPORA) > 1:
+        print(f"INFO: '{corpus.name}' 모음('{corpus.search_query}' 검색 결과)을 처리합니다.")
+    profiler = PipelineProfiler(use_cprofile=profile_cprofile) if profile or profile_cprofile else None
+    # 1. 크롤링 (재현할 수 없는 작업이므로 결과 파일이 있으면 그대로 사용)
+    print("--- 1. 데이터 크롤링 ---")
+    if stream:
+        print("INFO: 스트리밍 모드에서는 크롤링을 질문을 받는 동안 백그라운드에서 진행합니다.")
+        crawl_pending = []
     else:
-        print(f"--- 1. 크롤링 건너뛰기 ('{config.CRAWLED_DATA_DIR}' 폴더에 파일이 이미 존재합니다) ---")
+        crawl_stage = Stage("crawl", functools.partial(crawl_all, corpus), outputs=[corpus.crawled_dir],
+                            params={'ranges': CRAWL_RANGES, 'search_query': corpus.search_query},
+                            trust_existing_outputs=True)
+        crawl_pending = Pipeline([crawl_stage], cache_dir=corpus.pipeline_cache_dir,
+                                 profiler=profiler).run(dry_run=dry_run)
 
     # 'crawl' 단계까지만 실행하는 옵션 확인
     if until_step == 'crawl':
+        if profiler is not None:
+            profiler.report()
         print("\nSUCCESS: 'crawl' 단계까지 실행이 완료되었습니다.")
         return
+    if dry_run and crawl_pending:
+        print("INFO: 크롤링 후에 이어지는 모든 단계가 다시 만들어질 예정입니다.")
+        return
 
-    # 2. 데이터 전처리
-    preprocessing_needed = not os.path.exists(config.MERGED_PREPROCESSED_FILE)
-    if preprocessing_needed:
-        print("\n--- 2. 데이터 전처리 시작 ---")
-        preprocessor = DataPreprocessor()
-        success = preprocessor.run(config.CRAWLED_DATA_DIR, config.MERGED_PREPROCESSED_FILE)
-        
-        if not success:
-            print("CRITICAL: 데이터 전처리에 실패하여 프로그램을 종료합니다.")
-            return
-    else:
-        print(f"--- 2. 전처리 건너뛰기 ('{config.MERGED_PREPROCESSED_FILE}' 파일이 이미 존재합니다) ---")
+    # 2. 데이터 전처리 (크롤링 파일별 정제는 병렬 실행)
+    print("\n--- 2. 데이터 전처리 ---")
+    stages = preprocess_stages(corpus, compact_store)
+    # --compact-store 옵션이면 부모 문서를 압축 레코드 파일에서 읽음
+    parent_data_file = corpus.record_file if compact_store else corpus.merged_file
+    if until_step == 'run':
+        # 스케줄러 사용 시 임베딩/LLM 호출이 하나의 요청 예산을 함께 사용
+        scheduler = RequestScheduler.from_config() if config.USE_REQUEST_SCHEDULER else None
+        stages.append(Stage(
+            "index",
+            functools.partial(build_index, corpus, parent_data_file, scheduler),
+            inputs=[parent_data_file],
+            outputs=[index_versions.current_path('chroma_path', corpus, parent_data_file)],
+            params={'chunk_size': config.CHUNK_SIZE, 'chunk_overlap': config.CHUNK_OVERLAP,
+                    'embedding_model': 'solar-embedding-1-large-passage',
+                    'chunk_dedup': config.USE_CHUNK_DEDUP, 'chunk_dedup_max_hamming': config.CHUNK_DEDUP_MAX_HAMMING},
+            code=[utils_docstore, vector_store_module],
+            deps=["preprocess"],
+            items=functools.partial(count_recipes, corpus.merged_file)
+        ))
+        if config.USE_QUANTIZED_INDEX or quantize_report:
+            # 벡터 DB 단계의 manifest(fingerprint)가 바뀌었을 때만 다시 양자화
+            stages.append(Stage(
+                "quantize",
+                functools.partial(build_quantized_index, corpus, parent_data_file),
+                inputs=[os.path.join(corpus.pipeline_cache_dir, "index.json")],
+                outputs=[index_versions.current_path('quantized_path', corpus, parent_data_file)],
+                code=[quantized_index_module],
+                deps=["index"]
+            ))
+    try:
+        if stream and not glob.glob(os.path.join(corpus.crawled_dir, '*.json')):
+            # 처음 실행하는 스트리밍 모드: 빈 벡터 DB에서 시작해 수집되는 대로 채움
+            if until_step != 'run':
+                print("INFO: 크롤링 결과가 없어 전처리할 레시피가 없습니다.")
+            else:
+                print("INFO: 크롤링 결과가 없어 빈 벡터 DB에서 스트리밍 수집을 시작합니다.")
+            if until_step == 'run' and index_versions.resolve_version(corpus, parent_data_file) is None:
+                version = index_versions.create_version(corpus)
+                os.makedirs(version.chroma_path)
+                index_versions.publish(version)
+            rebuilt = []
+        else:
+            forced = stages_to_force(stages, rebuild_db, profile=profiler is not None)
+            rebuilt = Pipeline(stages, cache_dir=corpus.pipeline_cache_dir, profiler=profiler).run(
+                dry_run=dry_run, force=forced)
+    except Exception as e:
+        print(f"CRITICAL: 파이프라인 실행에 실패하여 프로그램을 종료합니다: {e}")
+        if profiler is not None:
+            profiler.report()  # 실패 전까지 끝난 단계의 측정 결과
+        return
+    if profiler is not None and profiler.report() is None and not dry_run:
+        print("INFO: 실행된 단계가 없어 프로파일 결과가 없습니다.")
+    if dry_run:
+        print(f"\nINFO: (dry-run) 다시 만들어질 단계: {', '.join(rebuilt) if rebuilt else '없음'}")
+        return
 
     # 'preprocess' 단계까지만 실행하는 옵션 확인
     if until_step == 'preprocess':
@@ -56,41 +262,69 @@ def main(rebuild_db: bool, until_step: str):
 
     # --- 이하 코드는 until_step == 'run' 일 때만 실행됩니다. ---
     
-    # 3. 벡터 DB 구축 또는 로드
+    # 3. 벡터 DB 로드 (질문 검색에는 'query' 모델 사용)
     print("\n--- 3. 벡터 DB 준비 시작 ---")
-    vs_manager = VectorStoreManager()
-    
-    # --- 수정된 부분: DB 구축 시 ParentDocumentRetriever를 위한 준비를 함께 진행 ---
-    docstore = InMemoryStore() # 부모 문서를 메모리에 저장할 공간 생성
+    migrate_index_metadata(corpus, parent_data_file)
+    # 공유 백엔드가 설정되어 있으면 부모 문서를 여러 워커가 함께 쓰는 저장소에 보관
+    backend = create_backend()
+    # 모음별 CURRENT가 가리키는 색인 버전을 처음 쓰일 때 불러오고, 새 버전이 배포되면 백그라운드에서 교체
+    # (메모리 한도를 넘으면 가장 오래 안 쓴 모음부터 내림)
+    # 스트리밍 수집 중인 모음은 배포된 버전 대신 작업용 복사본을 불러오고, 새 버전으로 바뀌면 수집기도 옮김
+    ingestor = None
 
-    if rebuild_db or not os.path.exists(config.CHROMA_DB_PATH):
-        if rebuild_db: print("INFO: --rebuild-db 옵션에 따라 DB를 새로 구축합니다.")
-        # build 함수에 docstore를 넘겨주어 부모-자식 문서를 함께 처리하도록 함
-        vectorstore = vs_manager.build(docstore=docstore, json_path=config.MERGED_PREPROCESSED_FILE)
-    else:
-        # DB를 로드할 때는, 원본 문서를 읽어와서 docstore를 채워줘야 함
-        # (InMemoryStore는 휘발성이므로 프로그램을 켤 때마다 채워야 함)
-        vectorstore = vs_manager.load()
-        parent_documents = vs_manager._load_documents_from_json(config.MERGED_PREPROCESSED_FILE)
-        register_parent_docs(docstore, parent_documents) # docstore에 부모 문서 저장
+    def move_ingestor(name, new_snapshot):
+        if ingestor is not None and name == corpus.name:
+            ingestor.retarget(new_snapshot.vectorstore, new_snapshot.docstore,
+                              on_indexed=title_index_updater(new_snapshot))
 
-    if not vectorstore:
-        print("CRITICAL: 벡터 DB 준비에 실패하여 프로그램을 종료합니다.")
+    corpora = CorpusManager(
+        functools.partial(index_versions.load_snapshot, scheduler=scheduler, backend=backend),
+        default=corpus.name, in_memory_docstore=backend is None, legacy_parents=parent_data_file,
+        writable=[corpus.name] if stream else (), on_swap=move_ingestor
+    )
+    try:
+        snapshot = corpora.get(corpus.name)
+    except Exception as e:
+        print(f"CRITICAL: 벡터 DB 준비에 실패하여 프로그램을 종료합니다: {e}")
         return
+    print(f"INFO: 색인 버전 '{(snapshot.version.source or snapshot.version).name}'을(를) 사용합니다.")
 
-    # 4. Advanced RAG 리트리버 설정
+    if quantize_report:
+        quantized = QuantizedIndex.load(snapshot.version.quantized_path)
+        if quantized is not None:
+            # 색인에 없는 실제 질문을 'query' 모델로 임베딩해 원본 대비 품질/비용을 비교
+            questions = sample_questions(snapshot.docstore)
+            print(f"INFO: 레시피 제목으로 만든 질문 {len(questions)}개를 임베딩합니다. (예: '{questions[0]}')")
+            query_vectors = snapshot.vectorstore.embeddings.embed_documents(questions)
+            quantized_index_module.report(quantized, query_vectors, chroma_path=snapshot.version.chroma_path)
+    if snapshot.quantized is not None:
+        print(f"INFO: 양자화 색인({config.QUANTIZATION_MODE})으로 자식 청크를 검색합니다.")
+        if stream:
+            print("WARNING: 스트리밍으로 추가되는 레시피는 양자화 색인을 다시 만들기 전까지 검색되지 않습니다.")
+
+    # 4. Advanced RAG 리트리버 설정 (재료 색인 → ParentDocumentRetriever, 버전 교체 가능)
     print("\n--- 4. RAG 리트리버 설정 ---")
-    # --- 수정된 부분: retriever에 docstore를 넘겨주고, add_documents 호출 삭제! ---
-    adv_retriever = AdvancedRetriever(vectorstore, docstore)
-    retriever = adv_retriever.get_retriever()
     print("INFO: ParentDocumentRetriever 설정 완료.")
-    # retriever.add_documents(docs_for_retriever) # 👈 문제가 됐던 이 라인을 삭제!
     
     # 5. LLM 핸들러 및 RAG 체인 생성
     print("\n--- 5. QA 엔진(LLM) 초기화 ---")
-    llm_handler = LLMHandler(retriever=retriever)
+    # 요리 이름만 묻는 질문은 제목 색인으로 LLM 없이 바로 답변
+    llm_handler = LLMHandler(backend=backend, scheduler=scheduler, corpora=corpora)
     qa_chain = llm_handler.create_rag_chain()
     print("SUCCESS: 백종원 레시피 QA 엔진이 준비되었습니다!")
+    if len(config.CORPORA) > 1:
+        print(f"INFO: 레시피 모음 {', '.join(corpora.available())} 중 질문에 맞는 모음에서 검색합니다. "
+              f"(기본: '{corpus.name}')")
+
+    if stream:
+        # 수집된 레시피는 바로 작업용 복사본의 벡터 DB/docstore/제목 색인에 들어가 다음 질문부터 검색됨
+        # (배포된 버전에는 들어가지 않으며, 종료할 때 저장한 원본이 다음 배치 실행 때 반영됨)
+        ingestor = StreamingIngestor(snapshot.vectorstore, snapshot.docstore,
+                                     VectorStoreManager(scheduler=scheduler).doc_embedding,
+                                     crawler=RecipeCrawler(search_query=corpus.search_query),
+                                     on_indexed=title_index_updater(snapshot))
+        ingestor.start(CRAWL_RANGES)
+        print("INFO: 스트리밍 수집을 시작했습니다. 수집된 레시피는 몇 초 안에 검색됩니다.")
 
     # 6. 대화형 QA 세션 시작
     print("\n--- 안녕하세요! 백주부입니다. 뭐든 물어보셔유 (종료하려면 '그만') ---")
@@ -101,15 +335,21 @@ def main(rebuild_db: bool, until_step: str):
             user_input = input("🤔 질문: ")
             if user_input.lower() == '그만':
                 print("\n다음에 또 찾아주셔유! 맛있게 해드세유~")
+                for name in corpora.loaded():
+                    title_index = corpora.get(name).title_index
+                    if title_index is not None:
+                        print(f"INFO: '{name}' 빠른 경로 통계 {title_index.stats.summary()}")
+                print(f"INFO: LLM 호출 통계 {llm_handler.llm_client.summary()}")
                 break
             
-            response = qa_chain.invoke(
+            # 답변은 생성되는 대로 조각씩 출력
+            print("\n백주부 💬:")
+            for chunk in qa_chain.stream(
                 {"input": user_input},
                 config={"configurable": {"session_id": session_id}}
-            )
-            
-            print("\n백주부 💬:")
-            print(response['answer'])
+            ):
+                print(chunk.get('answer', ''), end="", flush=True)
+            print()
             print("-" * 50)
             
         except KeyboardInterrupt:
@@ -118,6 +358,13 @@ def main(rebuild_db: bool, until_step: str):
         except Exception as e:
             print(f"\nERROR: 죄송해유, 처리 중에 문제가 생겼어유: {e}")
 
+    if ingestor is not None:
+        print("INFO: 스트리밍 수집을 마무리하는 중입니다...")
+        ingestor.stop()
+        ingestor.summary()
+        ingestor.save_collected(corpus.crawled_dir, prefix=corpus.name)
+        corpora.close()  # 작업용 복사본 정리
+
 if __name__ == '__main__':
     # --- 추가/수정된 부분: 실행 옵션 추가 ---
     parser = argparse.ArgumentParser(description="백종원 레시피 QA 엔진")
@@ -133,9 +380,50 @@ if __name__ == '__main__':
         default='run',
         help="실행할 마지막 단계를 지정합니다: crawl, preprocess, run (전체 실행)"
     )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help="실행하지 않고 어떤 단계가 다시 만들어질지만 보여줍니다."
+    )
+    parser.add_argument(
+        '--quantize-report',
+        action='store_true',
+        help="양자화 색인을 만들고 원본 대비 메모리/디스크/지연 시간/recall@k를 출력합니다."
+    )
+    parser.add_argument(
+        '--compact-store',
+        action='store_true',
+        help="전처리 결과를 압축 레코드 형식(.rec)으로도 저장하고, 부모 문서를 이 파일에서 읽습니다."
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="크롤링 → 정제 → 청크 → 임베딩 → 색인을 동시에 진행하며, 수집한 레시피를 대화 중에 바로 검색할 수 있게 합니다."
+    )
+    parser.add_argument(
+        '--corpus',
+        type=str,
+        choices=list(config.CORPORA),
+        default=config.DEFAULT_CORPUS,
+        help="크롤링/전처리/색인할 레시피 모음 (CORPORA 환경 변수로 설정, 대화 중에는 질문에 맞는 모음을 자동 선택)"
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="크롤링을 뺀 단계를 캐시와 상관없이 다시 실행하며 wall/CPU 시간, 최대 메모리(tracemalloc/RSS), "
+             "처리량과 세부 작업 시간을 재서 profile_reports/에 저장합니다. 임베딩을 다시 계산하는 색인/양자화 단계는 "
+             "--rebuild-db를 함께 줄 때만 다시 실행하고, 아니면 캐시를 써서 측정하지 않은 단계로 표시합니다."
+    )
+    parser.add_argument(
+        '--profile-cprofile',
+        action='store_true',
+        help="--profile에 더해 단계별 cProfile 결과(.prof)와 누적 시간 상위 함수를 리포트에 포함합니다."
+    )
     args = parser.parse_args()
     
-    main(rebuild_db=args.rebuild_db, until_step=args.until_step)
+    main(rebuild_db=args.rebuild_db, until_step=args.until_step, compact_store=args.compact_store,
+         dry_run=args.dry_run, quantize_report=args.quantize_report, stream=args.stream,
+         corpus_name=args.corpus, profile=args.profile, profile_cprofile=args.profile_cprofile)
 
 
 # 가상환경 활성화 source myenv/bin/activate
\ No newline at end of file
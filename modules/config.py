@@ -14,8 +14,101 @@ UPSTAGE_API_KEY = os.getenv("UPSTAGE_API_KEY")
 CRAWLED_DATA_DIR = os.path.join(project_root, "crawled_data")
 PREPROCESSED_DATA_DIR = os.path.join(project_root, "preprocessed_data")
 MERGED_PREPROCESSED_FILE = os.path.join(PREPROCESSED_DATA_DIR, "all_recipes_cleaned.json")
-CHROMA_DB_PATH = os.path.join(project_root, "chroma_db")
+# 압축 레코드 형식 (combined_text 미저장, id 인덱스로 임의 접근 가능)
+MERGED_RECORD_FILE = os.path.join(PREPROCESSED_DATA_DIR, "all_recipes_cleaned.rec")
+# 재료 → 레시피 역색인 ("감자랑 양파로 뭐 만들지?" 같은 질문용)
+INGREDIENT_INDEX_FILE = os.path.join(PREPROCESSED_DATA_DIR, "ingredient_index.json")
+CHROMA_DB_PATH = os.path.join(project_root, "chroma_db")  # 버전 관리 도입 전 DB 위치 (CURRENT가 없을 때만 사용)
+
+# --- 색인 버전 관리 (버전별 폴더 + CURRENT 포인터, 실행 중인 앱은 새 버전을 백그라운드에서 불러와 교체) ---
+INDEX_VERSIONS_DIR = os.path.join(project_root, "index_versions")
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))  # 현재 버전 포함 남겨둘 버전 수
+INDEX_POLL_INTERVAL = float(os.getenv("INDEX_POLL_INTERVAL", "5"))  # 새 버전 확인 주기(초)
+INDEX_LEASE_TTL = float(os.getenv("INDEX_LEASE_TTL", "600"))  # 이 시간 동안 갱신이 없는 사용 표시는 무시
+
+# --- 레시피 모음(corpus) 설정 ---
+# "이름=검색어" 목록. 기본 모음(DEFAULT_CORPUS)은 위의 기존 경로를 그대로 쓰고,
+# 나머지는 corpora/<이름>/ 아래에 크롤링/전처리/색인 폴더를 따로 둡니다.
+# 예) CORPORA="baek=백종원,lee=이연복"
+CORPORA = dict(
+    (name.strip(), query.strip()) for name, query in
+    (item.split("=", 1) for item in os.getenv("CORPORA", "baek=백종원").split(",") if "=" in item)
+    if name.strip() and query.strip()
+)
+if not CORPORA:
+    raise ValueError(f"CORPORA 설정에 '이름=검색어' 항목이 없습니다: {os.getenv('CORPORA')!r} "
+                     "(예: CORPORA=\"baek=백종원,lee=이연복\")")
+DEFAULT_CORPUS = os.getenv("DEFAULT_CORPUS") or next(iter(CORPORA))
+if DEFAULT_CORPUS not in CORPORA:
+    raise ValueError(f"DEFAULT_CORPUS '{DEFAULT_CORPUS}'가 CORPORA에 없습니다. (CORPORA={list(CORPORA)})")
+# 모음별 답변 페르소나 "이름=인물" 목록. 없는 모음은 중립적인 요리 도우미 말투로 답변합니다.
+# 예) CORPUS_PERSONAS="baek=백종원,lee=이연복"
+CORPUS_PERSONAS = dict(
+    (name.strip(), persona.strip()) for name, persona in
+    (item.split("=", 1) for item in os.getenv("CORPUS_PERSONAS", "baek=백종원").split(",") if "=" in item)
+    if name.strip() and persona.strip()
+)
+CORPORA_DIR = os.path.join(project_root, "corpora")
+CORPUS_MEMORY_BUDGET_MB = float(os.getenv("CORPUS_MEMORY_BUDGET_MB", "2048"))  # 동시에 메모리에 올릴 색인 크기 한도
+INDEX_RELEASE_GRACE = float(os.getenv("INDEX_RELEASE_GRACE", "30"))  # 내린 색인의 Chroma 연결을 닫기 전 진행 중인 요청을 기다리는 시간(초)
+
+# --- 파이프라인 단계별 캐시 (입력/설정/코드 해시 manifest, 파일별 정제 중간 결과) ---
+PIPELINE_CACHE_DIR = os.path.join(project_root, ".pipeline_cache")
+CLEANED_DATA_DIR = os.path.join(PIPELINE_CACHE_DIR, "cleaned")
+# --profile 실행 시 단계별 시간/메모리 리포트와 cProfile 결과를 저장할 폴더
+PROFILE_DIR = os.path.join(project_root, "profile_reports")
+
+# --- 자식 청크 분할 설정 ---
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 60
+# 임베딩 전에 내용이 같거나 거의 같은 자식 청크를 하나로 합침 (SimHash 해밍 거리 기준)
+USE_CHUNK_DEDUP = os.getenv("USE_CHUNK_DEDUP", "true").lower() == "true"
+CHUNK_DEDUP_MAX_HAMMING = int(os.getenv("CHUNK_DEDUP_MAX_HAMMING", "3"))  # 0이면 완전히 같은 청크만 합침
+EMBEDDING_DIM = 4096  # solar-embedding-1-large 벡터 차원 (절약된 색인 크기 추정용)
 
 # --- 추가된 부분: 중복 제거를 위한 유사도 임계값 ---
 # 0.0 (완전 다름) ~ 1.0 (완전 같음). 0.75는 "꽤 비슷하면 중복으로 보자"는 뜻.
-SIMILARITY_THRESHOLD = 0.75
\ No newline at end of file
+SIMILARITY_THRESHOLD = 0.75
+
+# --- 스트리밍 수집 (크롤링 → 정제 → 중복 확인 → 청크 → 임베딩 → 색인을 동시에 진행) ---
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))  # 단계 사이 큐 크기 (가득 차면 앞 단계가 기다림)
+STREAM_EMBED_BATCH_SIZE = int(os.getenv("STREAM_EMBED_BATCH_SIZE", "64"))  # 한 번에 임베딩할 최대 청크 수
+STREAM_EMBED_BATCH_WINDOW = float(os.getenv("STREAM_EMBED_BATCH_WINDOW", "0.5"))  # 청크를 모으는 최대 시간(초)
+STREAM_EMBED_RETRIES = int(os.getenv("STREAM_EMBED_RETRIES", "3"))  # 임베딩 실패 시 다시 시도할 횟수
+STREAM_EMBED_RETRY_DELAY = float(os.getenv("STREAM_EMBED_RETRY_DELAY", "1"))  # 첫 재시도 전 대기 시간(초, 매번 두 배)
+
+# --- 여러 워커가 공유하는 대화 기록/답변 캐시/docstore 저장소 ---
+# 'memory'(프로세스 내부, 기본값) | 'sqlite'(로컬 파일 공유) | 'redis'
+SHARED_STORE_BACKEND = os.getenv("SHARED_STORE_BACKEND", "memory")
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH", os.path.join(project_root, "shared_store", "store.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+# --- LLM 호출 안정화 (호출별 deadline, 헤지 요청, 차단기, 제공자 failover) ---
+# "종류:모델" 목록을 순서대로 시도 (upstage | openai). API 키가 없는 제공자는 건너뜀
+LLM_PROVIDERS = [item.strip() for item in os.getenv("LLM_PROVIDERS", "upstage:solar-pro2").split(",") if item.strip()]
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # 호출 하나의 최대 대기 시간(초)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # 이 백분위 지연을 넘으면 헤지 요청 (0이면 끔)
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "5"))  # 헤지 요청 전 최소 대기 시간(초)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))  # 연속 실패가 이만큼 쌓이면 제공자 차단
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # 차단 후 다시 시험하기까지(초)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))  # 제공자 하나에 동시에 보낼 수 있는 요청 수
+
+# --- LLM/임베딩 요청 스케줄러 (마이크로 배칭 + 전역 요청/토큰 예산) ---
+USE_REQUEST_SCHEDULER = os.getenv("USE_REQUEST_SCHEDULER", "false").lower() == "true"
+SCHEDULER_REQUESTS_PER_MINUTE = int(os.getenv("SCHEDULER_REQUESTS_PER_MINUTE", "100"))
+SCHEDULER_TOKENS_PER_MINUTE = int(os.getenv("SCHEDULER_TOKENS_PER_MINUTE", "0"))  # 0이면 토큰 제한 없음
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "4"))
+EMBEDDING_BATCH_WINDOW = float(os.getenv("EMBEDDING_BATCH_WINDOW", "0.02"))  # 질문 임베딩을 모으는 시간(초)
+
+# --- 자식 청크 벡터 양자화 색인 (int8/binary 후보 검색 + 원본 벡터 rescore) ---
+USE_QUANTIZED_INDEX = os.getenv("USE_QUANTIZED_INDEX", "false").lower() == "true"
+QUANTIZED_INDEX_DIR = os.path.join(project_root, "quantized_index")
+QUANTIZATION_MODE = os.getenv("QUANTIZATION_MODE", "int8")  # 'int8' | 'binary'
+RESCORE_OVERSAMPLE = int(os.getenv("RESCORE_OVERSAMPLE", "4"))  # rescore 후보 수 = k * 이 값
+
+# --- 웹앱 대화 화면 (최근 대화만 표시하고 이전 대화는 '더 보기'로 불러옴) ---
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))  # 한 번에 표시할 메시지 수
+
+# --- 요리 이름 질문 빠른 경로 (제목 색인 일치 시 LLM 파이프라인 생략) ---
+USE_TITLE_FAST_PATH = os.getenv("USE_TITLE_FAST_PATH", "true").lower() == "true"
@@ -0,0 +1,207 @@
+# modules/corpus.py
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from . import config
+
+
+class Corpus:
+    """
+    검색어(또는 출처) 하나로 모은 레시피 모음과 그 데이터 경로.
+    기본 모음은 기존 경로(crawled_data/, preprocessed_data/, index_versions/ ...)를 그대로 사용합니다.
+    """
+    def __init__(self, name, search_query):
+        self.name = name
+        self.search_query = search_query
+        self.persona = config.CORPUS_PERSONAS.get(name)  # 답변 말투를 따라 할 인물 (없으면 중립적인 말투)
+        if name == config.DEFAULT_CORPUS:
+            self.crawled_dir = config.CRAWLED_DATA_DIR
+            self.merged_file = config.MERGED_PREPROCESSED_FILE
+            self.record_file = config.MERGED_RECORD_FILE
+            self.ingredient_index_file = config.INGREDIENT_INDEX_FILE
+            self.versions_dir = config.INDEX_VERSIONS_DIR
+            self.pipeline_cache_dir = config.PIPELINE_CACHE_DIR
+            self.cleaned_dir = config.CLEANED_DATA_DIR
+            # 버전 관리 도입 전의 고정 경로 DB
+            self.legacy_chroma_path = config.CHROMA_DB_PATH
+            self.legacy_quantized_path = config.QUANTIZED_INDEX_DIR
+        else:
+            root = os.path.join(config.CORPORA_DIR, name)
+            preprocessed_dir = os.path.join(root, "preprocessed_data")
+            self.crawled_dir = os.path.join(root, "crawled_data")
+            self.merged_file = os.path.join(preprocessed_dir, os.path.basename(config.MERGED_PREPROCESSED_FILE))
+            self.record_file = os.path.join(preprocessed_dir, os.path.basename(config.MERGED_RECORD_FILE))
+            self.ingredient_index_file = os.path.join(preprocessed_dir, os.path.basename(config.INGREDIENT_INDEX_FILE))
+            self.versions_dir = os.path.join(root, "index_versions")
+            self.pipeline_cache_dir = os.path.join(root, ".pipeline_cache")
+            self.cleaned_dir = os.path.join(self.pipeline_cache_dir, "cleaned")
+            self.legacy_chroma_path = None
+            self.legacy_quantized_path = None
+        self.current_file = os.path.join(self.versions_dir, "CURRENT")
+
+    @property
+    def keywords(self):
+        """질문에 이 단어가 있으면 이 모음으로 보냄 (예: '이연복 짜장면')"""
+        return [word for word in {self.name, self.search_query} if len(word) >= 2]
+
+    def __repr__(self):
+        return f"Corpus({self.name!r}, {self.search_query!r})"
+
+
+def get_corpus(name=None):
+    name = name or config.DEFAULT_CORPUS
+    if name not in config.CORPORA:
+        raise KeyError(f"설정되지 않은 레시피 모음입니다: '{name}' (CORPORA={list(config.CORPORA)})")
+    return Corpus(name, config.CORPORA[name])
+
+
+def all_corpora():
+    return {name: Corpus(name, query) for name, query in config.CORPORA.items()}
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def snapshot_memory_bytes(snapshot, in_memory_docstore):
+    """
+    메모리 한도 계산에 쓰는 스냅샷 크기: 불러오는 동안 실제로 늘어난 RSS와 디스크 기준 추정치 중 큰 값.
+    Chroma는 HNSW 색인을 첫 검색 때 불러오므로 불러온 직후의 RSS만으로는 작게 잡힙니다.
+    """
+    return max(snapshot.resident_bytes or 0, estimate_memory_bytes(snapshot, in_memory_docstore))
+
+
+def estimate_memory_bytes(snapshot, in_memory_docstore):
+    """
+    불러온 색인이 차지하는 메모리 추정치.
+    Chroma의 HNSW 색인/SQLite 페이지는 디스크 크기만큼, 메모리 docstore의 부모 문서는
+    파이썬 객체 오버헤드를 고려해 파일 크기의 3배로 계산합니다.
+    """
+    total = _dir_bytes(snapshot.version.chroma_path)
+    if snapshot.quantized is not None:
+        total += snapshot.quantized.memory_bytes(config.QUANTIZATION_MODE)
+    if in_memory_docstore and snapshot.version.parents_path and os.path.exists(snapshot.version.parents_path):
+        total += 3 * os.path.getsize(snapshot.version.parents_path)
+    return total
+
+
+class CorpusManager:
+    """
+    여러 레시피 모음의 색인을 처음 쓰일 때 불러오고(lazy), 전체 추정 메모리가 한도를 넘으면
+    가장 오래 안 쓴 모음부터 내립니다(LRU). 불러온 모음은 각자 새 색인 버전을 감시해 자동으로 교체합니다.
+
+    Args:
+        load_fn (callable): IndexVersion → IndexSnapshot (index_versions.load_snapshot에 옵션을 묶은 것)
+        in_memory_docstore (bool): 부모 문서를 프로세스 메모리에 두는지 (공유 백엔드가 없으면 True)
+        legacy_parents (str): 예전 고정 경로 DB를 쓸 때의 부모 문서 파일 (기본 모음에만 해당)
+        writable (Iterable[str]): 스트리밍 수집으로 레시피를 추가하는 모음. 배포된 버전 대신 작업용 복사본을
+            불러오고, 수집기가 쓰고 있으므로 메모리 한도를 넘어도 내리지 않음
+        on_swap (callable): (모음 이름, 새 IndexSnapshot) → None. 새 버전으로 바뀐 뒤 호출
+    """
+    def __init__(self, load_fn, corpora=None, default=None, memory_budget_mb=config.CORPUS_MEMORY_BUDGET_MB,
+                 in_memory_docstore=True, legacy_parents=None, release_grace=config.INDEX_RELEASE_GRACE,
+                 writable=(), on_swap=None):
+        self.load_fn = load_fn
+        self.corpora = corpora or all_corpora()
+        self.default = default or config.DEFAULT_CORPUS
+        self.memory_budget = memory_budget_mb * 2**20
+        self.in_memory_docstore = in_memory_docstore
+        self.legacy_parents = legacy_parents
+        self.release_grace = release_grace
+        self.writable = set(writable)
+        self.on_swap = on_swap
+        self._loaded = OrderedDict()  # 이름 → (HotReloader, 추정 바이트), 최근 사용 순
+        self._lock = threading.Lock()
+        self._loading_locks = {name: threading.Lock() for name in self.corpora}
+
+    def available(self):
+        """색인이 만들어져 있는 모음 이름"""
+        from .index_versions import resolve_version
+        return [name for name, corpus in self.corpora.items()
+                if resolve_version(corpus, self.legacy_parents) is not None]
+
+    def route(self, query, corpus=None):
+        """
+        질문을 처리할 모음을 고릅니다.
+        세션에서 고정한 모음이 있으면 그것을, 없으면 질문에 모음 이름/검색어가 들어 있는지 보고,
+        그래도 없으면 기본 모음을 씁니다.
+        """
+        if corpus in self.corpora:
+            return corpus
+        # 가장 긴 단어가 일치한 모음, 같으면 질문에서 먼저 나온 모음
+        matches = [(len(word), -query.find(word), name)
+                   for name, c in self.corpora.items() for word in c.keywords if word in query]
+        return max(matches)[2] if matches else self.default
+
+    def get(self, name=None):
+        """모음의 현재 IndexSnapshot. 아직 불러오지 않았으면 지금 불러옵니다."""
+        name = name or self.default
+        if name not in self.corpora:
+            raise KeyError(f"설정되지 않은 레시피 모음입니다: '{name}'")
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name][0].current
+
+        # 같은 모음을 동시에 두 번 불러오지 않도록 모음별로 잠금 (다른 모음의 요청은 막지 않음)
+        with self._loading_locks[name]:
+            with self._lock:
+                if name in self._loaded:
+                    return self._loaded[name][0].current
+            from .index_versions import HotReloader
+            reloader = HotReloader(self.load_fn, corpus=self.corpora[name], legacy_parents=self.legacy_parents,
+                                   writable=name in self.writable)
+            snapshot = reloader.load_current()
+            if snapshot is None:
+                raise LookupError(f"'{name}' 모음의 색인이 없습니다. 먼저 `python main.py --corpus {name}`로 구축해주세요.")
+            reloader.start(on_swap=functools.partial(self._on_swap, name))
+            size = snapshot_memory_bytes(snapshot, self.in_memory_docstore)
+            measured = f"RSS 증가 {snapshot.resident_bytes / 2**20:.0f} MB, " if snapshot.resident_bytes is not None else ""
+            print(f"INFO: '{name}' 모음의 색인 '{snapshot.version.name}'을(를) 불러왔습니다. "
+                  f"({measured}한도 계산 {size / 2**20:.0f} MB)")
+            with self._lock:
+                self._loaded[name] = (reloader, size)
+                self._evict(keep=name)
+            return snapshot
+
+    def _on_swap(self, name, snapshot):
+        # 새 버전으로 바뀌면 메모리 추정치도 새 버전 기준으로 갱신
+        size = snapshot_memory_bytes(snapshot, self.in_memory_docstore)
+        with self._lock:
+            if name in self._loaded:
+                self._loaded[name] = (self._loaded[name][0], size)
+                self._evict(keep=name)
+        if self.on_swap is not None:
+            self.on_swap(name, snapshot)
+
+    def _evict(self, keep):
+        # 호출하는 쪽에서 self._lock을 잡고 있어야 함
+        while self.memory_bytes() > self.memory_budget:
+            name = next((n for n in self._loaded if n != keep and n not in self.writable), None)
+            if name is None:
+                break
+            reloader, size = self._loaded.pop(name)
+            # 진행 중인 요청은 이미 가져간 스냅샷으로 끝까지 처리되도록, Chroma 클라이언트는 잠시 뒤에 닫음
+            reloader.close(release_after=self.release_grace)
+            print(f"INFO: 메모리 한도({self.memory_budget / 2**20:.0f} MB)를 넘어 '{name}' 모음을 내립니다. "
+                  f"({size / 2**20:.0f} MB, {self.release_grace:.0f}초 뒤 해제)")
+
+    def close(self):
+        """불러온 모음의 감시를 멈추고 색인을 모두 해제합니다. (종료할 때)"""
+        with self._lock:
+            loaded, self._loaded = list(self._loaded.values()), OrderedDict()
+        for reloader, _ in loaded:
+            reloader.close()
+
+    def memory_bytes(self):
+        return sum(size for _, size in self._loaded.values())
+
+    def loaded(self):
+        """현재 메모리에 있는 모음 이름 (오래 안 쓴 것부터)"""
+        with self._lock:
+            return list(self._loaded)
@@ -3,13 +3,15 @@ from bs4 import BeautifulSoup
 import time
 import json
 import random
+from urllib.parse import quote
 
 class RecipeCrawler:
     """
     재료 추출 로직을 대폭 강화하여 모든 재료를 정확하게 크롤링하는 버전.
     """
-    def __init__(self):
+    def __init__(self, search_query="백종원"):
         self.base_url = "https://www.10000recipe.com"
+        self.search_query = search_query  # 레시피 모음(corpus)별 검색어
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
         }
@@ -17,35 +19,64 @@ class RecipeCrawler:
     # 페이지 구간을 정해서 백종원 레시피 URL을 가져오는 기능은 그대로 유지합니다.
     def get_baek_recipe_urls(self, start_page=1, end_page=5):
         recipe_urls = []
-        print(f"'백종원' 검색 결과 {start_page}페이지부터 {end_page}페이지까지 URL 수집을 시작합니다.")
+        print(f"'{self.search_query}' 검색 결과 {start_page}페이지부터 {end_page}페이지까지 URL 수집을 시작합니다.")
         
         for page in range(start_page, end_page + 1):
-            search_url = f"{self.base_url}/recipe/list.html?q=%EB%B0%B1%EC%A2%85%EC%9B%90&page={page}"
-            try:
-                response = requests.get(search_url, headers=self.headers, timeout=10)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                links = soup.select('li.common_sp_list_li a.common_sp_link')
-                
-                if not links:
-                    print(f"{page} 페이지에서 더 이상 레시피를 찾을 수 없어 수집을 중단합니다.")
-                    break
-
-                for link in links:
-                    recipe_urls.append(link['href'])
-                
-                print(f"  > {page} 페이지에서 {len(links)}개의 URL 수집 완료.")
-                time.sleep(random.uniform(1, 2))
-
-            except requests.exceptions.RequestException as e:
-                print(f"  > {page} 페이지 요청 중 오류 발생: {e}")
+            links = self._get_page_urls(page)
+            if links is None:
                 continue
+            if not links:
+                break
+            recipe_urls.extend(links)
+            time.sleep(random.uniform(1, 2))
         
         unique_urls = list(set(recipe_urls))
         print(f"\n총 {len(unique_urls)}개의 고유한 레시피 URL을 수집했습니다.")
         return unique_urls
 
+    def _get_page_urls(self, page):
+        """검색 결과 한 페이지의 레시피 URL 목록. 요청 오류는 None, 마지막 페이지를 넘으면 빈 리스트."""
+        search_url = f"{self.base_url}/recipe/list.html?q={quote(self.search_query)}&page={page}"
+        try:
+            response = requests.get(search_url, headers=self.headers, timeout=10)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"  > {page} 페이지 요청 중 오류 발생: {e}")
+            return None
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+        links = [link['href'] for link in soup.select('li.common_sp_list_li a.common_sp_link')]
+        if not links:
+            print(f"{page} 페이지에서 더 이상 레시피를 찾을 수 없어 수집을 중단합니다.")
+        else:
+            print(f"  > {page} 페이지에서 {len(links)}개의 URL 수집 완료.")
+        return links
+
+    def iter_recipes(self, start_page=1, end_page=5, skip_ids=()):
+        """
+        페이지를 넘기면서 레시피를 하나씩 바로 수집해 돌려줍니다. (스트리밍 수집용)
+        전체 URL 목록을 먼저 모으지 않으므로 첫 레시피가 몇 초 안에 나옵니다.
+
+        Args:
+            skip_ids: 이미 수집한 레시피 id (상세 페이지 요청을 생략)
+        """
+        seen = set()
+        for page in range(start_page, end_page + 1):
+            links = self._get_page_urls(page)
+            if links is None:
+                continue
+            if not links:
+                break
+            for url in links:
+                recipe_id = url.split('/')[-1]
+                if url in seen or recipe_id in skip_ids:
+                    continue
+                seen.add(url)
+                details = self.scrape_recipe_details(url)
+                if details:
+                    yield details
+                time.sleep(random.uniform(1, 1.5))
+
     # --- 👇 여기가 핵심 수정 부분입니다! 👇 ---
     def scrape_recipe_details(self, recipe_url):
         """개별 레시피 URL로 접속해 상세 정보를 추출합니다. (재료 추출 로직 강화)"""
@@ -108,7 +139,7 @@ class RecipeCrawler:
             return None
 
     def run(self, start_page=1, end_page=5, output_filename='baek_recipes.json'):
-        """'백종원' 레시피 크롤링 전체 과정을 실행하고 결과를 JSON으로 저장합니다."""
+        """검색어(기본 '백종원') 레시피 크롤링 전체 과정을 실행하고 결과를 JSON으로 저장합니다."""
         recipe_urls = self.get_baek_recipe_urls(start_page, end_page)
         
         if not recipe_urls:
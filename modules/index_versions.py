@@ -0,0 +1,427 @@
+# modules/index_versions.py
+import gc
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from langchain.storage import InMemoryStore
+
+from . import config
+from .corpus import get_corpus
+from .ingredient_index import IngredientIndex
+from .profiler import current_rss_bytes
+from .quantized_index import QuantizedIndex, QuantizedVectorStore
+from .retriever import AdvancedRetriever
+from .shared_store import SharedDocStore
+from .title_index import TitleIndex
+from .utils_docstore import register_parent_docs
+from .vector_store import VectorStoreManager, close_vectorstore
+
+LEGACY_VERSION = "legacy"
+
+
+class IndexVersion:
+    """
+    색인 버전 하나의 폴더 구성.
+
+        <버전>/chroma_db/            자식 청크 벡터 DB
+        <버전>/quantized_index/      양자화 색인 (선택)
+        <버전>/<부모 문서 파일>       이 벡터 DB를 만들 때 쓴 부모 문서 (JSON 또는 .rec)
+        <버전>/ingredient_index.json 재료 색인
+        <버전>/meta.json             부모 문서 파일 이름 등
+        <버전>/.leases/              이 버전을 쓰고 있는 프로세스 표시 (GC 제외용)
+    """
+    def __init__(self, name, corpus=None, path=None, published_at=None):
+        self.name = name
+        self.corpus = corpus or get_corpus()
+        self.path = path or os.path.join(self.corpus.versions_dir, name)
+        self.published_at = published_at
+        self.source = None  # 작업용 복사본이면 복사해 온 배포 버전
+        self.chroma_path = os.path.join(self.path, "chroma_db")
+        self.quantized_path = os.path.join(self.path, "quantized_index")
+        self.ingredient_index_path = os.path.join(self.path, os.path.basename(config.INGREDIENT_INDEX_FILE))
+        self.parents_path = None
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.parents_path = os.path.join(self.path, json.load(f)["parents"])
+
+    @classmethod
+    def legacy(cls, corpus, parents_path=None):
+        """버전 관리 도입 전의 고정 경로(chroma_db/ 등)를 하나의 버전처럼 다룹니다."""
+        version = cls(LEGACY_VERSION, corpus=corpus, path=config.project_root)
+        version.chroma_path = corpus.legacy_chroma_path
+        version.quantized_path = corpus.legacy_quantized_path
+        version.ingredient_index_path = corpus.ingredient_index_file
+        version.parents_path = parents_path or corpus.merged_file
+        return version
+
+    @property
+    def key(self):
+        # 작업용 복사본은 원본 버전과 같은 버전으로 봄 (같은 배포를 다시 불러오지 않도록)
+        if self.source is not None:
+            return self.source.key
+        return self.name, self.published_at
+
+    @property
+    def namespace(self):
+        """공유 docstore에서 이 버전의 부모 문서를 저장할 이름공간 (예전 고정 경로 DB는 이름공간 없음)"""
+        if self.name == LEGACY_VERSION:
+            return None
+        if self.corpus.name == config.DEFAULT_CORPUS:
+            return self.name
+        return f"{self.corpus.name}:{self.name}"
+
+    def add_parents(self, path):
+        """부모 문서 파일을 버전 폴더로 복사합니다. (버전마다 벡터 DB와 부모 문서가 항상 짝이 맞도록)"""
+        shutil.copy2(path, self.path)
+        with open(os.path.join(self.path, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"parents": os.path.basename(path)}, f, ensure_ascii=False)
+        self.parents_path = os.path.join(self.path, os.path.basename(path))
+
+    def add_file(self, path):
+        if os.path.exists(path):
+            shutil.copy2(path, self.path)
+
+
+def create_version(corpus=None):
+    """새 버전 폴더를 만듭니다. publish하기 전까지는 어떤 프로세스도 이 버전을 읽지 않습니다."""
+    name = f"v{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    version = IndexVersion(name, corpus=corpus)
+    os.makedirs(version.path)
+    return version
+
+
+def fork_version(version):
+    """
+    배포된 버전은 고치지 않도록, 스트리밍 수집이 레시피를 추가할 작업용 복사본을 임시 폴더에 만듭니다.
+    복사본은 배포하지 않으며(CURRENT/GC 대상 아님) 스냅샷을 해제할 때 지웁니다.
+    """
+    path = tempfile.mkdtemp(prefix=f"{version.corpus.name}-{version.name}-stream-")
+    fork = IndexVersion(os.path.basename(path), corpus=version.corpus, path=path, published_at=version.published_at)
+    fork.source = version
+    try:
+        shutil.copytree(version.chroma_path, fork.chroma_path)
+        if os.path.isdir(version.quantized_path):
+            shutil.copytree(version.quantized_path, fork.quantized_path)
+        if version.parents_path:
+            fork.add_parents(version.parents_path)
+        if os.path.exists(version.ingredient_index_path):
+            shutil.copy2(version.ingredient_index_path, fork.ingredient_index_path)
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return fork
+
+
+def publish(version):
+    """CURRENT 포인터를 새 버전으로 원자적으로 교체합니다. (임시 파일에 쓴 뒤 os.replace)"""
+    current_file = version.corpus.current_file
+    tmp_path = f"{current_file}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": version.name, "published_at": time.time()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, current_file)
+    print(f"SUCCESS: '{version.corpus.name}' 모음의 색인 버전 '{version.name}'을(를) 배포했습니다.")
+
+
+def current_version(corpus=None):
+    """CURRENT가 가리키는 버전. 아직 배포된 버전이 없으면 None."""
+    corpus = corpus or get_corpus()
+    try:
+        with open(corpus.current_file, 'r', encoding='utf-8') as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return IndexVersion(pointer["version"], corpus=corpus, published_at=pointer["published_at"])
+
+
+def resolve_version(corpus=None, legacy_parents=None):
+    """사용할 버전: CURRENT가 있으면 그 버전, 없으면 예전 고정 경로의 DB, 둘 다 없으면 None."""
+    corpus = corpus or get_corpus()
+    version = current_version(corpus)
+    if version is not None:
+        return version
+    if corpus.legacy_chroma_path and os.path.exists(corpus.legacy_chroma_path):
+        return IndexVersion.legacy(corpus, legacy_parents)
+    return None
+
+
+def current_path(attr, corpus=None, legacy_parents=None):
+    """파이프라인 단계 결과 확인용: 현재 버전의 chroma_path/quantized_path. 버전이 없으면 존재하지 않는 경로."""
+    corpus = corpus or get_corpus()
+    version = resolve_version(corpus, legacy_parents)
+    if version is None:
+        return os.path.join(corpus.versions_dir, "<none>", attr)
+    return getattr(version, attr)
+
+
+# --- 사용 중 표시(lease)와 GC ---
+
+def _lease_path(version):
+    return os.path.join(version.path, ".leases", f"{socket.gethostname()}-{os.getpid()}")
+
+
+def acquire_lease(version):
+    """이 프로세스가 버전을 쓰고 있음을 표시합니다. 주기적으로 다시 호출해 갱신합니다."""
+    if version.name == LEGACY_VERSION:
+        return
+    path = _lease_path(version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(str(time.time()))
+
+
+def release_lease(version):
+    if version.name == LEGACY_VERSION:
+        return
+    try:
+        os.remove(_lease_path(version))
+    except OSError:
+        pass
+
+
+def _is_leased(path, ttl):
+    lease_dir = os.path.join(path, ".leases")
+    if not os.path.isdir(lease_dir):
+        return False
+    # 갱신이 끊긴 lease는 이미 종료된 프로세스로 보고 무시
+    now = time.time()
+    return any(now - os.path.getmtime(os.path.join(lease_dir, name)) < ttl for name in os.listdir(lease_dir))
+
+
+def gc_versions(corpus=None, keep=config.INDEX_KEEP_VERSIONS, backend=None, lease_ttl=config.INDEX_LEASE_TTL):
+    """
+    현재 버전보다 오래된 버전 중 최근 keep-1개를 제외하고 삭제합니다.
+    아직 어떤 프로세스가 쓰고 있는(lease가 살아 있는) 버전은 남겨둡니다.
+    현재 버전보다 새로운 폴더(다른 프로세스가 만드는 중인 버전)는 건드리지 않습니다.
+
+    Args:
+        backend: 공유 docstore 백엔드. 주어지면 삭제한 버전의 부모 문서도 함께 지움
+    """
+    corpus = corpus or get_corpus()
+    current = current_version(corpus)
+    if current is None or not os.path.isdir(corpus.versions_dir):
+        return []
+    older = sorted(
+        name for name in os.listdir(corpus.versions_dir)
+        if os.path.isdir(os.path.join(corpus.versions_dir, name)) and name < current.name
+    )
+    removed = []
+    for name in older[:max(0, len(older) - (keep - 1))]:
+        path = os.path.join(corpus.versions_dir, name)
+        if _is_leased(path, lease_ttl):
+            print(f"INFO: 색인 버전 '{name}'은(는) 아직 사용 중이라 남겨둡니다.")
+            continue
+        try:
+            shutil.rmtree(path)
+        except OSError as e:
+            print(f"WARNING: 색인 버전 '{name}' 삭제 실패: {e}")
+            continue
+        if backend is not None:
+            docstore = SharedDocStore(backend, namespace=IndexVersion(name, corpus=corpus).namespace)
+            docstore.mdelete(list(docstore.yield_keys()))
+        removed.append(name)
+    if removed:
+        print(f"INFO: 오래된 색인 버전 {len(removed)}개를 정리했습니다: {', '.join(removed)}")
+    return removed
+
+
+# --- 버전 불러오기와 교체 ---
+
+class IndexSnapshot:
+    """한 버전에서 불러온 검색 구성 요소 묶음. 요청 하나는 처음 가져간 스냅샷으로 끝까지 처리됩니다."""
+    def __init__(self, version, vectorstore, docstore, retriever, title_index=None, quantized=None):
+        self.version = version
+        self.vectorstore = vectorstore  # 원본 Chroma (스트리밍 수집/리포트용)
+        self.docstore = docstore
+        self.retriever = retriever
+        self.title_index = title_index
+        self.quantized = quantized
+        self.resident_bytes = None  # 불러오는 동안 늘어난 RSS (HotReloader가 측정)
+
+
+def release_snapshot(snapshot):
+    """
+    스냅샷의 Chroma 클라이언트를 닫습니다. chromadb는 경로마다 클라이언트/System을 캐시하므로
+    스냅샷 참조를 버리는 것만으로는 HNSW 색인과 SQLite 연결이 메모리에서 내려가지 않습니다.
+    """
+    if snapshot.vectorstore is not None:
+        close_vectorstore(snapshot.vectorstore)
+    if snapshot.version.source is not None:
+        # 작업용 복사본은 이 프로세스만 쓰므로 부모 문서와 폴더까지 지움
+        if isinstance(snapshot.docstore, SharedDocStore):
+            snapshot.docstore.mdelete(list(snapshot.docstore.yield_keys()))
+        shutil.rmtree(snapshot.version.path, ignore_errors=True)
+
+
+def load_snapshot(version, scheduler=None, backend=None, use_ingredient_index=True,
+                  use_quantized_index=config.USE_QUANTIZED_INDEX):
+    """버전 폴더에서 벡터 DB, 부모 문서, 보조 색인을 불러와 리트리버를 구성합니다."""
+    vs_manager = VectorStoreManager(persist_directory=version.chroma_path, scheduler=scheduler)
+    vectorstore = vs_manager.load()
+    if not vectorstore:
+        raise RuntimeError(f"색인 버전 '{version.name}'의 벡터 DB를 불러오지 못했습니다.")
+
+    # 공유 백엔드에서는 버전별 이름공간에 부모 문서를 두어, 버전을 바꾸는 동안 서로 섞이지 않게 함
+    if backend is not None:
+        docstore = SharedDocStore(backend, namespace=version.namespace)
+    else:
+        docstore = InMemoryStore()
+    if (backend is None or docstore.is_empty()) and version.parents_path:
+        register_parent_docs(docstore, vs_manager._load_documents_from_json(version.parents_path))
+
+    if not vs_manager.has_slim_metadata():
+        # 변환은 DB를 연 클라이언트가 없을 때만 안전하므로 여기서는 하지 않음 (main.py 실행 시 변환)
+        print(f"WARNING: 색인 버전 '{version.name}'은(는) 예전 방식의 청크 메타데이터를 사용합니다. "
+              "'python main.py'를 한 번 실행하면 변환됩니다.")
+
+    search_store, quantized = vectorstore, None
+    if use_quantized_index and version.quantized_path:
+        quantized = QuantizedIndex.load(version.quantized_path)
+        if quantized is not None:
+            search_store = QuantizedVectorStore(vectorstore, quantized)
+
+    ingredient_index = None
+    if use_ingredient_index and version.ingredient_index_path and os.path.exists(version.ingredient_index_path):
+        ingredient_index = IngredientIndex.load(version.ingredient_index_path)
+    retriever = AdvancedRetriever(search_store, docstore, ingredient_index=ingredient_index).get_retriever()
+    title_index = TitleIndex.from_docstore(docstore) if config.USE_TITLE_FAST_PATH else None
+    return IndexSnapshot(version, vectorstore, docstore, retriever, title_index, quantized)
+
+
+class HotReloader:
+    """
+    CURRENT 포인터를 주기적으로 확인하다가 새 버전이 배포되면 백그라운드에서 불러온 뒤
+    on_swap으로 교체를 알립니다. 불러오는 동안에는 기존 버전이 계속 요청을 처리하고,
+    직전 버전은 진행 중인 요청이 끝날 수 있도록 다음 교체 때까지 lease를 유지합니다.
+
+    Args:
+        load_fn (callable): IndexVersion → IndexSnapshot
+        corpus (Corpus): 감시할 레시피 모음 (기본 모음이 기본값)
+        writable (bool): True면 배포된 버전 대신 작업용 복사본(fork_version)을 불러옴 (스트리밍 수집용)
+    """
+    def __init__(self, load_fn, corpus=None, poll_interval=config.INDEX_POLL_INTERVAL, legacy_parents=None,
+                 writable=False):
+        self.load_fn = load_fn
+        self.corpus = corpus or get_corpus()
+        self.poll_interval = poll_interval
+        self.legacy_parents = legacy_parents
+        self.writable = writable
+        self.current = None
+        self._leased = []  # [직전 버전, 현재 버전]
+        self._snapshots = []  # [직전 스냅샷, 현재 스냅샷]
+        self._failed_key = None
+        self._stop = threading.Event()
+
+    def load_current(self):
+        """현재 버전을 바로(동기) 불러옵니다. 사용할 버전이 없으면 None."""
+        version = resolve_version(self.corpus, self.legacy_parents)
+        if version is None:
+            return None
+        self._swap(self._load(version))
+        return self.current
+
+    def start(self, on_swap=None):
+        threading.Thread(target=self._watch, args=(on_swap,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self, release_after=0):
+        """
+        감시를 멈추고, release_after초 뒤(진행 중인 요청이 끝난 뒤) 이 프로세스의 lease와
+        Chroma 클라이언트를 모두 해제합니다. (메모리에서 내릴 때)
+        """
+        self.stop()
+        leased, snapshots = self._leased, self._snapshots
+        self._leased, self._snapshots = [], []
+        self.current = None
+
+        def release():
+            rss_before = current_rss_bytes()
+            for version in leased:
+                release_lease(version)
+            for snapshot in snapshots:
+                release_snapshot(snapshot)
+            snapshots.clear()
+            gc.collect()
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                print(f"INFO: '{self.corpus.name}' 모음의 색인을 메모리에서 해제했습니다. "
+                      f"(RSS {rss_before / 2**20:.0f} MB → {rss_after / 2**20:.0f} MB)")
+
+        if release_after:
+            timer = threading.Timer(release_after, release)
+            timer.daemon = True
+            timer.start()
+        else:
+            release()
+
+    def _load(self, version):
+        if self.writable:
+            acquire_lease(version)  # 복사하는 동안 GC되지 않도록
+            try:
+                version = fork_version(version)
+            finally:
+                release_lease(version.source or version)
+        acquire_lease(version)
+        try:
+            rss_before = current_rss_bytes()
+            snapshot = self.load_fn(version)
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                snapshot.resident_bytes = max(0, rss_after - rss_before)
+            return snapshot
+        except Exception:
+            release_lease(version)
+            if version.source is not None:
+                shutil.rmtree(version.path, ignore_errors=True)
+            raise
+
+    def _swap(self, snapshot):
+        self.current = snapshot  # 참조 교체 한 번으로 끝나므로 요청 사이에 원자적으로 바뀜
+        self._leased.append(snapshot.version)
+        self._snapshots.append(snapshot)
+        in_use = {version.name for version in self._leased[-2:]}
+        for version in self._leased[:-2]:
+            if version.name not in in_use:
+                release_lease(version)
+        # 두 번 전 스냅샷은 더 이상 쓰는 요청이 없으므로 Chroma 클라이언트를 닫음
+        for old in self._snapshots[:-2]:
+            release_snapshot(old)
+        self._leased = self._leased[-2:]
+        self._snapshots = self._snapshots[-2:]
+
+    def _watch(self, on_swap):
+        while not self._stop.wait(self.poll_interval):
+            for version in self._leased:
+                acquire_lease(version)  # lease 갱신
+            version = current_version(self.corpus)
+            if version is None or version.key in (self.current.version.key if self.current else None,
+                                                  self._failed_key):
+                continue
+            start = time.perf_counter()
+            try:
+                snapshot = self._load(version)
+            except Exception as e:
+                self._failed_key = version.key
+                print(f"WARNING: 새 색인 버전 '{version.name}'을(를) 불러오지 못해 기존 버전을 계속 사용합니다: {e}")
+                continue
+            if self._stop.is_set():
+                # 불러오는 사이에 close()된 경우 (메모리에서 내린 모음)
+                release_lease(version)
+                release_snapshot(snapshot)
+                break
+            previous = (self.current.version.source or self.current.version).name if self.current else None
+            self._swap(snapshot)
+            if on_swap is not None:
+                on_swap(snapshot)
+            print(f"INFO: '{self.corpus.name}' 모음의 색인 버전을 '{previous}' → '{version.name}'(으)로 교체했습니다. "
+                  f"(백그라운드 로드 {time.perf_counter() - start:.1f}초)")
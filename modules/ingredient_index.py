@@ -0,0 +1,205 @@
+# modules/ingredient_index.py
+import json
+import os
+import re
+
+from .utils_docstore import compute_doc_id
+
+# 정확한 수량 대신 쓰이는 표현들
+VAGUE_QUANTITIES = ('약간', '조금', '적당량', '적당히', '소량', '톡톡', '취향껏', '많이',
+                    '한줌', '한꼬집', '반개', '반컵', '한컵', '한개')
+# "다진 마늘" → "마늘"처럼 재료 이름 앞에 붙는 손질/상태 표현
+MODIFIER_PREFIXES = ('다진', '간', '채썬', '썬', '말린', '냉동', '생', '삶은', '데친', '불린')
+
+_QUANTITY_RE = re.compile(r'^(?P<qty>\d+(?:\.\d+)?(?:/\d+)?|[½⅓⅔¼¾])\s*(?P<unit>\D*)$')
+_TRAILING_QUANTITY_RE = re.compile(r'^(?P<name>.*?\D)\s+(?P<amount>(?:\d|[½⅓⅔¼¾]).*)$')
+
+
+def _parse_quantity(token):
+    """'1/2개', '200g', '약간' 같은 수량 토큰을 (quantity, unit)으로 나눕니다. 수량이 아니면 None."""
+    token = token.strip()
+    if token in VAGUE_QUANTITIES:
+        return token, ''
+    match = _QUANTITY_RE.match(token)
+    if match:
+        return match.group('qty'), match.group('unit').strip()
+    return None
+
+
+def normalize_ingredient_name(name):
+    """괄호 내용과 공백을 제거해 재료 이름을 정규화합니다."""
+    name = re.sub(r'\([^)]*\)|\[[^\]]*\]', '', name)
+    return re.sub(r'\s+', '', name).lower()
+
+
+def _name_variants(name):
+    """'대파 or 쪽파', '다진 마늘'처럼 적힌 재료를 색인용 이름 목록으로 펼칩니다."""
+    variants = []
+    for part in re.split(r'\s+or\s+|/|또는', name):
+        normalized = normalize_ingredient_name(part)
+        if not normalized:
+            continue
+        variants.append(normalized)
+        for prefix in MODIFIER_PREFIXES:
+            if normalized.startswith(prefix) and len(normalized) > len(prefix) + 1:
+                variants.append(normalized[len(prefix):])
+                break
+    return variants
+
+
+def parse_ingredients(ingredients):
+    """
+    콤마로 이어진 재료 문자열을 정규화된 재료 레코드 리스트로 변환합니다.
+    전처리 후에는 '두부, 300g, 대파, 약간'처럼 이름과 수량이 따로 나오므로 둘을 짝지어 줍니다.
+
+    Returns:
+        List[dict]: {'name', 'quantity', 'unit'} 레코드 리스트
+    """
+    records = []
+    for token in (t.strip() for t in ingredients.split(',')):
+        if not token:
+            continue
+        quantity = _parse_quantity(token)
+        if quantity is not None:
+            # 바로 앞 재료에 수량이 아직 없으면 그 재료의 수량으로 붙임
+            if records and records[-1]['quantity'] is None:
+                records[-1]['quantity'], records[-1]['unit'] = quantity
+            continue
+        # 크롤링 원본처럼 '돼지고기 200g' 형태로 붙어 있는 경우
+        match = _TRAILING_QUANTITY_RE.match(token)
+        if match and _parse_quantity(match.group('amount')):
+            name = match.group('name')
+            qty, unit = _parse_quantity(match.group('amount'))
+        else:
+            name, qty, unit = token, None, ''
+        if normalize_ingredient_name(name):
+            records.append({'name': name.strip(), 'quantity': qty, 'unit': unit})
+    return records
+
+
+class IngredientIndex:
+    """
+    재료 이름 → 레시피 비트셋(inverted index).
+    "감자랑 양파로 뭐 해먹지?" 같은 질문을 벡터 검색/LLM 없이 집합 교집합으로 바로 처리합니다.
+    """
+    def __init__(self):
+        self.recipe_ids = []     # 비트 위치 → 원본 레시피 id
+        self.doc_ids = []        # 비트 위치 → docstore의 doc_id
+        self.ingredient_counts = []
+        self.records = {}        # 레시피 id → 정규화된 재료 레코드
+        self.postings = {}       # 재료 이름 → int 비트셋
+        self._names_by_length = []
+
+    @classmethod
+    def build(cls, recipes):
+        """전처리된 레시피 dict 리스트로 색인을 만듭니다."""
+        index = cls()
+        for recipe in recipes:
+            index._add(recipe.get('id', ''), compute_doc_id(recipe), parse_ingredients(recipe.get('ingredients', '')))
+        index._refresh_vocabulary()
+        return index
+
+    def _add(self, recipe_id, doc_id, records):
+        position = len(self.recipe_ids)
+        self.recipe_ids.append(str(recipe_id))
+        self.doc_ids.append(doc_id)
+        self.records[str(recipe_id)] = records
+        names = set()
+        for record in records:
+            names.update(_name_variants(record['name']))
+        self.ingredient_counts.append(len(records))
+        bit = 1 << position
+        for name in names:
+            self.postings[name] = self.postings.get(name, 0) | bit
+
+    def _refresh_vocabulary(self):
+        # 질문에서 재료를 찾을 때 긴 이름부터 매칭 (예: '양파'가 '파'보다 먼저)
+        self._names_by_length = sorted(self.postings, key=len, reverse=True)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def match_names(self, text):
+        """질문 문장에 등장하는 재료 이름들을 찾습니다. 겹치는 위치는 긴 이름이 우선합니다."""
+        compact = normalize_ingredient_name(text)
+        taken = [False] * len(compact)
+        found = []
+        for name in self._names_by_length:
+            if len(name) < 2:
+                continue
+            start = compact.find(name)
+            while start != -1:
+                if not any(taken[start:start + len(name)]):
+                    for i in range(start, start + len(name)):
+                        taken[i] = True
+                    found.append(name)
+                    break
+                start = compact.find(name, start + 1)
+        return found
+
+    def query_bits(self, names):
+        """모든 재료를 포함하는 레시피의 비트셋을 돌려줍니다."""
+        if not names:
+            return 0
+        result = -1
+        for name in names:
+            result &= self.postings.get(normalize_ingredient_name(name), 0)
+            if not result:
+                break
+        return result
+
+    def query(self, names, limit=None):
+        """
+        주어진 재료를 모두 사용하는 레시피의 doc_id 리스트를 돌려줍니다.
+        재료 수가 적은(=더 간단한) 레시피가 앞에 옵니다.
+        """
+        bits = self.query_bits(names)
+        positions = []
+        while bits:
+            low = bits & -bits
+            positions.append(low.bit_length() - 1)
+            bits ^= low
+        positions.sort(key=lambda p: self.ingredient_counts[p])
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.doc_ids[p] for p in positions]
+
+    def save(self, path):
+        # 비트셋은 정렬된 위치 배열로 저장 (JSON 호환)
+        postings = {}
+        for name, bits in self.postings.items():
+            positions = []
+            while bits:
+                low = bits & -bits
+                positions.append(low.bit_length() - 1)
+                bits ^= low
+            postings[name] = positions
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'recipe_ids': self.recipe_ids,
+                'doc_ids': self.doc_ids,
+                'ingredient_counts': self.ingredient_counts,
+                'records': self.records,
+                'postings': postings,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            print(f"WARNING: '{path}' 재료 색인 파일이 존재하지 않습니다.")
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls()
+        index.recipe_ids = data['recipe_ids']
+        index.doc_ids = data['doc_ids']
+        index.ingredient_counts = data['ingredient_counts']
+        index.records = data['records']
+        for name, positions in data['postings'].items():
+            bits = 0
+            for p in positions:
+                bits |= 1 << p
+            index.postings[name] = bits
+        index._refresh_vocabulary()
+        return index
@@ -1,35 +1,99 @@
 # llm_handler.py
-from langchain_openai import ChatOpenAI
+import time
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import AddableDict, RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_upstage import ChatUpstage
 from . import config
+from .shared_store import SharedChatMessageHistory, AnswerCache
+from .resilient_llm import ResilientLLM
+from .title_index import format_recipe_answer
+from .index_versions import IndexSnapshot
+from .corpus import get_corpus
+from .utils_runnable import StreamableLambda
+
+
+def persona_prompt(persona):
+    """모음의 페르소나(config.CORPUS_PERSONAS)에 맞는 말투 지시문. 백종원 말투는 기본 모음에만 씁니다."""
+    if persona == "백종원":
+        return ("당신은 요리 연구가 '백종원'입니다. 사용자의 질문에 대해 주어진 레시피 정보를 바탕으로 답변해야 합니다."
+                "항상 친근하고 구수한 말투를 사용하고, 어려운 말은 쉽게 풀어서 설명해주세요."
+                "예를 들어, '~했쥬?', '~해야 해요.', '자, 어때유? 쉽쥬?' 같은 말투를 사용하세요.")
+    if persona:
+        return (f"당신은 요리 연구가 '{persona}'입니다. 사용자의 질문에 대해 주어진 레시피 정보를 바탕으로 답변해야 합니다."
+                "친근하고 정중한 말투를 사용하고, 어려운 말은 쉽게 풀어서 설명해주세요."
+                "실제 인물의 말버릇을 흉내 내거나 지어내지는 마세요.")
+    return ("당신은 친절한 요리 도우미입니다. 사용자의 질문에 대해 주어진 레시피 정보를 바탕으로 답변해야 합니다."
+            "친근하고 정중한 말투를 사용하고, 어려운 말은 쉽게 풀어서 설명해주세요.")
+
 
 class LLMHandler:
     """
     LLM 모델을 초기화하고, RAG 체인을 구성하며, 대화 기록을 관리하는 클래스.
     """
-    def __init__(self, retriever):
-        # Solar 모델을 사용하고 싶으면 model_name을 변경
-        #self.llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.2, api_key=config.OPENAI_API_KEY)
-        self.llm = ChatUpstage(model_name="solar-pro2", temperature=0.2,api_key=config.UPSTAGE_API_KEY)     
-        self.retriever = retriever
+    def __init__(self, retriever=None, backend=None, scheduler=None, title_index=None, docstore=None, corpora=None,
+                 llm_client=None):
+        # 사용할 모델과 failover 순서는 config.LLM_PROVIDERS로 변경 (예: "upstage:solar-pro2,openai:gpt-4o-mini")
+        # 호출마다 deadline/헤지 요청/차단기를 적용하고, 스케줄러가 있으면 각 요청이 전역 예산을 따름
+        self.llm_client = llm_client or ResilientLLM.from_config(scheduler=scheduler)
+        self.llm = self.llm_client.as_runnable()
+        # 색인 버전이 바뀌면 swap_index로 검색 대상만 교체 (대화 기록과 LLM은 그대로 유지)
+        # 요리 이름만 묻는 질문은 제목 색인으로 바로 답변 (docstore에서 부모 레시피를 꺼냄)
+        self._snapshot = IndexSnapshot(None, None, docstore, retriever, title_index)
         self.chat_history_store = {} # 세션별 대화 기록 저장
+        # 공유 백엔드(SQLite/Redis)가 있으면 대화 기록과 답변 캐시를 워커들끼리 공유
+        self.backend = backend
+        self.answer_cache = AnswerCache(backend) if backend is not None else None
+        # 여러 레시피 모음(CorpusManager)을 쓰면 요청마다 모음을 골라 그 색인으로 검색
+        self.corpora = corpora
+
+    @property
+    def title_index(self):
+        return self._snapshot.title_index
+
+    @property
+    def docstore(self):
+        return self._snapshot.docstore
+
+    def swap_index(self, retriever, title_index=None, docstore=None):
+        """새 색인 버전으로 교체합니다. 이미 시작된 요청은 가져간 이전 색인으로 끝까지 처리됩니다."""
+        if title_index is not None and self.title_index is not None:
+            title_index.stats = self.title_index.stats  # 빠른 경로 통계는 버전이 바뀌어도 이어서 집계
+        self._snapshot = IndexSnapshot(None, None, docstore, retriever, title_index)
+
+    def _resolve_snapshot(self, corpus=None):
+        if self.corpora is not None:
+            return self.corpora.get(corpus)
+        return self._snapshot
+
+    def _persona_for(self, configurable):
+        """요청을 처리하는 모음의 페르소나 (모음을 쓰지 않으면 기본 모음의 것)"""
+        name = configurable.get("corpus")
+        return get_corpus(name if name in config.CORPORA else None).persona
+
+    def _index_for(self, config):
+        """
+        요청에 쓸 IndexSnapshot. 체인 맨 바깥에서 요청마다 한 번 정해 config로 넘긴 것을 쓰므로,
+        요청 도중 새 버전이 배포되어도 빠른 경로/검색/답변 캐시가 모두 같은 버전을 봅니다.
+        """
+        configurable = config.get("configurable", {})
+        snapshot = configurable.get("index_snapshot")
+        return snapshot if snapshot is not None else self._resolve_snapshot(configurable.get("corpus"))
 
     def get_session_history(self, session_id: str):
+        if self.backend is not None:
+            return SharedChatMessageHistory(self.backend, session_id)
         if session_id not in self.chat_history_store:
             from langchain_community.chat_message_histories import ChatMessageHistory
             self.chat_history_store[session_id] = ChatMessageHistory()
         return self.chat_history_store[session_id]
 
     def create_rag_chain(self):
-        # --- 백종원 페르소나를 결정하는 시스템 프롬프트 ---
+        # --- 페르소나를 결정하는 시스템 프롬프트 (말투는 모음마다 {persona}로 채움) ---
         system_prompt = (
-            "당신은 요리 연구가 '백종원'입니다. 사용자의 질문에 대해 주어진 레시피 정보를 바탕으로 답변해야 합니다."
-            "항상 친근하고 구수한 말투를 사용하고, 어려운 말은 쉽게 풀어서 설명해주세요."
-            "예를 들어, '~했쥬?', '~해야 해요.', '자, 어때유? 쉽쥬?' 같은 말투를 사용하세요."
+            "{persona}"
             "주어진 레시피 정보에 없는 내용은 절대로 지어내서 말하지 마세요. 모르면 모른다고 솔직하게 말하세요."
             "답변 끝에는 항상 어떤 레시피를 참고했는지 출처(URL)를 명확하게 밝혀주세요."
             "\n\n"
@@ -45,9 +109,10 @@ class LLMHandler:
             ]
         )
         
-        # 2. 대화 기록 -> 질문 재구성 체인
+        # 2. 대화 기록 -> 질문 재구성 체인 (요청에 고정된 버전의 리트리버로 검색)
+        retriever = RunnableLambda(lambda query, config: self._index_for(config).retriever.invoke(query))
         history_aware_retriever = create_history_aware_retriever(
-            self.llm, self.retriever, contextualize_q_prompt
+            self.llm, retriever, contextualize_q_prompt
         )
 
         # 3. 검색된 레시피와 질문을 바탕으로 답변을 생성하는 프롬프트
@@ -64,6 +129,8 @@ class LLMHandler:
 
         # 5. 위 두 체인을 결합하여 최종 RAG 체인 생성
         rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+        if self.answer_cache is not None:
+            rag_chain = self._with_answer_cache(rag_chain)
 
         # 6. 대화 기록 관리 기능 추가
         conversational_rag_chain = RunnableWithMessageHistory(
@@ -73,5 +140,122 @@ class LLMHandler:
             history_messages_key="chat_history",
             output_messages_key="answer",
         )
+        if self.corpora is not None or (self.title_index is not None and self.docstore is not None):
+            conversational_rag_chain = self._with_title_fast_path(conversational_rag_chain)
+        conversational_rag_chain = self._with_corpus_routing(conversational_rag_chain)
         
-        return conversational_rag_chain
\ No newline at end of file
+        return conversational_rag_chain
+
+    def _with_corpus_routing(self, chain):
+        """
+        세션에서 고정한 모음(configurable.corpus)이 없으면 질문으로 모음을 고르고, 그 모음의 색인 버전
+        (IndexSnapshot)을 한 번만 가져와 configurable.index_snapshot으로 하위 체인에 넘깁니다.
+        고른 모음 이름은 결과의 'corpus'로 돌려줍니다. (stream에서는 첫 조각)
+        """
+        def route(inputs, config):
+            configurable = dict(config.get("configurable", {}))
+            if self.corpora is not None:
+                configurable["corpus"] = self.corpora.route(inputs["input"], configurable.get("corpus"))
+            configurable["index_snapshot"] = self._resolve_snapshot(configurable.get("corpus"))
+            inputs = {**inputs, "persona": persona_prompt(self._persona_for(configurable))}
+            return inputs, {**config, "configurable": configurable}
+
+        def invoke_routed(inputs, config):
+            inputs, config = route(inputs, config)
+            result = chain.invoke(inputs, config=config)
+            if self.corpora is None:
+                return result
+            return {**result, "corpus": config["configurable"]["corpus"]}
+
+        def stream_routed(inputs, config):
+            inputs, config = route(inputs, config)
+            if self.corpora is not None:
+                yield AddableDict(corpus=config["configurable"]["corpus"])
+            yield from chain.stream(inputs, config=config)
+
+        return StreamableLambda(invoke_routed, stream_routed, name="corpus_routing")
+
+    def _with_title_fast_path(self, chain):
+        """
+        "<요리> 레시피" 같은 질문이 제목 색인과 확실히 일치하면 질문 재구성/임베딩/검색/생성을 건너뛰고
+        해당 레시피로 정형화된 답변을 바로 돌려줍니다. 대화 기록에는 일반 답변과 똑같이 남깁니다.
+        """
+        def fast_answer(inputs, config):
+            """제목 색인으로 답할 수 있으면 결과 dict, 아니면 None"""
+            start = time.perf_counter()
+            snapshot = self._index_for(config)
+            title_index, docstore = snapshot.title_index, snapshot.docstore
+            if title_index is None or docstore is None:
+                return None
+            match = title_index.lookup(inputs["input"])
+            document = docstore.mget([match.doc_id])[0] if match is not None else None
+            if document is None:
+                title_index.stats.record(False, time.perf_counter() - start)
+                return None
+
+            answer = format_recipe_answer(document, persona=self._persona_for(config.get("configurable", {})))
+            session_id = config.get("configurable", {}).get("session_id")
+            if session_id is not None:
+                self.get_session_history(session_id).add_messages(
+                    [HumanMessage(content=inputs["input"]), AIMessage(content=answer)]
+                )
+            title_index.stats.record(True, time.perf_counter() - start)
+            return AddableDict(input=inputs["input"], context=[document], answer=answer)
+
+        def invoke_with_fast_path(inputs, config):
+            result = fast_answer(inputs, config)
+            return result if result is not None else chain.invoke(inputs, config=config)
+
+        def stream_with_fast_path(inputs, config):
+            result = fast_answer(inputs, config)
+            if result is not None:
+                yield result
+            else:
+                yield from chain.stream(inputs, config=config)
+
+        return StreamableLambda(invoke_with_fast_path, stream_with_fast_path, name="title_fast_path")
+
+    def _answer_cache_key(self, inputs, config):
+        """
+        레시피 모음과 색인 버전(이름, 배포 시각)마다 답이 다르므로 둘 다 캐시 키에 포함합니다.
+        새 버전이 배포되면 키가 바뀌어 이전 버전으로 만든 답변은 더 이상 쓰이지 않습니다.
+        """
+        scope = []
+        corpus = config.get("configurable", {}).get("corpus")
+        if corpus:
+            scope.append(corpus)
+        version = self._index_for(config).version
+        if version is not None:
+            scope.append(f"{version.name}@{version.published_at}")
+        return f"[{' '.join(scope)}] {inputs['input']}" if scope else inputs["input"]
+
+    def _with_answer_cache(self, rag_chain):
+        """대화 기록이 없는 첫 질문은 공유 답변 캐시를 먼저 확인하고, 없으면 체인을 실행해 저장합니다."""
+        def invoke_with_cache(inputs, config):
+            if inputs.get("chat_history"):
+                return rag_chain.invoke(inputs, config=config)
+            key = self._answer_cache_key(inputs, config)
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                return {**inputs, "context": [], "answer": cached}
+            result = rag_chain.invoke(inputs, config=config)
+            self.answer_cache.put(key, result["answer"])
+            return result
+
+        def stream_with_cache(inputs, config):
+            if inputs.get("chat_history"):
+                yield from rag_chain.stream(inputs, config=config)
+                return
+            key = self._answer_cache_key(inputs, config)
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                yield AddableDict(inputs, context=[], answer=cached)
+                return
+            # 답변 조각을 그대로 내보내면서 모아 두었다가, 끝까지 받은 답변만 캐시에 저장
+            answer = []
+            for chunk in rag_chain.stream(inputs, config=config):
+                answer.append(chunk.get("answer", ""))
+                yield chunk
+            self.answer_cache.put(key, "".join(answer))
+
+        return StreamableLambda(invoke_with_cache, stream_with_cache, name="answer_cache")
\ No newline at end of file
@@ -0,0 +1,196 @@
+# modules/pipeline.py
+import hashlib
+import inspect
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from . import config
+
+
+def hash_path(path, digest=None):
+    """파일/폴더 내용을 해시에 반영합니다. 폴더는 하위 파일을 이름 순으로 모두 반영합니다."""
+    digest = digest or hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                hash_path(file_path, digest)
+    elif os.path.exists(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        digest.update(b'<missing>')
+    return digest
+
+
+class Stage:
+    """
+    파이프라인의 한 단계.
+
+    Args:
+        name (str): 단계 이름 (캐시 manifest 파일 이름으로도 사용)
+        run (callable): 인자 없이 호출되는 실행 함수. 병렬 실행 시 pickle 가능해야 함
+        inputs (list[str]): 내용을 해시할 입력 파일/폴더
+        outputs (list[str]): 생성되는 파일/폴더
+        params (dict): 결과에 영향을 주는 설정값 (임계값, 청크 크기 등)
+        code (list[module]): 소스 코드 변경을 감지할 모듈
+        deps (list[str]): 먼저 실행되어야 하는 단계 이름
+        trust_existing_outputs (bool): 크롤링처럼 재현할 수 없는 단계는 결과가 있으면 그대로 사용
+        items (callable): 처리한 항목 수를 돌려주는 함수 (프로파일링 시 처리량 계산용, 실행 후 호출)
+    """
+    def __init__(self, name, run, inputs=(), outputs=(), params=None, code=(), deps=(),
+                 trust_existing_outputs=False, items=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.code = list(code)
+        self.deps = list(deps)
+        self.trust_existing_outputs = trust_existing_outputs
+        self.items = items
+
+    def fingerprint(self):
+        digest = hashlib.sha256(self.name.encode('utf-8'))
+        digest.update(json.dumps(self.params, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        for module in self.code:
+            hash_path(inspect.getsourcefile(module), digest)
+        for path in sorted(self.inputs):
+            digest.update(path.encode('utf-8'))
+            hash_path(path, digest)
+        return digest.hexdigest()
+
+    def outputs_exist(self):
+        return all(
+            os.path.exists(path) and (not os.path.isdir(path) or os.listdir(path))
+            for path in self.outputs
+        )
+
+
+class Pipeline:
+    """
+    입력 내용/설정/코드 해시(fingerprint)가 바뀐 단계만 다시 실행하는 파이프라인.
+    서로 의존하지 않는 단계(예: 크롤링 파일별 정제)는 여러 프로세스에서 동시에 실행합니다.
+    profiler(PipelineProfiler)를 넘기면 실행되는 단계마다 시간/메모리/처리량을 기록합니다.
+    """
+    def __init__(self, stages, cache_dir=config.PIPELINE_CACHE_DIR, max_workers=None, profiler=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.profiler = profiler
+
+    def _manifest_path(self, stage):
+        return os.path.join(self.cache_dir, re.sub(r'[^\w.-]', '_', stage.name) + '.json')
+
+    def _has_manifest(self, stage):
+        return os.path.exists(self._manifest_path(stage))
+
+    def _cached_fingerprint(self, stage):
+        try:
+            with open(self._manifest_path(stage), 'r', encoding='utf-8') as f:
+                return json.load(f).get('fingerprint')
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, stage, fingerprint):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._manifest_path(stage), 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'outputs': stage.outputs, 'params': stage.params},
+                      f, ensure_ascii=False, indent=2, default=str)
+
+    def _levels(self):
+        # 의존성이 모두 끝난 단계끼리 묶어서 차례대로 실행
+        done, levels = set(), []
+        remaining = dict(self.stages)
+        while remaining:
+            level = [s for s in remaining.values() if all(d in done or d not in self.stages for d in s.deps)]
+            if not level:
+                raise ValueError(f"파이프라인 단계 사이에 순환 의존성이 있습니다: {list(remaining)}")
+            levels.append(level)
+            for stage in level:
+                done.add(stage.name)
+                del remaining[stage.name]
+        return levels
+
+    def _reason(self, stage, dirty_upstream, forced, dry_run=False):
+        """
+        단계를 다시 실행해야 하는 이유. 필요 없으면 None.
+        dirty_upstream은 이번 실행에서 다시 만들어진(dry_run이면 다시 만들어질) 상위 단계입니다.
+        """
+        if stage.name in forced:
+            return "강제 재실행"
+        if stage.trust_existing_outputs:
+            return None if stage.outputs_exist() else "결과 없음"
+        if not stage.outputs_exist():
+            return "결과 없음"
+        if not self._has_manifest(stage):
+            # 파이프라인 도입 전에 만들어진 결과는 그대로 캐시로 등록하지만,
+            # 상위 단계가 이번에 다시 만들어졌다면 그 결과가 새 입력으로 만들어졌다는 보장이 없으므로 다시 만듦
+            if dirty_upstream:
+                return f"캐시 기록 없음, 상위 단계 변경 ({', '.join(dirty_upstream)})"
+            return None
+        cached = self._cached_fingerprint(stage)
+        if cached is None:
+            return "이전 실행이 끝나지 않음"
+        # dry-run에서는 상위 단계 결과가 아직 없으므로 상위가 바뀌면 하위도 다시 만든다고 봄
+        if dry_run and dirty_upstream:
+            return f"상위 단계 변경 ({', '.join(dirty_upstream)})"
+        if cached != stage.fingerprint():
+            return "입력/설정/코드 변경"
+        return None
+
+    def run(self, dry_run=False, force=()):
+        """
+        Args:
+            dry_run (bool): 실행하지 않고 다시 만들어질 단계만 출력
+            force (iterable[str]): 캐시와 상관없이 다시 실행할 단계 이름
+
+        Returns:
+            list[str]: 실행된(dry_run이면 실행될) 단계 이름
+        """
+        forced = set(force)
+        rebuilt = []
+        for level in self._levels():
+            pending = []
+            for stage in level:
+                dirty_upstream = [d for d in stage.deps if d in rebuilt]
+                reason = self._reason(stage, dirty_upstream, forced, dry_run)
+                if reason is None:
+                    if not dry_run and not self._has_manifest(stage):
+                        print(f"INFO: [{stage.name}] 기존 결과를 캐시로 등록합니다.")
+                        self._write_manifest(stage, stage.fingerprint())
+                    else:
+                        print(f"INFO: [{stage.name}] 캐시 사용 (변경 없음)")
+                    if not dry_run and self.profiler is not None:
+                        self.profiler.record_cached(stage)
+                    continue
+                print(f"INFO: [{stage.name}] {'다시 만들 예정' if dry_run else '실행'} - {reason}")
+                pending.append(stage)
+            if not dry_run:
+                self._execute(pending)
+            rebuilt.extend(stage.name for stage in pending)
+        return rebuilt
+
+    def _execute(self, stages):
+        # 결과를 만든 입력 상태의 fingerprint를 실행 전에 계산하고, 끝나기 전에는 '실행 중' manifest를 남겨
+        # 중간에 실패한 결과가 다음 실행에서 캐시로 쓰이지 않도록 함
+        fingerprints = [stage.fingerprint() for stage in stages]
+        for stage in stages:
+            self._write_manifest(stage, None)
+        runs = [self.profiler.wrap(stage) if self.profiler else stage.run for stage in stages]
+        if len(stages) > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [(stage, executor.submit(run)) for stage, run in zip(stages, runs)]
+                results = [(stage, future.result()) for stage, future in futures]
+        else:
+            results = [(stage, run()) for stage, run in zip(stages, runs)]
+        if self.profiler is not None:
+            for stage, (result, profile) in results:
+                self.profiler.record(stage, result, profile)
+        for stage, fingerprint in zip(stages, fingerprints):
+            self._write_manifest(stage, fingerprint)
@@ -3,22 +3,76 @@ import json
 import re
 import os
 import glob
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher # --- 추가된 부분 ---
 from . import config # --- 추가된 부분 ---
+from .recipe_store import build_combined_text, write_records, report_format_stats
+from .ingredient_index import IngredientIndex
+from .profiler import substep
 
 # --- 추가된 부분: 유사도 계산 헬퍼 함수 ---
 def similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
+class TitleSimilarityIndex:
+    """
+    새 제목과 similarity > threshold인 제목이 이미 있는지 확인하는 색인.
+    모든 제목과 SequenceMatcher로 비교한 결과와 같지만, 공통 글자 수로 구한 유사도 상한
+    (2 * 공통 글자 수 / 길이 합)이 threshold를 넘는 후보만 실제로 비교합니다.
+    """
+    def __init__(self, threshold=config.SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.titles = []
+        self._postings = defaultdict(list)  # 글자 → [(제목 위치, 등장 횟수)]
+        self._has_empty = False
+
+    def add(self, title):
+        position = len(self.titles)
+        self.titles.append(title)
+        if not title:
+            self._has_empty = True
+        for char, count in Counter(title).items():
+            self._postings[char].append((position, count))
+
+    def remove(self, title):
+        """가장 최근에 add한 같은 제목을 비교 대상에서 뺍니다. (색인에 실패한 스트리밍 레시피를 되돌릴 때)"""
+        for position in range(len(self.titles) - 1, -1, -1):
+            if self.titles[position] == title:
+                self.titles[position] = None  # 글자 postings는 남지만 비교할 때 건너뜀
+                break
+        if not title:
+            self._has_empty = '' in self.titles
+
+    def is_duplicate(self, title):
+        if not title:
+            return self._has_empty  # 빈 제목끼리의 유사도는 1.0
+        overlaps = defaultdict(int)
+        for char, count in Counter(title).items():
+            for position, other_count in self._postings.get(char, ()):
+                overlaps[position] += min(count, other_count)
+        for position, overlap in overlaps.items():
+            other = self.titles[position]
+            if other is None:
+                continue
+            if 2 * overlap / (len(title) + len(other)) > self.threshold:
+                with substep("dedup.SequenceMatcher"):
+                    if similarity(title, other) > self.threshold:
+                        return True
+        return False
+
+
+# 크롤링한 레시피 제목에서 지우는 단어 (질문 정규화에서도 사용)
+TITLE_STOP_WORDS = ['백종원', '레시피', '만들기', '만드는 법', '황금레시피', '꿀맛이네',
+                    '초간단', '밑반찬', '백파더', '골목식당']
+
+
 class DataPreprocessor:
     """
     폴더의 모든 JSON을 읽어 전처리하고, 제목 유사도를 기반으로 중복을 제거한 뒤 
     하나의 파일로 저장하는 클래스.
     """
     def clean_title(self, title):
-        stop_words = ['백종원', '레시피', '만들기', '만드는 법', '황금레시피', '꿀맛이네', 
-                      '초간단', '밑반찬', '백파더', '골목식당']
-        for word in stop_words:
+        for word in TITLE_STOP_WORDS:
             title = title.replace(word, '')
         title = re.sub(r'\([^)]*\)', '', title) # 괄호와 내용 제거
         title = re.sub(r'\[[^)]*\]', '', title) # 대괄호와 내용 제거
@@ -32,43 +86,63 @@ class DataPreprocessor:
         cleaned = re.sub(r'(\s*,\s*)+', ', ', cleaned)
         return cleaned.strip(' ,')
 
+    def clean_file(self, file_path):
+        """
+        크롤링 JSON 파일 하나를 읽어 제목/재료를 정리합니다. (파일 단위라 병렬 처리 가능)
+
+        Returns:
+            List[dict]: 정리된 레시피 리스트 (읽기 실패 시 빈 리스트)
+        """
+        try:
+            with substep("json.load"), open(file_path, 'r', encoding='utf-8') as f:
+                recipes = json.load(f)
+        except Exception as e:
+            print(f"WARNING: '{file_path}' 파일을 읽는 중 오류 발생: {e}")
+            return []
+
+        for recipe in recipes:
+            self.clean_recipe(recipe)
+        return recipes
+
+    def clean_recipe(self, recipe):
+        """레시피 하나의 제목/재료를 정리합니다. (스트리밍 수집에서도 사용)"""
+        # 최종 제목은 원본 제목이 아닌 깨끗한 제목으로 저장
+        with substep("clean_title"):
+            recipe['title'] = self.clean_title(recipe.get('title', ''))
+        with substep("clean_ingredients"):
+            recipe['ingredients'] = self.clean_ingredients(recipe.get('ingredients', ''))
+        return recipe
+
     # --- 👇 여기가 핵심 수정 부분입니다! (run 메서드 전체 수정) 👇 ---
-    def run(self, input_dir, output_filepath, threshold=config.SIMILARITY_THRESHOLD):
-        # 1. 모든 JSON 파일 로드 및 병합
-        json_files = glob.glob(os.path.join(input_dir, '*.json'))
+    def run(self, input_dir, output_filepath, threshold=config.SIMILARITY_THRESHOLD, record_filepath=None,
+            ingredient_index_filepath=None):
+        # 1. 모든 JSON 파일 로드 및 정리 (파일 순서를 고정해 중복 제거 결과가 항상 같도록 함)
+        json_files = sorted(glob.glob(os.path.join(input_dir, '*.json')))
         if not json_files:
             print(f"WARNING: '{input_dir}' 폴더에 JSON 파일이 없어 전처리를 건너뜁니다.")
             return False
         
         all_recipes = []
         for file_path in json_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    all_recipes.extend(json.load(f))
-            except Exception as e:
-                print(f"WARNING: '{file_path}' 파일을 읽는 중 오류 발생: {e}")
-        
+            all_recipes.extend(self.clean_file(file_path))
+        return self.merge(all_recipes, output_filepath, threshold, record_filepath, ingredient_index_filepath)
+
+    def merge(self, all_recipes, output_filepath, threshold=config.SIMILARITY_THRESHOLD, record_filepath=None,
+              ingredient_index_filepath=None):
+        """정리된 레시피들을 제목 유사도로 중복 제거한 뒤 하나의 파일로 저장합니다."""
         print(f"INFO: 총 {len(all_recipes)}개의 레시피를 불러왔습니다. 이제 중복 제거를 시작합니다.")
 
         # 2. 제목 유사도 기반 중복 제거
         unique_recipes = []
         removed_count = 0
-        
-        # 먼저 모든 레시피의 제목을 깨끗하게 정리
-        for recipe in all_recipes:
-            recipe['cleaned_title'] = self.clean_title(recipe.get('title', ''))
+        titles = TitleSimilarityIndex(threshold)
 
-        for recipe in all_recipes:
-            is_duplicate = False
-            for unique_recipe in unique_recipes:
+        with substep("dedup"):
+            for recipe in all_recipes:
                 # 깨끗한 제목끼리 비교
-                sim_score = similarity(recipe['cleaned_title'], unique_recipe['cleaned_title'])
-                if sim_score > threshold:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                unique_recipes.append(recipe)
+                if not titles.is_duplicate(recipe['title']):
+                    titles.add(recipe['title'])
+                    unique_recipes.append(recipe)
         
         removed_count = len(all_recipes) - len(unique_recipes)
         print(f"INFO: 중복 제거 완료! {removed_count}개의 중복 레시피를 제거했습니다.")
@@ -76,26 +150,50 @@ class DataPreprocessor:
 
         # 3. 살아남은 고유 레시피들만 최종 손질 및 저장
         final_processed_recipes = []
-        for recipe in unique_recipes:
-            # 재료 손질
-            recipe['ingredients'] = self.clean_ingredients(recipe.get('ingredients', ''))
-            
-            # 최종 제목은 원본 제목이 아닌 깨끗한 제목으로 저장
-            recipe['title'] = recipe['cleaned_title']
-
-            # combined_text 생성
-            combined_text = (f"요리 제목: {recipe['title']}\n"
-                             f"필요한 재료: {recipe['ingredients']}\n"
-                             f"만드는 법: {recipe.get('steps', '')}")
-            recipe['combined_text'] = combined_text
-
-            # 임시로 사용한 'cleaned_title' 키는 제거
-            del recipe['cleaned_title']
-            final_processed_recipes.append(recipe)
+        with substep("combined_text"):
+            for recipe in unique_recipes:
+                # combined_text 생성
+                recipe['combined_text'] = build_combined_text(recipe)
+                final_processed_recipes.append(recipe)
             
         os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
-        with open(output_filepath, 'w', encoding='utf-8') as f:
+        with substep("json.dump"), open(output_filepath, 'w', encoding='utf-8') as f:
             json.dump(final_processed_recipes, f, ensure_ascii=False, indent=4)
             
         print(f"SUCCESS: 최종 데이터 처리 완료! '{output_filepath}'에 저장했습니다.")
-        return True
\ No newline at end of file
+
+        # 압축 레코드 형식도 요청된 경우 함께 저장 (combined_text는 저장하지 않음)
+        if record_filepath:
+            with substep("write_records"):
+                write_records(final_processed_recipes, record_filepath)
+            print(f"SUCCESS: 압축 레코드 형식으로 '{record_filepath}'에 저장했습니다.")
+            report_format_stats(output_filepath, record_filepath)
+
+        # 재료를 이름/수량/단위로 파싱해 재료 → 레시피 역색인 생성
+        if ingredient_index_filepath:
+            with substep("ingredient_index"):
+                ingredient_index = IngredientIndex.build(final_processed_recipes)
+                ingredient_index.save(ingredient_index_filepath)
+            print(f"SUCCESS: 재료 색인({len(ingredient_index.postings)}개 재료) 생성 완료! '{ingredient_index_filepath}'에 저장했습니다.")
+        return True
+
+
+def clean_crawl_file(input_path, output_path):
+    """파이프라인에서 크롤링 파일 하나를 정리해 중간 결과로 저장합니다. (프로세스 병렬 실행용)"""
+    recipes = DataPreprocessor().clean_file(input_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(recipes, f, ensure_ascii=False)
+    return len(recipes)
+
+
+def merge_cleaned_files(cleaned_paths, output_filepath, threshold=config.SIMILARITY_THRESHOLD,
+                        record_filepath=None, ingredient_index_filepath=None):
+    """정리된 중간 결과 파일들을 순서대로 합쳐 중복 제거/저장합니다."""
+    all_recipes = []
+    for path in cleaned_paths:
+        with substep("json.load"), open(path, 'r', encoding='utf-8') as f:
+            all_recipes.extend(json.load(f))
+    if not all_recipes:
+        raise RuntimeError("전처리할 레시피가 없습니다.")
+    return DataPreprocessor().merge(all_recipes, output_filepath, threshold, record_filepath, ingredient_index_filepath)
\ No newline at end of file
@@ -0,0 +1,274 @@
+# modules/profiler.py
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+from . import config
+
+try:
+    import resource
+except ImportError:  # Windows에는 resource 모듈이 없음 (최대 RSS는 생략)
+    resource = None
+
+
+def peak_rss_bytes():
+    """이 프로세스가 지금까지 사용한 최대 RSS. 알 수 없으면 None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux는 KB, macOS는 바이트 단위
+
+
+def current_rss_bytes():
+    """이 프로세스의 현재 RSS (/proc 기준). 알 수 없으면 None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Recorder:
+    """ProfiledRun이 실행되는 동안 이 프로세스의 세부 단계 시간과 다른 스레드의 cProfile 결과를 모읍니다."""
+    def __init__(self, use_cprofile):
+        self.use_cprofile = use_cprofile
+        self.thread_id = threading.get_ident()
+        self.substeps = {}  # 이름 → [벽시계 시간(초), 호출 수] (처음 기록된 순서 유지)
+        self.thread_profiles = []
+        self._lock = threading.Lock()
+
+    def add_substep(self, name, seconds, calls=1):
+        with self._lock:
+            entry = self.substeps.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def add_profile(self, profiler):
+        with self._lock:
+            self.thread_profiles.append(profiler)
+
+
+_recorder = None  # 측정 중인 ProfiledRun의 기록 (측정 중이 아니면 None)
+
+
+class _Substep:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.recorder.add_substep(self.name, 0.0, calls=0)  # 바깥 작업이 안쪽 작업보다 먼저 표시되도록 시작할 때 등록
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add_substep(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def substep(name):
+    """
+    단계 안의 세부 작업 시간을 잽니다. 측정 중이 아니면 아무것도 하지 않습니다.
+    같은 이름은 합산되므로 레시피마다 부르는 작은 작업에도 쓸 수 있습니다.
+
+    사용 예: with substep("embed"): vectors = embeddings.embed_documents(texts)
+    """
+    recorder = _recorder
+    return _Substep(recorder, name) if recorder is not None else nullcontext()
+
+
+def run_profiled(fn, *args, **kwargs):
+    """
+    다른 스레드(스케줄러 작업 스레드 등)에서 fn을 실행할 때 cProfile 기록을 단계의 .prof에 합칩니다.
+    측정 중이 아니거나 cProfile을 쓰지 않으면 fn을 그대로 실행합니다.
+    """
+    recorder = _recorder
+    if recorder is None or not recorder.use_cprofile or threading.get_ident() == recorder.thread_id:
+        return fn(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12부터는 프로파일러가 프로세스에 하나뿐이고, 단계의 프로파일러가 이미 모든 스레드를 기록함
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        recorder.add_profile(profiler)
+
+
+class StageProfile:
+    """단계 하나의 실행 시간/메모리 측정 결과 (작업 프로세스에서 돌려받을 수 있도록 단순한 값만 보관)"""
+    def __init__(self, name, wall_seconds, cpu_seconds, peak_alloc_bytes, peak_rss_bytes, pid, prof_path=None):
+        self.name = name
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.peak_alloc_bytes = peak_alloc_bytes
+        self.peak_rss_bytes = peak_rss_bytes
+        self.pid = pid
+        self.prof_path = prof_path
+        self.items = None
+        self.input_bytes = 0
+        self.substeps = []  # [(이름, 벽시계 시간(초), 호출 수)]
+
+    @property
+    def throughput(self):
+        if not self.items or not self.wall_seconds:
+            return None
+        return self.items / self.wall_seconds
+
+    def to_dict(self):
+        return {
+            'stage': self.name, 'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+            'peak_alloc_bytes': self.peak_alloc_bytes, 'peak_rss_bytes': self.peak_rss_bytes,
+            'items': self.items, 'items_per_second': self.throughput, 'input_bytes': self.input_bytes,
+            'substeps': [{'name': name, 'wall_seconds': seconds, 'calls': calls}
+                         for name, seconds, calls in self.substeps],
+        }
+
+
+class ProfiledRun:
+    """
+    stage.run을 감싸 벽시계/CPU 시간, tracemalloc 최대 할당량, 최대 RSS를 재고 (결과, StageProfile)을 돌려줍니다.
+    병렬 단계는 작업 프로세스 안에서 실행되므로 이 객체도 pickle 가능해야 합니다.
+    실행 중에는 substep()으로 잰 세부 작업 시간을 모으고, cProfile은 run_profiled()로 실행된 다른 스레드
+    (스케줄러 작업 스레드의 임베딩/LLM 호출 등)의 기록까지 합쳐 .prof로 저장합니다.
+    """
+    def __init__(self, name, run, prof_path=None):
+        self.name = name
+        self.run = run
+        self.prof_path = prof_path
+
+    def __call__(self):
+        global _recorder
+        recorder = _recorder = _Recorder(use_cprofile=self.prof_path is not None)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if self.prof_path else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = self.run()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            _, peak_alloc = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            _recorder = None
+        if profiler is not None:
+            os.makedirs(os.path.dirname(self.prof_path), exist_ok=True)
+            stats = pstats.Stats(profiler)
+            if recorder.thread_profiles:
+                stats.add(*recorder.thread_profiles)
+            stats.dump_stats(self.prof_path)
+        profile = StageProfile(self.name, wall, cpu, peak_alloc, peak_rss_bytes(), os.getpid(), self.prof_path)
+        profile.substeps = [(name, seconds, calls) for name, (seconds, calls) in recorder.substeps.items()]
+        return result, profile
+
+
+class PipelineProfiler:
+    """
+    Pipeline에 넘기면 실행되는 단계마다 시간/메모리/처리량을 모아, 표로 출력하고 리포트 파일로 저장합니다.
+    실행마다 한 줄씩 history.jsonl에 쌓이므로 크롤링 데이터가 늘어날 때 실행끼리 비교할 수 있습니다.
+
+    Args:
+        use_cprofile (bool): 단계별 cProfile 결과(.prof)와 누적 시간 상위 함수를 리포트에 포함
+    """
+    def __init__(self, report_dir=config.PROFILE_DIR, use_cprofile=False, top_functions=15):
+        self.report_dir = report_dir
+        self.use_cprofile = use_cprofile
+        self.top_functions = top_functions
+        self.run_id = time.strftime('%Y%m%d-%H%M%S')
+        self.profiles = []
+        self.cached = []  # 캐시를 써서 측정하지 못한 단계 이름
+
+    def wrap(self, stage):
+        prof_path = None
+        if self.use_cprofile:
+            filename = re.sub(r'[^\w.-]', '_', stage.name) + '.prof'
+            prof_path = os.path.join(self.report_dir, self.run_id, filename)
+        return ProfiledRun(stage.name, stage.run, prof_path)
+
+    def record(self, stage, result, profile):
+        """실행 결과를 기록합니다. 처리 건수는 단계의 items 함수, 없으면 실행 함수가 돌려준 정수를 사용"""
+        if stage.items is not None:
+            profile.items = stage.items()
+        elif isinstance(result, int) and not isinstance(result, bool):
+            profile.items = result
+        profile.input_bytes = sum(_path_bytes(path) for path in stage.inputs)
+        self.profiles.append(profile)
+
+    def record_cached(self, stage):
+        """캐시를 써서 실행하지 않은(측정하지 못한) 단계를 표에 따로 표시하도록 기록합니다."""
+        self.cached.append(stage.name)
+
+    def table(self):
+        # 한글은 폭이 2칸이라 열이 어긋나므로 머리글은 영문으로 표시
+        header = (f"{'stage':<28}{'wall(s)':>9}{'CPU(s)':>9}{'CPU%':>6}{'alloc MB':>10}{'RSS MB':>9}"
+                  f"{'items':>8}{'items/s':>9}")
+        lines = [header, '-' * len(header)]
+        for p in self.profiles:
+            rss = f"{p.peak_rss_bytes / 2**20:.0f}" if p.peak_rss_bytes is not None else '-'
+            lines.append(
+                f"{p.name[:27]:<28}{p.wall_seconds:>9.2f}{p.cpu_seconds:>9.2f}"
+                f"{p.cpu_seconds / p.wall_seconds if p.wall_seconds else 0:>6.0%}"
+                f"{p.peak_alloc_bytes / 2**20:>10.1f}{rss:>9}"
+                f"{p.items if p.items is not None else '-':>8}"
+                f"{f'{p.throughput:.1f}' if p.throughput else '-':>9}"
+            )
+            # 세부 작업은 벽시계 시간과 단계 시간 중 비율, 호출 수만 표시
+            for name, seconds, calls in p.substeps:
+                lines.append(f"{('  - ' + name)[:27]:<28}{seconds:>9.2f}{'':>9}"
+                             f"{seconds / p.wall_seconds if p.wall_seconds else 0:>6.0%}{'':>19}{calls:>8}")
+        for name in self.cached:
+            lines.append(f"{name[:27]:<28}{'cached, not measured':>{len(header) - 28}}")
+        lines.append('-' * len(header))
+        lines.append(f"{'total':<28}{sum(p.wall_seconds for p in self.profiles):>9.2f}"
+                     f"{sum(p.cpu_seconds for p in self.profiles):>9.2f}")
+        return '\n'.join(lines)
+
+    def report(self):
+        """표를 출력하고 리포트 파일(.txt)과 실행 기록(history.jsonl)을 저장합니다. 실행된 단계가 없으면 None."""
+        if not self.profiles:
+            return None
+        table = self.table()
+        print("\n--- 단계별 프로파일 (병렬 단계의 RSS는 작업 프로세스 기준, 측정 중에는 tracemalloc 때문에 느려짐) ---")
+        print("    ('- ' 행은 세부 작업: 벽시계 시간, 단계 시간 중 비율, 호출 수)")
+        print(table)
+
+        sections = [f"run: {self.run_id}", table]
+        for p in self.profiles:
+            if p.prof_path and os.path.exists(p.prof_path):
+                out = io.StringIO()
+                pstats.Stats(p.prof_path, stream=out).sort_stats('cumulative').print_stats(self.top_functions)
+                sections.append(f"=== {p.name} (누적 시간 상위 {self.top_functions}개, {p.prof_path}) ===\n"
+                                f"{out.getvalue()}")
+        os.makedirs(self.report_dir, exist_ok=True)
+        report_path = os.path.join(self.report_dir, f"profile_{self.run_id}.txt")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(sections))
+        with open(os.path.join(self.report_dir, "history.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'run': self.run_id, 'stages': [p.to_dict() for p in self.profiles],
+                                'cached': self.cached}, ensure_ascii=False) + '\n')
+        print(f"SUCCESS: 프로파일 리포트를 '{report_path}'에 저장했습니다.")
+        return report_path
+
+
+def _path_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path) if os.path.exists(path) else 0
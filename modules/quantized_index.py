@@ -0,0 +1,276 @@
+# modules/quantized_index.py
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_chroma import Chroma
+from langchain_core.vectorstores import VectorStore
+
+from . import config
+
+# 바이트 값(0~255)별 1비트 개수 (이진 코드의 해밍 거리 계산용)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+# 후보 점수 계산 시 한 번에 다루는 임시 블록 크기
+_BLOCK_BYTES = 4 * 2**20
+
+
+def _block_rows(row_bytes):
+    return max(1, _BLOCK_BYTES // row_bytes)
+
+
+class QuantizedIndex:
+    """
+    자식 청크 벡터를 int8(스칼라 양자화) / 1bit(이진 양자화) 코드로 메모리에 들고,
+    후보를 뽑은 뒤 디스크의 원본 float32 벡터(memmap)로 정확한 점수를 다시 계산(rescore)하는 색인.
+
+    저장 파일:
+        meta.json      id 목록, 차원 수
+        vectors.f32    정규화된 원본 벡터 [n, dim] (memmap으로만 읽음)
+        codes.i8       int8 코드 [n, dim]
+        scales.f32     벡터별 int8 스케일 [n]
+        bits.u8        부호 비트 코드 [n, ceil(dim / 8)]
+    """
+    def __init__(self, path, ids, vectors, codes, scales, bits):
+        self.path = path
+        self.ids = ids
+        self.vectors = vectors
+        self.codes = codes
+        self.scales = scales
+        self.bits = bits
+        self._lock = threading.Lock()  # add가 배열을 바꾸는 동안 검색이 길이가 다른 배열을 섞어 읽지 않도록
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def _quantize(cls, vectors):
+        """(정규화된 원본, int8 코드, 스케일, 부호 비트) - 저장 파일 순서와 같음"""
+        vectors = cls._normalize(vectors)
+        scales = (np.abs(vectors).max(axis=1) / 127.0).astype(np.float32)
+        codes = np.round(vectors / np.maximum(scales[:, None], 1e-12)).astype(np.int8)
+        bits = np.packbits(vectors > 0, axis=1)
+        return vectors, codes, scales, bits
+
+    @staticmethod
+    def _write(path, arrays, ids, dim, mode='wb'):
+        for name, array in zip(('vectors.f32', 'codes.i8', 'scales.f32', 'bits.u8'), arrays):
+            with open(os.path.join(path, name), mode) as f:
+                array.tofile(f)
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'ids': list(ids), 'dim': int(dim)}, f)
+
+    @classmethod
+    def build(cls, ids, vectors, path=config.QUANTIZED_INDEX_DIR):
+        """벡터를 정규화/양자화해서 path 폴더에 저장하고 색인을 불러옵니다."""
+        os.makedirs(path, exist_ok=True)
+        arrays = cls._quantize(vectors)
+        cls._write(path, arrays, ids, arrays[0].shape[1])
+        return cls.load(path)
+
+    def add(self, ids, vectors):
+        """새 벡터를 양자화해서 색인 파일 끝에 덧붙입니다. (기존 벡터는 다시 읽거나 양자화하지 않음)"""
+        arrays = self._quantize(vectors)
+        with self._lock:
+            # 파일 끝에 덧붙이기만 하므로 이미 열린 memmap은 그대로 유효
+            self._write(self.path, arrays, list(self.ids) + list(ids), self.vectors.shape[1], mode='ab')
+            fresh = self.load(self.path)
+            self.ids, self.vectors, self.codes, self.scales, self.bits = (
+                fresh.ids, fresh.vectors, fresh.codes, fresh.scales, fresh.bits)
+
+    @classmethod
+    def build_from_chroma(cls, vectorstore, path=config.QUANTIZED_INDEX_DIR, batch_size=5000):
+        """Chroma 컬렉션에 저장된 자식 청크 벡터로 색인을 만듭니다. (임베딩 API 재호출 없음)"""
+        ids, vectors = [], []
+        offset = 0
+        while True:
+            batch = vectorstore.get(include=["embeddings"], limit=batch_size, offset=offset)
+            if not batch['ids']:
+                break
+            ids.extend(batch['ids'])
+            vectors.extend(batch['embeddings'])
+            offset += len(batch['ids'])
+        if not ids:
+            print("ERROR: 양자화할 벡터가 없습니다.")
+            return None
+        print(f"INFO: {len(ids)}개의 자식 청크 벡터를 양자화합니다.")
+        return cls.build(ids, vectors, path)
+
+    @classmethod
+    def load(cls, path=config.QUANTIZED_INDEX_DIR):
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            print(f"WARNING: '{path}'에 양자화 색인이 없습니다.")
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        n, dim = len(meta['ids']), meta['dim']
+        # 원본 벡터는 memmap으로 열어두고 rescore할 후보 행만 디스크에서 읽음
+        vectors = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='r', shape=(n, dim))
+        codes = np.fromfile(os.path.join(path, 'codes.i8'), dtype=np.int8).reshape(n, dim)
+        scales = np.fromfile(os.path.join(path, 'scales.f32'), dtype=np.float32)
+        bits = np.fromfile(os.path.join(path, 'bits.u8'), dtype=np.uint8).reshape(n, -1)
+        return cls(path, meta['ids'], vectors, codes, scales, bits)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def memory_bytes(self, mode=None):
+        """검색 시 메모리에 올라가는 코드 크기 (mode가 None이면 원본 float32 기준)"""
+        if mode == 'int8':
+            return self.codes.nbytes + self.scales.nbytes
+        if mode == 'binary':
+            return self.bits.nbytes
+        return len(self.ids) * self.vectors.shape[1] * 4
+
+    @staticmethod
+    def _candidates(query, mode, n_candidates, codes, scales, bits):
+        # 코드 행렬 전체를 한 번에 변환하면 원본 벡터만큼의 임시 배열이 생기므로, 고정 크기 행 블록씩 점수를 계산
+        scores = np.empty(len(scales), dtype=np.float32)
+        if mode == 'binary':
+            query_bits = np.packbits(query > 0)
+            rows = _block_rows(bits.shape[1])
+            for start in range(0, len(scores), rows):
+                block = np.bitwise_xor(bits[start:start + rows], query_bits)
+                scores[start:start + rows] = -_POPCOUNT[block].sum(axis=1, dtype=np.int32)
+        else:
+            rows = _block_rows(codes.shape[1] * 4)
+            for start in range(0, len(scores), rows):
+                block = codes[start:start + rows].astype(np.float32)
+                scores[start:start + rows] = (block @ query) * scales[start:start + rows]
+        n_candidates = min(n_candidates, len(scores))
+        return np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+
+    def search(self, query_vector, k=4, mode=None, oversample=None):
+        """
+        Args:
+            query_vector: 질문 임베딩
+            k (int): 돌려줄 개수
+            mode (str): 'int8' | 'binary' | 'exact'(원본 벡터 전체 비교)
+            oversample (int): rescore할 후보 수 = k * oversample
+
+        Returns:
+            List[Tuple[str, float]]: (청크 id, 코사인 유사도)
+        """
+        mode = mode or config.QUANTIZATION_MODE
+        oversample = oversample or config.RESCORE_OVERSAMPLE
+        query = self._normalize(query_vector)
+        with self._lock:
+            ids, vectors, codes, scales, bits = self.ids, self.vectors, self.codes, self.scales, self.bits
+        if mode == 'exact':
+            candidates = np.arange(len(ids))
+        else:
+            candidates = np.sort(self._candidates(query, mode, k * oversample, codes, scales, bits))
+        scores = vectors[candidates] @ query
+        order = np.argsort(-scores)[:k]
+        return [(ids[candidates[i]], float(scores[i])) for i in order]
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+
+class QuantizedVectorStore(VectorStore):
+    """
+    양자화 색인으로 후보를 찾고, 문서 내용/메타데이터는 기존 Chroma에서 id로 가져오는 벡터 저장소.
+    ParentDocumentRetriever의 vectorstore 자리에 그대로 넣어 쓸 수 있습니다.
+    청크를 추가하면 한 번만 임베딩해서 Chroma(본문/메타데이터/원본 벡터)와 양자화 색인에 함께 넣습니다.
+    """
+    def __init__(self, vectorstore, index, mode=None):
+        self.vectorstore = vectorstore
+        self.index = index
+        self.mode = mode or config.QUANTIZATION_MODE
+
+    @property
+    def embeddings(self):
+        return self.vectorstore.embeddings
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        hits = self.index.search(self.embeddings.embed_query(query), k=k, mode=self.mode)
+        if not hits:
+            return []
+        ids = [chunk_id for chunk_id, _ in hits]
+        found = self.vectorstore.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found['ids'], found['documents'], found['metadatas'])
+        }
+        return [(by_id[chunk_id], score) for chunk_id, score in hits if chunk_id in by_id]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    @staticmethod
+    def _store(vectorstore, embedding, texts, metadatas=None, ids=None):
+        """텍스트를 임베딩해서 Chroma에 저장하고 (id 목록, 벡터)를 돌려줍니다."""
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = embedding.embed_documents(texts)
+        vectorstore._collection.add(ids=ids, embeddings=vectors, documents=texts,
+                                    metadatas=[md or None for md in metadatas] if metadatas else None)
+        return ids, vectors
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """새 청크를 Chroma와 양자화 색인에 추가합니다. (ids는 아직 없는 청크 id여야 함)"""
+        ids, vectors = self._store(self.vectorstore, self.embeddings, texts, metadatas, ids)
+        if ids:
+            self.index.add(ids, vectors)
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path=config.QUANTIZED_INDEX_DIR,
+                   persist_directory=None, mode=None, **kwargs):
+        """
+        텍스트를 임베딩해서 Chroma(persist_directory, 없으면 메모리)에 저장하고, 같은 벡터로 path에 양자화 색인을 만듭니다.
+        """
+        vectorstore = Chroma(embedding_function=embedding, persist_directory=persist_directory)
+        ids, vectors = cls._store(vectorstore, embedding, texts, metadatas, ids)
+        if not ids:
+            raise ValueError("양자화 색인을 만들 텍스트가 없습니다.")
+        return cls(vectorstore, QuantizedIndex.build(ids, vectors, path), mode=mode)
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def report(index, query_vectors, k=10, chroma_path=config.CHROMA_DB_PATH, exclude_ids=None):
+    """
+    원본(exact) 대비 int8/binary 양자화의 메모리, 디스크, 질문당 지연 시간, recall@k를 출력합니다.
+
+    Args:
+        index (QuantizedIndex): 양자화 색인
+        query_vectors: 질문 임베딩 목록. 색인에 저장된 벡터를 그대로 쓰면 자기 자신이 항상 1위로 잡혀
+            recall이 부풀려지므로 실제 질문 임베딩을 쓰거나 exclude_ids로 자기 자신을 빼야 함
+        exclude_ids (list): 질문마다 결과에서 뺄 청크 id (저장된 청크 벡터를 질문으로 쓸 때 그 청크의 id)
+    """
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    exclude_ids = exclude_ids or [None] * len(query_vectors)
+    exact_results, stats = [], {}
+    for mode in ('exact', 'int8', 'binary'):
+        start = time.perf_counter()
+        results = []
+        for q, excluded in zip(query_vectors, exclude_ids):
+            hits = index.search(q, k=k + (excluded is not None), mode=mode)
+            results.append([chunk_id for chunk_id, _ in hits if chunk_id != excluded][:k])
+        latency = (time.perf_counter() - start) / len(query_vectors)
+        if mode == 'exact':
+            exact_results = results
+        recall = np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(results, exact_results)])
+        stats[mode] = {'memory_bytes': index.memory_bytes(None if mode == 'exact' else mode),
+                       'latency_ms': latency * 1000, 'recall': float(recall)}
+
+    print(f"INFO: 청크 벡터 {len(index)}개, 질문 {len(query_vectors)}개, k={k}")
+    print(f"INFO: 디스크 - Chroma {_dir_bytes(chroma_path) / 2**20:.1f} MB, 양자화 색인 {index.disk_bytes() / 2**20:.1f} MB")
+    print(f"{'mode':<8}{'메모리(MB)':>12}{'지연(ms)':>10}{'recall@' + str(k):>11}")
+    for mode, row in stats.items():
+        print(f"{mode:<8}{row['memory_bytes'] / 2**20:>12.2f}{row['latency_ms']:>10.2f}{row['recall']:>11.3f}")
+    return stats
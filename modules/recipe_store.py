@@ -0,0 +1,167 @@
+# modules/recipe_store.py
+import json
+import os
+import struct
+import time
+import zlib
+
+# 레코드 파일 구조:
+#   [MAGIC 4B][플래그 1B] [레코드 길이 4B + 레코드] * N [id 인덱스(JSON)] [인덱스 오프셋 8B] [MAGIC 4B]
+# 각 레코드는 RECORD_FIELDS 순서의 JSON 배열이며, combined_text는 저장하지 않고 읽을 때 만듭니다.
+# 플래그에 FLAG_ZLIB가 있으면 레코드별로 zlib 압축 (파일은 더 작아지지만 로드는 조금 느려짐)
+MAGIC = b"RCP1"
+FLAG_ZLIB = 0x01
+RECORD_FIELDS = ('id', 'title', 'ingredients', 'steps', 'url')
+_LENGTH = struct.Struct('<I')
+_FOOTER = struct.Struct('<Q4s')
+
+
+def build_combined_text(recipe):
+    """레시피 dict에서 임베딩/검색에 사용할 combined_text를 만듭니다."""
+    return (f"요리 제목: {recipe.get('title', '')}\n"
+            f"필요한 재료: {recipe.get('ingredients', '')}\n"
+            f"만드는 법: {recipe.get('steps', '')}")
+
+
+def is_record_file(path):
+    """파일 앞부분의 MAGIC 값으로 레코드 파일인지 확인합니다."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_records(recipes, output_filepath, compress=False):
+    """
+    레시피 리스트를 길이 접두(length-prefixed) 레코드 파일로 저장합니다.
+
+    Args:
+        recipes (List[dict]): 전처리된 레시피 리스트
+        output_filepath (str): 저장 경로
+        compress (bool): 레코드별 zlib 압축 여부
+
+    Returns:
+        int: 저장된 레코드 수
+    """
+    os.makedirs(os.path.dirname(output_filepath) or '.', exist_ok=True)
+    index = {}
+    tmp_path = output_filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(bytes([FLAG_ZLIB if compress else 0]))
+        for recipe in recipes:
+            row = [recipe.get(field, '') for field in RECORD_FIELDS]
+            payload = json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            if compress:
+                payload = zlib.compress(payload)
+            offset = f.tell()
+            f.write(_LENGTH.pack(len(payload)))
+            f.write(payload)
+            index[str(row[0])] = offset
+        index_offset = f.tell()
+        f.write(json.dumps(index, separators=(',', ':')).encode('utf-8'))
+        f.write(_FOOTER.pack(index_offset, MAGIC))
+    os.replace(tmp_path, output_filepath)
+    return len(index)
+
+
+class RecipeRecordReader:
+    """
+    레코드 파일을 스트리밍으로 읽거나, id 인덱스로 임의 접근(random access)하는 리더.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"'{path}'는 레시피 레코드 파일이 아닙니다.")
+        self._compressed = bool(self._file.read(1)[0] & FLAG_ZLIB)
+        self._data_offset = self._file.tell()
+        self._file.seek(-_FOOTER.size, os.SEEK_END)
+        self._index_offset, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"'{path}' 파일의 끝부분이 손상되었습니다.")
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def index(self):
+        # id 인덱스는 임의 접근이 필요할 때만 불러옵니다.
+        if self._index is None:
+            self._file.seek(self._index_offset)
+            end = os.path.getsize(self.path) - _FOOTER.size
+            self._index = json.loads(self._file.read(end - self._index_offset).decode('utf-8'))
+        return self._index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read_record(self):
+        # 현재 파일 위치에서 레코드 하나를 읽습니다.
+        (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        payload = self._file.read(length)
+        row = json.loads(zlib.decompress(payload) if self._compressed else payload)
+        recipe = dict(zip(RECORD_FIELDS, row))
+        recipe['combined_text'] = build_combined_text(recipe)
+        return recipe, _LENGTH.size + length
+
+    def get(self, recipe_id):
+        """id로 레시피 하나를 읽습니다. 없으면 None."""
+        offset = self.index.get(str(recipe_id))
+        if offset is None:
+            return None
+        self._file.seek(offset)
+        return self._read_record()[0]
+
+    def __iter__(self):
+        # 순차 읽기: 인덱스를 읽지 않고 레코드를 하나씩 흘려보냅니다.
+        offset = self._data_offset
+        while offset < self._index_offset:
+            self._file.seek(offset)
+            recipe, size = self._read_record()
+            offset += size
+            yield recipe
+
+
+def iter_recipes(path):
+    """JSON/레코드 파일 형식에 상관없이 레시피 dict를 순서대로 돌려줍니다."""
+    if is_record_file(path):
+        with RecipeRecordReader(path) as reader:
+            yield from reader
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data:
+            if 'combined_text' not in item:
+                item['combined_text'] = build_combined_text(item)
+            yield item
+
+
+def report_format_stats(json_path, record_path):
+    """두 형식의 파일 크기와 전체 로드 시간을 비교해 출력합니다."""
+    stats = {}
+    for label, path in (('json', json_path), ('records', record_path)):
+        if not os.path.exists(path):
+            continue
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_recipes(path))
+        stats[label] = (os.path.getsize(path), time.perf_counter() - start, count)
+
+    for label, (size, elapsed, count) in stats.items():
+        print(f"INFO: [{label}] {size / 1024:.1f} KB, {count}개 레시피 로드 {elapsed * 1000:.1f} ms")
+    if 'json' in stats and 'records' in stats:
+        size_ratio = stats['records'][0] / stats['json'][0]
+        time_ratio = stats['records'][1] / stats['json'][1] if stats['json'][1] else 0.0
+        print(f"INFO: 레코드 형식은 JSON 대비 크기 {(1 - size_ratio) * 100:.1f}% 감소, "
+              f"로드 시간 {(1 - time_ratio) * 100:.1f}% 감소")
+    return stats
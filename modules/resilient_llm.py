@@ -0,0 +1,400 @@
+# modules/resilient_llm.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from . import config
+from .scheduler import scheduled_runnable
+from .utils_runnable import StreamableLambda
+
+_END = object()  # 스트림에 조각이 하나도 없을 때
+
+
+class LLMUnavailableError(RuntimeError):
+    """설정된 모든 LLM 제공자가 실패했거나 차단(circuit open)되어 답변할 수 없을 때"""
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold번 쌓이면 cooldown초 동안 요청을 보내지 않습니다(open).
+    cooldown이 지나면 요청 하나만 시험 삼아 보내고(half-open), 성공하면 다시 정상(closed)으로 돌아갑니다.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=3, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """지금 이 제공자로 요청을 보내도 되는지. half-open에서는 시험 요청 하나만 허용합니다."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                # half-open 시험 요청이 실패하면 cooldown을 처음부터 다시 셈
+                self._opened_at = self._clock()
+
+
+class LatencyTracker:
+    """최근 성공한 호출의 지연 시간으로 백분위수를 계산합니다. (헤지 요청을 보낼 시점 결정용)"""
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        """샘플이 min_samples개보다 적으면 None"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+class Provider:
+    """
+    failover 순서에 들어가는 LLM 제공자 하나와 그 상태(차단기, 지연 시간, 통계).
+    동시에 보낼 수 있는 요청은 max_in_flight개로 제한되며, 제공자마다 스레드 풀을 따로 둡니다.
+    시간 초과/헤지에서 진 요청은 끝날 때까지 자리를 차지하므로, 멈춘 제공자는 자기 자리만 채우고
+    다른 제공자의 요청은 막지 않습니다.
+    """
+    def __init__(self, name, runnable, breaker=None, max_in_flight=config.LLM_MAX_IN_FLIGHT):
+        self.name = name
+        self.runnable = runnable
+        self.breaker = breaker or CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_COOLDOWN)
+        self.latencies = LatencyTracker()
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"llm-{name}")
+        self.calls = 0
+        self.served = 0
+        self.failures = 0
+        self.saturated = 0  # 자리가 없어 건너뛴 횟수
+
+
+def _chat_model(kind, model):
+    """LLM_PROVIDERS의 '종류:모델' 항목 하나로 채팅 모델을 만듭니다. API 키가 없으면 None."""
+    # SDK 자체 재시도는 끄고, 재시도/대기 시간은 ResilientLLM의 failover와 deadline으로 관리
+    if kind == "upstage":
+        if not config.UPSTAGE_API_KEY:
+            return None
+        from langchain_upstage import ChatUpstage
+        return ChatUpstage(model_name=model, temperature=0.2, api_key=config.UPSTAGE_API_KEY,
+                           timeout=config.LLM_TIMEOUT, max_retries=0)
+    if kind == "openai":
+        if not config.OPENAI_API_KEY:
+            return None
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model_name=model, temperature=0.2, api_key=config.OPENAI_API_KEY,
+                          timeout=config.LLM_TIMEOUT, max_retries=0)
+    raise ValueError(f"지원하지 않는 LLM 제공자입니다: '{kind}' (upstage | openai)")
+
+
+class ResilientLLM:
+    """
+    여러 LLM 제공자를 순서대로 묶어, 호출 하나가 느리거나 실패해도 전체 대화가 멈추지 않도록 합니다.
+
+    - deadline: 호출 하나는 timeout초 안에 끝나야 하며, 넘으면 TimeoutError
+    - 헤지(hedge): 응답이 최근 지연 시간의 hedge_percentile 백분위수보다 늦어지면
+      다음 제공자(제공자가 하나면 같은 제공자)로 두 번째 요청을 보내 먼저 온 응답을 사용
+    - failover: 요청이 실패하면 바로 다음 제공자로 다시 보냄
+    - 차단기: 연속으로 실패하는 제공자는 잠시 건너뜀
+    - 동시 요청 제한: 진행 중인 요청이 max_in_flight개인 제공자는 건너뛰고, 모두 바쁘면 deadline 안에서 자리를 기다림
+    stream은 첫 조각이 오기 전까지만 deadline/failover를 적용하고, 헤지 요청은 보내지 않습니다.
+    응답한 제공자는 통계(summary)와 AIMessage.response_metadata['provider']에 기록됩니다.
+
+    Args:
+        providers (list): Provider 목록 (failover 순서)
+        hedge_percentile (float): 0이면 헤지 요청을 보내지 않음
+        hedge_min_delay (float): 헤지 전 최소 대기 시간(초). 지연 시간 샘플이 부족할 때도 이 값을 사용
+    """
+    def __init__(self, providers, timeout=config.LLM_TIMEOUT, hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+                 hedge_min_delay=config.LLM_HEDGE_MIN_DELAY):
+        if not providers:
+            raise LLMUnavailableError("사용할 수 있는 LLM 제공자가 없습니다. LLM_PROVIDERS와 API 키를 확인해주세요.")
+        self.providers = providers
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_config(cls, scheduler=None):
+        """config.LLM_PROVIDERS 순서대로 제공자를 구성합니다. (API 키가 없는 제공자는 건너뜀)"""
+        providers = []
+        for item in config.LLM_PROVIDERS:
+            kind, model = item.split(":", 1)
+            model_client = _chat_model(kind, model)
+            if model_client is None:
+                print(f"WARNING: '{item}' 제공자의 API 키가 없어 failover 목록에서 제외합니다.")
+                continue
+            if scheduler is not None:
+                # 헤지/failover 요청도 각각 전역 요청 예산과 우선순위를 따름
+                model_client = scheduled_runnable(model_client, scheduler)
+            providers.append(Provider(item, model_client))
+        return cls(providers)
+
+    def as_runnable(self):
+        """체인(prompt | llm | parser)에 넣을 수 있는 Runnable (invoke와 토큰 스트리밍 모두 지원)"""
+        return StreamableLambda(self.invoke, self.stream, name="ResilientLLM")
+
+    def invoke(self, inputs, config=None):
+        deadline = time.monotonic() + self.timeout
+        remaining = iter(self.providers)
+        pending = {}  # future → (Provider, 헤지 요청 여부)
+        errors = []
+        primary = None
+
+        def launch(provider=None, hedge=False, reserved=False):
+            nonlocal primary
+            candidates = [provider] if provider is not None else remaining
+            for candidate in candidates:
+                if candidate is not None and (reserved or self._reserve(candidate)):
+                    pending[candidate.executor.submit(self._call, candidate, inputs, config)] = (candidate, hedge)
+                    primary = primary or candidate
+                    return True
+            return False
+
+        if not launch() and not launch(self._wait_for_slot(deadline), reserved=True):
+            raise LLMUnavailableError("모든 LLM 제공자가 일시적으로 차단되어 있습니다. 잠시 후 다시 시도해주세요.")
+        hedge_at = time.monotonic() + self._hedge_delay(primary) if self.hedge_percentile else None
+        hedged = False
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            until = deadline if hedged or hedge_at is None else min(deadline, hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider, is_hedge = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                self._discard(pending)
+                return self._served(provider, result, is_hedge, failed_over=bool(errors))
+            if not done and not hedged and hedge_at is not None and time.monotonic() >= hedge_at:
+                # 평소보다 늦어지는 요청: 다음 제공자(없으면 같은 제공자)로 헤지 요청
+                hedged = launch(hedge=True) or launch(primary, hedge=True)
+                if hedged:
+                    with self._lock:
+                        self.hedges += 1
+                else:
+                    hedge_at = None
+            elif not pending and not launch():
+                break
+
+        if pending:
+            with self._lock:
+                self.timeouts += 1
+            names = ', '.join(p.name for p, _ in pending.values())
+            self._discard(pending)
+            raise TimeoutError(f"LLM 응답이 {self.timeout:g}초 안에 오지 않았습니다. ({names})")
+        raise LLMUnavailableError(f"모든 LLM 제공자 호출이 실패했습니다: {'; '.join(errors)}")
+
+    def stream(self, inputs, config=None):
+        """
+        응답을 조각(AIMessageChunk)으로 돌려줍니다. 첫 조각을 받기 전에 실패하면 다음 제공자로 넘어가고,
+        첫 조각이 deadline 안에 오지 않으면 TimeoutError. 첫 조각을 내보낸 뒤에는 그 제공자로 끝까지 받습니다.
+        """
+        deadline = time.monotonic() + self.timeout
+        errors, timed_out = [], []
+        remaining = iter(self.providers)
+        while time.monotonic() < deadline:
+            provider = next((p for p in remaining if self._reserve(p)), None)
+            if provider is None and not (errors or timed_out):
+                provider = self._wait_for_slot(deadline)
+            if provider is None:
+                break
+            chunks = iter(provider.runnable.stream(inputs, config))
+            # 첫 조각은 제공자 스레드에서 받아 deadline을 적용 (나머지 조각은 호출한 스레드에서 읽음)
+            future = provider.executor.submit(next, chunks, _END)
+            try:
+                first = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                timed_out.append(provider.name)
+                provider.breaker.record_failure()
+                with self._lock:
+                    provider.failures += 1
+                # 늦게라도 첫 조각이 오면 스트림을 닫고 자리를 돌려줌
+                future.add_done_callback(lambda _, chunks=chunks, provider=provider: self._close_stream(provider, chunks))
+                continue
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+                provider.breaker.record_failure()
+                with self._lock:
+                    provider.failures += 1
+                self._close_stream(provider, chunks)
+                continue
+
+            try:
+                if first is _END:
+                    provider.breaker.record_success()
+                    return
+                yield self._served(provider, first, False, failed_over=bool(errors or timed_out))
+                yield from chunks
+                provider.breaker.record_success()
+            except GeneratorExit:
+                # 받는 쪽이 중간에 그만 읽은 경우: 제공자는 정상적으로 응답하고 있었음
+                provider.breaker.record_success()
+                raise
+            except Exception:
+                # 첫 조각을 보낸 뒤의 실패는 이미 답변이 나가기 시작했으므로 다시 보내지 않음
+                provider.breaker.record_failure()
+                with self._lock:
+                    provider.failures += 1
+                raise
+            finally:
+                self._close_stream(provider, chunks)
+            return
+
+        if timed_out:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"LLM 응답의 첫 부분이 {self.timeout:g}초 안에 오지 않았습니다. ({', '.join(timed_out)})")
+        if not errors:
+            raise LLMUnavailableError("모든 LLM 제공자가 일시적으로 차단되어 있습니다. 잠시 후 다시 시도해주세요.")
+        raise LLMUnavailableError(f"모든 LLM 제공자 호출이 실패했습니다: {'; '.join(errors)}")
+
+    def _reserve(self, provider, timeout=None):
+        """
+        제공자에 요청 자리가 있고 차단기가 허용하면 자리를 잡고 True (자리는 _call/_close_stream에서 반환).
+        timeout을 주면 자리가 날 때까지 그 시간만큼 기다립니다.
+        """
+        acquired = provider.slots.acquire(timeout=timeout) if timeout else provider.slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                provider.saturated += 1
+            return False
+        if not provider.breaker.allow():
+            provider.slots.release()
+            return False
+        with self._lock:
+            provider.calls += 1
+        return True
+
+    def _wait_for_slot(self, deadline):
+        """
+        차단되지 않은 제공자가 모두 바쁠 때, 첫 제공자의 자리가 날 때까지 deadline 안에서 기다려 자리를 잡습니다.
+        모든 제공자가 차단되어 있으면 None, 기다려도 자리가 나지 않으면 TimeoutError.
+        """
+        for provider in self.providers:
+            if provider.breaker.state == CircuitBreaker.OPEN:
+                continue
+            if self._reserve(provider, timeout=max(0.0, deadline - time.monotonic())):
+                return provider
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"LLM 제공자가 모두 바빠 {self.timeout:g}초 안에 요청을 보내지 못했습니다.")
+        return None
+
+    @staticmethod
+    def _close_stream(provider, chunks):
+        try:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            provider.slots.release()
+
+    @staticmethod
+    def _discard(pending):
+        """더 기다리지 않을 요청: 아직 시작 전이면 취소하고, 실행 중이면 결과만 버림 (자리는 끝날 때 반환)"""
+        for future in pending:
+            future.cancel()
+        pending.clear()
+
+    def _hedge_delay(self, provider):
+        observed = provider.latencies.percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, observed or 0.0)
+
+    def _call(self, provider, inputs, config):
+        start = time.perf_counter()
+        try:
+            result = provider.runnable.invoke(inputs, config)
+        except Exception:
+            provider.breaker.record_failure()
+            with self._lock:
+                provider.failures += 1
+            raise
+        finally:
+            provider.slots.release()
+        elapsed = time.perf_counter() - start
+        provider.latencies.add(elapsed)
+        if elapsed > self.timeout:
+            # deadline을 넘긴 응답은 이미 버려졌으므로 실패로 집계
+            provider.breaker.record_failure()
+            with self._lock:
+                provider.failures += 1
+        else:
+            provider.breaker.record_success()
+        return result
+
+    def _served(self, provider, result, hedge_won, failed_over=False):
+        with self._lock:
+            provider.served += 1
+            if hedge_won:
+                self.hedge_wins += 1
+        if hedge_won or failed_over:
+            print(f"INFO: LLM 응답을 '{provider.name}'에서 받았습니다.{' (헤지 요청)' if hedge_won else ''}")
+        metadata = getattr(result, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata["provider"] = provider.name
+        return result
+
+    def summary(self):
+        """제공자별 호출/응답/실패 수, 차단기 상태와 헤지/시간 초과 횟수"""
+        with self._lock:
+            return {
+                'providers': {
+                    p.name: {'calls': p.calls, 'served': p.served, 'failures': p.failures,
+                             'saturated': p.saturated, 'circuit': p.breaker.state,
+                             'p50_ms': (p.latencies.percentile(50, min_samples=1) or 0.0) * 1000}
+                    for p in self.providers
+                },
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'timeouts': self.timeouts,
+            }
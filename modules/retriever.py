@@ -1,28 +1,102 @@
 # retriever.py
 from langchain.retrievers import ParentDocumentRetriever
+from langchain.retrievers.multi_vector import SearchType
 from langchain.storage import InMemoryStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.retrievers import BaseRetriever
+from typing import Any, Optional
+from . import config
 #from .vector_store import VectorStoreManager
 
+
+class ExpandingParentDocumentRetriever(ParentDocumentRetriever):
+    """
+    DB 구축 시 중복 청크를 하나로 합쳤기 때문에, 검색된 자식 청크의 doc_id와
+    alt_doc_ids(합쳐진 다른 부모들)를 부모 문서로 펼쳐 돌려주는 ParentDocumentRetriever.
+    검색된 청크의 부모를 순위대로 먼저 채우고, 남는 자리만 alt_doc_ids로 채워
+    돌려주는 부모 문서는 최대 max_parents개(기본: 검색 k)입니다.
+    """
+    max_parents: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        if self.search_type == SearchType.mmr:
+            sub_docs = self.vectorstore.max_marginal_relevance_search(query, **self.search_kwargs)
+        elif self.search_type == SearchType.similarity_score_threshold:
+            sub_docs_and_similarities = self.vectorstore.similarity_search_with_relevance_scores(
+                query, **self.search_kwargs
+            )
+            sub_docs = [sub_doc for sub_doc, _ in sub_docs_and_similarities]
+        else:
+            sub_docs = self.vectorstore.similarity_search(query, **self.search_kwargs)
+
+        # 검색 순위를 유지하면서 부모 doc_id를 중복 없이 모음 (각 청크의 원래 부모 → 합쳐진 부모 순)
+        limit = self.max_parents or self.search_kwargs.get("k", 4)
+        ids = []
+        for doc_id in [d.metadata.get(self.id_key) for d in sub_docs] + \
+                [alt for d in sub_docs for alt in d.metadata.get("alt_doc_ids", "").split(",")]:
+            if len(ids) >= limit:
+                break
+            if doc_id and doc_id not in ids:
+                ids.append(doc_id)
+        docs = self.docstore.mget(ids)
+        return [d for d in docs if d is not None]
+
+
+class IngredientFirstRetriever(BaseRetriever):
+    """
+    질문에 재료가 여러 개 등장하면 재료 색인의 교집합 결과(부모 문서)를 먼저 돌려주고,
+    남는 자리는 기존 벡터 검색 결과로 채우는 리트리버.
+    """
+    base_retriever: Any
+    ingredient_index: Any
+    docstore: Any
+    min_ingredients: int = 2  # '김치찌개'처럼 재료 하나만 걸리는 질문은 벡터 검색에 맡김
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        names = self.ingredient_index.match_names(query)
+        if len(names) < self.min_ingredients:
+            return self.base_retriever.invoke(query)
+
+        doc_ids = self.ingredient_index.query(names, limit=self.k)
+        documents = [doc for doc in self.docstore.mget(doc_ids) if doc is not None]
+        if len(documents) < self.k:
+            seen = {doc.metadata.get("doc_id") for doc in documents}
+            for doc in self.base_retriever.invoke(query):
+                if doc.metadata.get("doc_id") not in seen:
+                    documents.append(doc)
+                if len(documents) >= self.k:
+                    break
+        return documents
+
+
 class AdvancedRetriever:
     """
     ParentDocumentRetriever를 사용하여 향상된 검색 기능을 제공하는 클래스.
     """
     # --- 수정된 부분: __init__에서 store를 받도록 변경 ---
-    def __init__(self, vectorstore, store):
+    def __init__(self, vectorstore, store, ingredient_index=None):
         self.vectorstore = vectorstore
         self.store = store # 부모 문서를 저장할 공간
+        self.ingredient_index = ingredient_index # 재료 색인 (있으면 재료 질문을 먼저 처리)
 
     def get_retriever(self):
         # 자식 청크는 DB 구축 시 이미 생성되었으므로 여기서는 splitter 정의가 필요 없음
         # 하지만 retriever 객체는 구조상 splitter를 필요로 하므로 형식적으로 정의
-        child_splitter = RecursiveCharacterTextSplitter(chunk_size=400)
+        child_splitter = RecursiveCharacterTextSplitter(chunk_size=config.CHUNK_SIZE)
         
-        retriever = ParentDocumentRetriever(
+        # 중복 제거로 합쳐진 청크는 여러 부모 문서로 다시 펼쳐서 돌려줌
+        retriever = ExpandingParentDocumentRetriever(
             vectorstore=self.vectorstore,
             docstore=self.store,
             child_splitter=child_splitter,
             id_key="doc_id"
             # parent_splitter는 add_documents시에만 사용되므로 여기서는 불필요
         )
+        if self.ingredient_index is not None:
+            retriever = IngredientFirstRetriever(
+                base_retriever=retriever,
+                ingredient_index=self.ingredient_index,
+                docstore=self.store
+            )
         return retriever
\ No newline at end of file
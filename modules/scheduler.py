@@ -0,0 +1,212 @@
+# modules/scheduler.py
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from . import config
+from .profiler import run_profiled
+from .utils_runnable import StreamableLambda
+
+# 우선순위: 숫자가 작을수록 먼저 처리 (대화 요청이 DB 구축 같은 배치 작업보다 우선)
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_END = object()  # 스트림에 조각이 하나도 없을 때
+
+
+def estimate_tokens(text):
+    """요청 토큰 수를 대략 추정합니다. (한국어는 대략 2글자당 1토큰)"""
+    return max(1, len(str(text)) // 2)
+
+
+class RateLimiter:
+    """
+    분당 요청 수(RPM)와 분당 토큰 수(TPM)를 함께 제한하는 토큰 버킷.
+    한도가 0 또는 None이면 해당 제한은 사용하지 않습니다.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic):
+        self.rpm = requests_per_minute or 0
+        self.tpm = tokens_per_minute or 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def try_acquire(self, tokens=1):
+        """
+        예산이 있으면 요청 1건과 tokens만큼을 차감하고 0을, 없으면 차감하지 않고 기다려야 할 시간(초)을 돌려줍니다.
+        """
+        # 한 번에 한도보다 큰 요청은 한도만큼만 기다리도록 제한
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+            if self.tpm and self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+            if wait == 0.0:
+                if self.rpm:
+                    self._requests -= 1
+                if self.tpm:
+                    self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens=1):
+        """예산이 생길 때까지 기다린 뒤 요청 1건과 tokens만큼을 차감합니다."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+
+class RequestScheduler:
+    """
+    LLM/임베딩 호출을 우선순위 큐에 넣고, 전역 요청/토큰 예산 안에서 작업 스레드가 순서대로 실행합니다.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_workers=4):
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()  # 같은 우선순위에서는 먼저 들어온 요청부터
+        self._arrived = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            requests_per_minute=config.SCHEDULER_REQUESTS_PER_MINUTE,
+            tokens_per_minute=config.SCHEDULER_TOKENS_PER_MINUTE,
+            max_workers=config.SCHEDULER_MAX_WORKERS,
+        )
+
+    def submit(self, fn, *args, priority=INTERACTIVE, tokens=1, **kwargs):
+        future = Future()
+        with self._arrived:
+            self._queue.put((priority, next(self._counter), future, fn, args, kwargs, tokens))
+            self._arrived.notify()  # 예산을 기다리던 작업 스레드가 새 요청의 우선순위를 다시 보도록 깨움
+        return future
+
+    def run(self, fn, *args, priority=INTERACTIVE, tokens=1, **kwargs):
+        """submit 후 결과를 기다립니다."""
+        return self.submit(fn, *args, priority=priority, tokens=tokens, **kwargs).result()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            _, _, future, fn, args, kwargs, tokens = job
+            if future.cancelled():
+                continue
+            wait = self.rate_limiter.try_acquire(tokens)
+            if wait:
+                # 예산이 없으면 작업을 큐에 돌려놓고 기다림. 그 사이 들어온 대화 요청이 있으면
+                # 깨어난 뒤 그 요청을 먼저 꺼내므로, 예산을 기다리는 배치 작업이 작업 스레드를 붙잡지 않음
+                with self._arrived:
+                    self._queue.put(job)
+                    self._arrived.wait(timeout=wait)
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                # 파이프라인 단계를 프로파일링 중이면 이 스레드의 cProfile 기록도 단계 결과에 합침
+                future.set_result(run_profiled(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    동시에 들어온 질문 임베딩(embed_query)을 짧은 시간 창(batch_window) 동안 모아
+    embed_documents 요청 한 번으로 보내는 임베딩 래퍼.
+    embed_documents(DB 구축 등)는 지정한 우선순위로 스케줄러를 거쳐 그대로 실행됩니다.
+    """
+    def __init__(self, embeddings, scheduler, batch_window=0.02, max_batch_size=32,
+                 query_priority=INTERACTIVE, document_priority=BACKGROUND):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.query_priority = query_priority
+        self.document_priority = document_priority
+        self._pending = queue.Queue()
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.run(
+            self.embeddings.embed_documents, texts,
+            priority=self.document_priority, tokens=sum(estimate_tokens(t) for t in texts)
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        future = Future()
+        self._pending.put((text, future))
+        return future.result()
+
+    def _collect(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            texts = [text for text, _ in batch]
+            job = self.scheduler.submit(
+                self.embeddings.embed_documents, texts,
+                priority=self.query_priority, tokens=sum(estimate_tokens(t) for t in texts)
+            )
+            job.add_done_callback(lambda done, batch=batch: self._resolve(batch, done))
+
+    @staticmethod
+    def _resolve(batch, done):
+        error = done.exception()
+        for i, (_, future) in enumerate(batch):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+
+def scheduled_runnable(runnable, scheduler, priority=INTERACTIVE):
+    """
+    LLM 같은 Runnable 호출이 스케줄러의 우선순위/예산을 따르도록 감쌉니다.
+    stream은 요청을 보내 첫 조각을 받는 데까지만 스케줄러 작업 스레드에서 실행하고,
+    나머지 조각은 호출한 스레드에서 읽습니다. (작업 스레드가 긴 답변 내내 붙잡히지 않음)
+    """
+    def invoke(inputs, config):
+        return scheduler.run(runnable.invoke, inputs, config, priority=priority, tokens=estimate_tokens(inputs))
+
+    def stream(inputs, config):
+        chunks = iter(runnable.stream(inputs, config))
+        try:
+            first = scheduler.run(next, chunks, _END, priority=priority, tokens=estimate_tokens(inputs))
+            if first is _END:
+                return
+            yield first
+            yield from chunks
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    return StreamableLambda(invoke, stream, name="scheduled")
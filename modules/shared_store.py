@@ -0,0 +1,209 @@
+# modules/shared_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from langchain.docstore.document import Document
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.stores import BaseStore
+
+from . import config
+
+
+# --- 저장소 백엔드: 여러 프로세스(Streamlit 워커 등)가 함께 쓰는 key-value/list 저장소 ---
+
+class SQLiteBackend:
+    """
+    로컬 SQLite 파일 하나를 여러 프로세스가 공유하는 백엔드.
+    WAL 모드를 사용하므로 읽기는 서로 막지 않고, 쓰기는 짧은 트랜잭션으로 직렬화됩니다.
+    """
+    def __init__(self, path=None):
+        self.path = path or config.SHARED_STORE_PATH
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB)")
+            conn.execute("CREATE TABLE IF NOT EXISTS lists (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, value BLOB)")
+            conn.execute("CREATE INDEX IF NOT EXISTS lists_key ON lists (key, seq)")
+
+    def _conn(self):
+        # sqlite3 연결은 스레드 간에 공유하지 않고 스레드마다 하나씩 엽니다.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def mget(self, keys):
+        if not keys:
+            return []
+        placeholders = ','.join('?' * len(keys))
+        rows = dict(self._conn().execute(f"SELECT key, value FROM kv WHERE key IN ({placeholders})", list(keys)))
+        return [rows.get(key) for key in keys]
+
+    def mset(self, pairs):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", list(pairs))
+
+    def delete(self, keys):
+        with self._conn() as conn:
+            conn.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in keys])
+            conn.executemany("DELETE FROM lists WHERE key = ?", [(key,) for key in keys])
+
+    def keys(self, prefix=''):
+        cursor = self._conn().execute(
+            "SELECT key FROM kv WHERE key >= ? AND key < ? ORDER BY key", (prefix, prefix + '￿'))
+        for (key,) in cursor:
+            yield key
+
+    def rpush(self, key, values):
+        with self._conn() as conn:
+            conn.executemany("INSERT INTO lists (key, value) VALUES (?, ?)", [(key, v) for v in values])
+
+    def lrange(self, key):
+        cursor = self._conn().execute("SELECT value FROM lists WHERE key = ? ORDER BY seq", (key,))
+        return [value for (value,) in cursor]
+
+
+class RedisBackend:
+    """
+    Redis 호환 서버를 사용하는 백엔드.
+    get/set/delete/scan_iter/rpush/lrange만 쓰므로 로컬 대체 구현(fakeredis 등)도 client로 넘길 수 있습니다.
+    """
+    def __init__(self, client=None, url=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError("Redis 백엔드를 사용하려면 'pip install redis'를 실행해주세요.")
+            client = redis.Redis.from_url(url or config.REDIS_URL)
+        self.client = client
+
+    def mget(self, keys):
+        return list(self.client.mget(keys)) if keys else []
+
+    def mset(self, pairs):
+        pairs = dict(pairs)
+        if pairs:
+            self.client.mset(pairs)
+
+    def delete(self, keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def keys(self, prefix=''):
+        for key in self.client.scan_iter(match=prefix + '*'):
+            yield key.decode('utf-8') if isinstance(key, bytes) else key
+
+    def rpush(self, key, values):
+        if values:
+            self.client.rpush(key, *values)
+
+    def lrange(self, key):
+        return self.client.lrange(key, 0, -1)
+
+
+def create_backend(kind=None):
+    """
+    config.SHARED_STORE_BACKEND 설정에 맞는 백엔드를 만듭니다.
+    'memory'(기본값)이면 None을 돌려주고, 이 경우 기존처럼 프로세스 내부 메모리를 사용합니다.
+    """
+    kind = (kind or config.SHARED_STORE_BACKEND).lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(config.SHARED_STORE_PATH)
+    if kind == 'redis':
+        return RedisBackend(url=config.REDIS_URL)
+    return None
+
+
+# --- LangChain 어댑터 ---
+
+class SharedDocStore(BaseStore[str, Document]):
+    """
+    부모 문서를 공유 백엔드에 저장하는 docstore.
+    ParentDocumentRetriever가 필요한 문서만 그때그때 읽으므로 워커마다 말뭉치 전체를 메모리에 올리지 않습니다.
+    """
+    prefix = 'doc:'
+
+    def __init__(self, backend, namespace=None):
+        self.backend = backend
+        if namespace:
+            # 색인 버전별로 부모 문서를 나눠 저장 (버전 교체 중에도 서로 섞이지 않음)
+            self.prefix = f'doc:{namespace}:'
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Document]]:
+        values = self.backend.mget([self.prefix + key for key in keys])
+        documents = []
+        for value in values:
+            if value is None:
+                documents.append(None)
+            else:
+                data = json.loads(value)
+                documents.append(Document(page_content=data['page_content'], metadata=data['metadata']))
+        return documents
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, Document]]) -> None:
+        self.backend.mset([
+            (self.prefix + key, json.dumps({'page_content': doc.page_content, 'metadata': doc.metadata},
+                                           ensure_ascii=False))
+            for key, doc in key_value_pairs
+        ])
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.backend.delete([self.prefix + key for key in keys])
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        for key in self.backend.keys(self.prefix + (prefix or '')):
+            yield key[len(self.prefix):]
+
+    def is_empty(self):
+        return next(self.yield_keys(), None) is None
+
+
+class SharedChatMessageHistory(BaseChatMessageHistory):
+    """세션별 대화 기록을 공유 백엔드의 리스트에 추가(append)만 하는 방식으로 저장합니다."""
+
+    def __init__(self, backend, session_id):
+        self.backend = backend
+        self.key = f"history:{session_id}"
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return messages_from_dict([json.loads(value) for value in self.backend.lrange(self.key)])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.backend.rpush(self.key, [json.dumps(message_to_dict(m), ensure_ascii=False) for m in messages])
+
+    def clear(self) -> None:
+        self.backend.delete([self.key])
+
+
+class AnswerCache:
+    """
+    대화 맥락이 없는 첫 질문에 대한 답변을 워커들끼리 공유하는 캐시.
+    질문은 공백을 정리한 뒤 해시해서 키로 사용합니다.
+    """
+    prefix = 'answer:'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _key(self, question):
+        normalized = ' '.join(question.split()).lower()
+        return self.prefix + hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, question):
+        value = self.backend.mget([self._key(question)])[0]
+        if value is None:
+            return None
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def put(self, question, answer):
+        self.backend.mset([(self._key(question), answer)])
@@ -0,0 +1,403 @@
+# modules/streaming_ingest.py
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from langchain.docstore.document import Document
+
+from . import config
+from .crawler import RecipeCrawler
+from .preprocess import DataPreprocessor, TitleSimilarityIndex
+from .recipe_store import build_combined_text
+from .utils_docstore import ChunkDeduplicator, compute_doc_id, register_parent_docs, make_child_chunks
+
+_DONE = object()  # 앞 단계가 끝났음을 다음 단계에 알리는 표시
+
+
+class StageStats:
+    """단계별 처리 건수와 실제 작업 시간(큐 대기 제외)"""
+    def __init__(self):
+        self.items = 0
+        self.busy_seconds = 0.0
+
+
+class StreamingIngestor:
+    """
+    크롤링한 레시피를 크기가 정해진 큐로 이어 받아
+    정제 → 기존 레시피와 중복 확인 → 청크 분할 → (마이크로 배치마다) 중복 청크 합치기/임베딩/벡터 DB upsert를
+    동시에 진행합니다.
+    큐가 가득 차면 앞 단계가 기다리므로(backpressure) 메모리는 일정하게 유지되고,
+    전체 시간은 가장 느린 단계(보통 크롤링 대기 시간)에 가까워집니다.
+
+    배치 하나는 통째로 색인되거나 통째로 되돌려집니다. 임베딩은 retries번까지 다시 시도하고, 그래도 실패하거나
+    저장에 실패하면 그 배치의 레시피 id/제목 등록을 되돌려 다음 수집 때 다시 받습니다. docstore, 새로 수집한
+    레시피 목록(collected), 중복 청크 색인은 저장에 성공한 뒤에만 등록하므로, 저장되지 않은 청크에 다른 청크가
+    합쳐지는 일이 없습니다.
+
+    배포된 색인 버전은 고치지 않으므로, 수집기에는 작업용 복사본(index_versions.fork_version)의 저장소를 넘기고
+    새 버전으로 바뀌면 retarget으로 새 복사본으로 옮깁니다.
+
+    Args:
+        vectorstore: 자식 청크를 저장할 Chroma (질문 검색에 쓰는 것과 같은 컬렉션)
+        docstore: 부모 문서 저장소 (ParentDocumentRetriever와 같은 것)
+        embeddings: 자식 청크 임베딩 모델 ('passage' 모델)
+        on_indexed (callable): 레시피가 검색 가능해졌을 때 부모 Document로 호출 (제목 색인 갱신 등)
+    """
+    def __init__(self, vectorstore, docstore, embeddings, crawler=None, threshold=config.SIMILARITY_THRESHOLD,
+                 queue_size=config.STREAM_QUEUE_SIZE, batch_size=config.STREAM_EMBED_BATCH_SIZE,
+                 batch_window=config.STREAM_EMBED_BATCH_WINDOW, on_indexed=None,
+                 chunk_dedup=config.USE_CHUNK_DEDUP, chunk_dedup_max_hamming=config.CHUNK_DEDUP_MAX_HAMMING,
+                 retries=config.STREAM_EMBED_RETRIES, retry_delay=config.STREAM_EMBED_RETRY_DELAY):
+        self.vectorstore = vectorstore
+        self.docstore = docstore
+        self.embeddings = embeddings
+        self.crawler = crawler or RecipeCrawler()
+        self.preprocessor = DataPreprocessor()
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.on_indexed = on_indexed
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self._raw = queue.Queue(maxsize=queue_size)
+        self._cleaned = queue.Queue(maxsize=queue_size)
+        self._chunked = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self.stats = {name: StageStats() for name in ('crawl', 'clean', 'chunk', 'embed', 'upsert')}
+        self.duplicates = 0
+        self.failed = 0       # 색인에 실패해 되돌린 레시피 수
+        self.latencies = []   # 수집 → 검색 가능까지 걸린 시간(초)
+        self.collected = []   # 새로 받아들인 원본 레시피 (다음 배치 실행에 반영하기 위해 저장)
+
+        # 이미 색인된 레시피의 id/제목 (중복 확인 기준). 정제 단계가 등록하고, 색인에 실패하면 되돌림
+        self._known_ids, self._titles = set(), TitleSimilarityIndex(threshold)
+        self._claims_lock = threading.Lock()
+        self._index_lock = threading.Lock()  # 배치 색인과 retarget이 겹치지 않도록
+        self.chunk_dedup, self.chunk_dedup_max_hamming = chunk_dedup, chunk_dedup_max_hamming
+        self._seed()
+
+    def _seed(self):
+        """저장소에 이미 있는 레시피의 id/제목과 청크로 중복 확인 색인을 채웁니다."""
+        doc_ids = list(self.docstore.yield_keys())
+        with self._claims_lock:
+            for doc in self.docstore.mget(doc_ids):
+                if doc is not None:
+                    self._known_ids.add(str(doc.metadata.get('id', '')))
+                    self._titles.add(doc.metadata.get('title', ''))
+
+        # DB 구축과 같은 기준으로 중복 청크를 합치기 위해, 이미 저장된 청크로 색인을 채움
+        self._chunks, self._chunk_ids = None, []
+        if self.chunk_dedup:
+            self._chunks = ChunkDeduplicator(self.chunk_dedup_max_hamming)
+            collection, offset = self.vectorstore._collection, 0
+            while True:
+                batch = collection.get(include=["documents", "metadatas"], limit=5000, offset=offset)
+                if not batch["ids"]:
+                    break
+                for chunk_id, text, md in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    self._chunks.add(text, md.get("doc_id"), (md.get("alt_doc_ids") or "").split(","), merge=False)
+                    self._chunk_ids.append(chunk_id)
+                offset += len(batch["ids"])
+
+    def start(self, page_ranges):
+        """백그라운드 스레드로 수집을 시작합니다. page_ranges: [(시작 페이지, 끝 페이지), ...]"""
+        self._started = time.monotonic()
+        targets = [
+            (self._crawl, (page_ranges,)),
+            (self._run_stage, ('clean', self._clean, self._raw, self._cleaned)),
+            (self._run_stage, ('chunk', self._chunk, self._cleaned, self._chunked)),
+            (self._embed_batches, ()),
+        ]
+        self._threads = [threading.Thread(target=fn, args=args, daemon=True) for fn, args in targets]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """크롤링을 멈추고, 이미 수집한 레시피는 색인까지 마친 뒤 돌아옵니다."""
+        self._stop.set()
+        self.join()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def retarget(self, vectorstore, docstore, on_indexed=None):
+        """
+        새 색인 버전으로 바뀌었을 때, 이후 레시피를 그 버전의 (작업용) 벡터 DB와 docstore에 넣습니다.
+        진행 중인 배치가 끝난 뒤 바꾸며, 이미 수집한 레시피 중 새 버전에 없는 것은 다시 색인해 계속 검색되게 합니다.
+        """
+        with self._index_lock:
+            self.vectorstore, self.docstore, self.on_indexed = vectorstore, docstore, on_indexed
+            # 기존 id/제목 등록은 그대로 두고(수집 중인 레시피 포함) 새 버전의 레시피만 더함
+            self._seed()
+            items = []
+            for raw in self.collected:
+                item = self._chunk((raw, self.preprocessor.clean_recipe(dict(raw)), time.monotonic()))
+                if docstore.mget([item[1].metadata['doc_id']])[0] is None:
+                    items.append(item)
+            batch = []
+            for item in items:
+                batch.append(item)
+                if sum(len(queued[2]) for queued in batch) >= self.batch_size:
+                    self._index_batch(batch, reindex=True)
+                    batch = []
+            if batch:
+                self._index_batch(batch, reindex=True)
+        if items:
+            print(f"INFO: [stream] 새 색인 버전에 이미 수집한 레시피 {len(items)}개를 다시 색인했습니다.")
+
+    # --- 단계 ---
+    def _crawl(self, page_ranges):
+        try:
+            for start_page, end_page in page_ranges:
+                recipes = self.crawler.iter_recipes(start_page, end_page, skip_ids=self._known_ids)
+                while not self._stop.is_set():
+                    start = time.perf_counter()
+                    recipe = next(recipes, None)
+                    if recipe is None:
+                        break
+                    self._record('crawl', start)
+                    self._raw.put((dict(recipe), time.monotonic()))
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            print(f"WARNING: [stream] 크롤링 중 오류가 발생해 수집을 멈춥니다: {e}")
+        finally:
+            self._raw.put(_DONE)
+
+    def _clean(self, item):
+        raw, fetched_at = item
+        recipe = self.preprocessor.clean_recipe(dict(raw))
+        # 배치 전처리와 같은 기준(제목 유사도)으로 이미 색인된(또는 색인 중인) 레시피와 비교
+        with self._claims_lock:
+            if str(recipe.get('id', '')) in self._known_ids or self._titles.is_duplicate(recipe['title']):
+                self.duplicates += 1
+                return None
+            self._known_ids.add(str(recipe.get('id', '')))
+            self._titles.add(recipe['title'])
+        return raw, recipe, fetched_at
+
+    def _chunk(self, item):
+        raw, recipe, fetched_at = item
+        recipe['combined_text'] = build_combined_text(recipe)
+        parent = Document(page_content=recipe['combined_text'], metadata={
+            'id': recipe.get('id', ''),
+            'title': recipe.get('title', ''),
+            'ingredients': recipe.get('ingredients', ''),
+            'url': recipe.get('url', '')
+        })
+        parent.metadata['doc_id'] = compute_doc_id(parent.metadata)  # docstore에는 저장에 성공한 뒤 등록
+        children = make_child_chunks([parent], chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)
+        # 같은 레시피를 다시 수집해도 청크가 덧붙지 않도록 doc_id + 순번으로 청크 id를 고정
+        ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{child.metadata['doc_id']}#{child.metadata['chunk_index']}"))
+               for child in children]
+        return raw, parent, children, ids, fetched_at
+
+    def _embed_batches(self):
+        """청크를 batch_size개 또는 batch_window초까지 모아서 한 번에 색인합니다."""
+        finished = False
+        while not finished:
+            item = self._chunked.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while sum(len(queued[2]) for queued in batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._chunked.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            with self._index_lock:
+                self._index_batch(batch)
+
+    def _index_batch(self, batch, reindex=False):
+        """
+        배치 하나를 중복 청크 합치기 → 임베딩 → 저장하고, 저장에 성공한 뒤에야 중복 확인 색인에 등록합니다.
+        배치가 끝나야 다음 배치의 중복 청크를 찾으므로, 청크는 항상 저장된 청크에만 합쳐집니다.
+        reindex=True는 retarget이 이미 수집한 레시피를 새 버전에 다시 넣는 경우입니다.
+        """
+        kept, merges = self._dedup(batch)
+        start = time.perf_counter()
+        try:
+            vectors = self._embed([child.page_content for child, _ in kept])
+        except Exception as e:
+            self._rollback(batch, f"청크 {len(kept)}개 임베딩 실패: {e}", reindex=reindex)
+            return
+        self._record('embed', start, len(batch))
+
+        start = time.perf_counter()
+        try:
+            self._write(batch, kept, vectors, merges)
+        except Exception as e:
+            self._rollback(batch, f"저장 실패: {e}", written=kept, reindex=reindex)
+            return
+        self._record('upsert', start, len(batch))
+        self._commit(batch, kept, merges, reindex=reindex)
+
+    def _dedup(self, batch):
+        """
+        저장할 청크 [(청크, 청크 id)]와 이미 저장된 청크에 합쳐질 부모 {청크 위치: [doc_id]}.
+        배치 안에서 겹치는 청크는 배치 안에서만 합칩니다. (배치는 통째로 저장되거나 되돌려지므로)
+        """
+        children = [(child, chunk_id) for _, _, chunks, ids, _ in batch for child, chunk_id in zip(chunks, ids)]
+        if self._chunks is None:
+            return children, {}
+        local = ChunkDeduplicator(self._chunks.max_hamming)
+        kept, merges = [], {}
+        for child, chunk_id in children:
+            doc_id = child.metadata['doc_id']
+            target = self._chunks.find(child.page_content)
+            if target is not None:
+                merges.setdefault(target, []).append(doc_id)
+            elif local.add(child.page_content, doc_id) is None:
+                kept.append((child, chunk_id))
+        for (child, _), alts in zip(kept, local.alt_doc_ids):
+            if alts:
+                child.metadata['alt_doc_ids'] = ",".join(alts)
+        return kept, merges
+
+    def _embed(self, texts):
+        """임베딩을 retries번까지 다시 시도합니다. (대기 시간은 retry_delay초부터 두 배씩)"""
+        for attempt in range(self.retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts) if texts else []
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                print(f"WARNING: [stream] 청크 {len(texts)}개 임베딩 실패, {delay:g}초 뒤 다시 시도합니다 "
+                      f"({attempt + 1}/{self.retries}): {e}")
+                time.sleep(delay)
+
+    def _write(self, batch, kept, vectors, merges):
+        register_parent_docs(self.docstore, [parent for _, parent, _, _, _ in batch])
+        collection = self.vectorstore._collection
+        if kept:
+            collection.upsert(
+                ids=[chunk_id for _, chunk_id in kept],
+                embeddings=vectors,
+                metadatas=[child.metadata for child, _ in kept],
+                documents=[child.page_content for child, _ in kept]
+            )
+        if merges:
+            # 기존 청크와 합쳐진 청크는 저장하지 않고, 그 청크의 alt_doc_ids에 이 레시피들을 추가
+            targets = list(merges)
+            alts = []
+            for target in targets:
+                merged = list(self._chunks.alt_doc_ids[target])
+                for doc_id in merges[target]:
+                    if doc_id != self._chunks.doc_ids[target] and doc_id not in merged:
+                        merged.append(doc_id)
+                alts.append(",".join(merged))
+            collection.update(ids=[self._chunk_ids[target] for target in targets],
+                              metadatas=[{"alt_doc_ids": alt} for alt in alts])
+
+    def _rollback(self, batch, reason, written=None, reindex=False):
+        """색인하지 못한 배치의 id/제목 등록을 되돌려, 다시 수집했을 때 중복으로 건너뛰지 않도록 합니다."""
+        if written is not None:
+            # 일부만 저장됐을 수 있으므로 이 배치의 부모 문서와 청크를 지움
+            try:
+                self.docstore.mdelete([parent.metadata['doc_id'] for _, parent, _, _, _ in batch])
+                if written:
+                    self.vectorstore._collection.delete(ids=[chunk_id for _, chunk_id in written])
+            except Exception as e:
+                print(f"WARNING: [stream] 저장에 실패한 배치를 지우지 못했습니다: {e}")
+        if reindex:
+            # 이미 collected에 있어 종료할 때 저장되므로, 다시 수집하지 않도록 등록은 그대로 둠
+            print(f"WARNING: [stream] 새 색인 버전에 레시피 {len(batch)}개를 다시 색인하지 못했습니다. "
+                  f"다음 배치 실행 때 반영됩니다. ({reason})")
+            return
+        with self._claims_lock:
+            for _, parent, _, _, _ in batch:
+                self._known_ids.discard(str(parent.metadata.get('id', '')))
+                self._titles.remove(parent.metadata.get('title', ''))
+        self.failed += len(batch)
+        print(f"WARNING: [stream] 레시피 {len(batch)}개를 색인하지 못해 되돌렸습니다. 다음 수집 때 다시 받습니다. ({reason})")
+
+    def _commit(self, batch, kept, merges, reindex=False):
+        """저장에 성공한 배치를 중복 확인 색인과 수집 목록에 등록하고 검색 가능해졌음을 알립니다."""
+        if self._chunks is not None:
+            for child, chunk_id in kept:
+                self._chunks.add(child.page_content, child.metadata['doc_id'],
+                                 (child.metadata.get('alt_doc_ids') or '').split(','), merge=False)
+                self._chunk_ids.append(chunk_id)
+            for target, doc_ids in merges.items():
+                for doc_id in doc_ids:
+                    self._chunks.link(target, doc_id)
+        for raw, parent, _, _, fetched_at in batch:
+            if reindex:
+                if self.on_indexed is not None:
+                    self.on_indexed(parent)
+                continue
+            self.collected.append(raw)
+            latency = time.monotonic() - fetched_at
+            self.latencies.append(latency)
+            print(f"INFO: [stream] '{parent.metadata['title']}' 검색 가능 (수집 후 {latency:.1f}초)")
+            if self.on_indexed is not None:
+                self.on_indexed(parent)
+
+    def _run_stage(self, name, fn, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                result = fn(item)
+            except Exception as e:
+                print(f"WARNING: [stream] '{name}' 단계에서 레시피 하나를 건너뜁니다: {e}")
+                continue
+            self._record(name, start)
+            if outbox is not None and result is not None:
+                outbox.put(result)
+        if outbox is not None:
+            outbox.put(_DONE)
+
+    def _record(self, name, start, items=1):
+        stats = self.stats[name]
+        stats.items += items
+        stats.busy_seconds += time.perf_counter() - start
+
+    # --- 결과 ---
+    def summary(self):
+        """단계별 처리량/작업 시간과 수집 → 검색 가능 지연을 출력합니다."""
+        elapsed = time.monotonic() - self._started
+        print(f"INFO: [stream] 경과 {elapsed:.1f}초, 색인 {len(self.latencies)}개, 중복으로 제외 {self.duplicates}개, "
+              f"실패로 되돌림 {self.failed}개")
+        for name, stats in self.stats.items():
+            print(f"  - {name:<7} {stats.items:>5}건, 작업 {stats.busy_seconds:7.1f}초 "
+                  f"({stats.busy_seconds / elapsed if elapsed else 0:.0%})")
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            print(f"INFO: [stream] 수집 → 검색 가능 지연 중앙값 {latencies[len(latencies) // 2]:.1f}초, "
+                  f"최대 {latencies[-1]:.1f}초")
+
+    def save_collected(self, output_dir=config.CRAWLED_DATA_DIR, prefix="baek"):
+        """
+        새로 수집한 원본 레시피를 크롤링 폴더에 저장합니다.
+        다음 배치 실행 때 파이프라인이 이 파일을 감지해 전처리/색인에 반영합니다.
+        """
+        if not self.collected:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{prefix}_recipes_stream_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.collected, f, ensure_ascii=False, indent=4)
+        print(f"SUCCESS: 스트리밍으로 수집한 레시피 {len(self.collected)}개를 '{path}'에 저장했습니다.")
+        return path
@@ -0,0 +1,167 @@
+# modules/title_index.py
+import bisect
+import re
+import threading
+
+from .preprocess import TITLE_STOP_WORDS, DataPreprocessor
+
+# "<요리> 레시피", "<요리> 만드는 법 알려줘" 같은 질문에서 요리 이름만 남기기 위해 지우는 표현
+QUERY_STOP_PHRASES = [
+    '만드는 방법', '만드는방법', '만드는 법', '만드는법', '끓이는 법', '끓이는법', '끓이는 방법',
+    '어떻게 만들어', '어떻게 해', '알려줘요', '알려줘', '알려주세요', '가르쳐줘', '레시피', '만들기',
+    '방법', '요리법', '좀', '가 뭐야', '이 뭐야', '는 뭐야', '뭐야', '주세요', '해줘',
+]
+_preprocessor = DataPreprocessor()
+
+
+def _key(text):
+    for phrase in QUERY_STOP_PHRASES:
+        text = text.replace(phrase, ' ')
+    text = re.sub(r'^\s*의\s+', '', text)  # '백종원의 ...'에서 '백종원'만 지워진 경우
+    return re.sub(r'[^0-9a-zA-Z가-힣]', '', text).lower()
+
+
+def normalize_title(title):
+    """레시피 제목을 비교용 키로 정규화합니다. (전처리와 같은 제목 정리 후 질문 표현, 공백/기호 제거)"""
+    return _key(_preprocessor.clean_title(title))
+
+
+def normalize_question(question):
+    """
+    질문을 비교용 키로 정규화합니다. 제목 정리(clean_title)와 달리 '#', '~' 뒤나 괄호 안의 내용을 버리지 않으므로
+    '김치찌개 (돼지고기 없이) 만드는 법'처럼 조건이 붙은 질문은 제목 '김치찌개'와 같은 키가 되지 않습니다.
+    """
+    for word in TITLE_STOP_WORDS:
+        question = question.replace(word, ' ')
+    return _key(question)
+
+
+class TitleMatch:
+    def __init__(self, doc_id, title, score):
+        self.doc_id = doc_id
+        self.title = title
+        self.score = score
+
+
+class FastPathStats:
+    """빠른 경로 적중률과 지연 시간을 누적합니다. (여러 스레드에서 동시에 기록 가능)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def record(self, hit, seconds):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def summary(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'requests': total,
+                'hit_rate': self.hits / total if total else 0.0,
+                'avg_hit_ms': self.hit_seconds / self.hits * 1000 if self.hits else 0.0,
+                'avg_lookup_miss_ms': self.miss_seconds / self.misses * 1000 if self.misses else 0.0,
+            }
+
+
+class TitleIndex:
+    """
+    부모 문서 제목에 대한 정확 일치 색인.
+    "<요리 이름> 레시피" 같은 질문을 LLM 파이프라인 없이 바로 해당 레시피로 연결하고,
+    입력창 자동완성용 접두어 검색도 제공합니다.
+    질문에서 질문 표현('레시피', '만드는 법 알려줘' 등)만 지웠을 때 제목과 똑같아야 일치로 보며,
+    그 밖의 내용(조건, 다른 질문)이 남아 있으면 일반 RAG 체인이 답하도록 None을 돌려줍니다.
+    스트리밍 수집 스레드가 add하는 동안에도 질문 스레드에서 lookup/complete할 수 있습니다.
+    """
+    def __init__(self):
+        self.keys = []          # 위치 → 정규화된 제목
+        self.titles = []        # 위치 → 원래 제목
+        self.doc_ids = []       # 위치 → docstore doc_id
+        self.exact = {}         # 정규화된 제목 → 위치
+        self._sorted_keys = []  # (정규화된 제목, 위치) 정렬 목록 (접두어 검색용)
+        self._lock = threading.Lock()
+        self.stats = FastPathStats()
+
+    @classmethod
+    def from_docstore(cls, docstore):
+        index = cls()
+        doc_ids = list(docstore.yield_keys())
+        for doc_id, doc in zip(doc_ids, docstore.mget(doc_ids)):
+            if doc is not None:
+                index.add(doc_id, doc.metadata.get('title', ''))
+        return index
+
+    def add(self, doc_id, title):
+        key = normalize_title(title)
+        if len(key) < 2:
+            return
+        with self._lock:
+            if key in self.exact:
+                return
+            position = len(self.keys)
+            self.keys.append(key)
+            self.titles.append(title)
+            self.doc_ids.append(doc_id)
+            self.exact[key] = position
+            # 스트리밍 수집 중에 추가되는 제목도 바로 자동완성에 잡히도록 정렬 위치에 삽입
+            bisect.insort(self._sorted_keys, (key, position))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, question):
+        """질문이 (질문 표현을 빼면) 레시피 제목과 같으면 TitleMatch, 아니면 None."""
+        key = normalize_question(question)
+        if len(key) < 2:
+            return None
+        with self._lock:
+            position = self.exact.get(key)
+            if position is None:
+                return None
+            return TitleMatch(self.doc_ids[position], self.titles[position], 1.0)
+
+    def complete(self, prefix, limit=10):
+        """입력 중인 글자로 시작하는 레시피 제목을 돌려줍니다. (자동완성)"""
+        key = normalize_question(prefix)
+        if not key:
+            return []
+        results = []
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_keys, (key, -1))
+            for i in range(start, min(start + limit, len(self._sorted_keys))):
+                sorted_key, position = self._sorted_keys[i]
+                if not sorted_key.startswith(key):
+                    break
+                results.append(self.titles[position])
+        return results
+
+
+def format_recipe_answer(document, persona="백종원"):
+    """
+    부모 레시피 문서를 정형화된 답변으로 만듭니다. (LLM 호출 없음)
+    백종원 모음은 백종원 말투로, 다른 모음은 중립적인 말투로 답합니다.
+    """
+    metadata = document.metadata
+    steps = document.page_content.split('만드는 법:', 1)[-1].strip()
+    steps = re.sub(r'\s*(단계 \d+:)', r'\n\1', steps).strip()
+    if persona == "백종원":
+        opening = f"자, '{metadata.get('title', '')}' 만드는 법 알려드릴게유!"
+        closing = "어때유, 어렵지 않쥬? 순서대로만 하면 맛있게 될 거예유~"
+    else:
+        opening = f"'{metadata.get('title', '')}' 만드는 법을 알려드릴게요."
+        closing = "순서대로 따라 하시면 맛있게 만들 수 있어요."
+    return (
+        f"{opening}\n\n"
+        f"필요한 재료: {metadata.get('ingredients', '')}\n\n"
+        f"만드는 법:\n{steps}\n\n"
+        f"{closing}\n\n"
+        f"출처: {metadata.get('url', '')}"
+    )
@@ -1,5 +1,8 @@
 # modules/utils_docstore.py
+import hashlib
+import re
 import uuid
+import numpy as np
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
@@ -32,8 +35,9 @@ def register_parent_docs(docstore, parent_documents):
 
 def make_child_chunks(parent_documents, chunk_size=400, chunk_overlap=60):
     """
-    부모 문서를 잘게 쪼개서 자식 청크를 생성하고,
-    각 자식의 메타데이터에 부모의 doc_id를 복사한다.
+    부모 문서를 잘게 쪼개서 자식 청크를 생성한다.
+    자식 메타데이터에는 부모의 doc_id와 청크 위치(순번, 부모 본문 내 시작/끝 offset)만 저장하고,
+    제목/재료/URL 같은 표시용 정보는 docstore의 부모 문서에서 가져온다.
     
     Args:
         parent_documents (List[Document]): 부모 문서 리스트
@@ -48,7 +52,153 @@ def make_child_chunks(parent_documents, chunk_size=400, chunk_overlap=60):
     )
     children = []
     for p in parent_documents:
-        for ch in splitter.split_documents([p]):
-            ch.metadata["doc_id"] = p.metadata["doc_id"]
-            children.append(ch)
-    return children
\ No newline at end of file
+        text = p.page_content
+        previous_end = 0
+        for position, chunk in enumerate(splitter.split_text(text)):
+            start = find_chunk_start(text, chunk, previous_end - chunk_overlap)
+            children.append(Document(
+                page_content=chunk,
+                metadata=chunk_metadata(p.metadata["doc_id"], position, start, len(chunk))
+            ))
+            if start >= 0:
+                previous_end = start + len(chunk)
+    return children
+
+def find_chunk_start(text, chunk, search_from=0):
+    """부모 본문에서 청크의 시작 위치를 찾는다. 못 찾으면 -1."""
+    start = text.find(chunk, max(0, search_from))
+    return start if start != -1 else text.find(chunk)
+
+def chunk_metadata(doc_id, position, start, length):
+    """Chroma에 저장되는 자식 청크의 최소 메타데이터"""
+    return {
+        "doc_id": doc_id,
+        "chunk_index": position,
+        "start": start,
+        "end": start + length if start >= 0 else -1,
+    }
+
+def _mix64(values):
+    """splitmix64 마무리 단계: 정수 배열을 64비트 전체에 고르게 퍼진 해시로 섞는다."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def simhash(text, shingle_size=3):
+    """글자 n-gram 집합으로 64비트 SimHash를 계산한다. (비슷한 글일수록 해밍 거리가 작음)"""
+    codes = np.frombuffer(re.sub(r'\s+', ' ', text).strip().encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < shingle_size:
+        codes = np.pad(codes, (0, shingle_size - len(codes)))
+    # n-gram마다 글자 코드를 21비트씩 이어 붙여 정수 하나로 만든 뒤 섞음
+    packed = np.zeros(len(codes) - shingle_size + 1, dtype=np.uint64)
+    for i in range(shingle_size):
+        packed = (packed << np.uint64(21)) | codes[i:len(codes) - shingle_size + 1 + i]
+    shingles = _mix64(np.unique(packed))
+    hashes = shingles.view(np.uint8).reshape(len(shingles), 8)
+    # 각 비트에서 1이 과반인지로 최종 비트를 정함
+    ones = np.unpackbits(hashes, axis=1).sum(axis=0)
+    return int.from_bytes(np.packbits(ones * 2 > len(shingles)).tobytes(), 'big')
+
+# 수량 표기 ('설탕 1큰술', '물 500ml', '½개'). 거의 같은 청크라도 수량이 다르면 다른 레시피로 봄
+_QUANTITY_RE = re.compile(
+    r'(\d+(?:[.,/]\d+)?|[½⅓⅔¼¾])\s*(큰술|작은술|숟가락|스푼|컵|kg|g|ml|l|cc|개|줌|꼬집|장|쪽|알|모|마리|분|시간)?',
+    re.IGNORECASE)
+
+
+def quantities(text):
+    """청크에 적힌 (수량, 단위) 목록. 글자 몇 개만 다른 청크라도 이것이 다르면 합치지 않습니다."""
+    return tuple((amount, unit.lower()) for amount, unit in _QUANTITY_RE.findall(text))
+
+
+class ChunkDeduplicator:
+    """
+    내용이 같거나(해시) 거의 같은(SimHash 해밍 거리 <= max_hamming이고 수량 표기가 모두 같은) 청크를 찾는 색인.
+    '설탕 1큰술'과 '설탕 3큰술'처럼 수량만 다른 청크는 SimHash로는 가깝지만 합치지 않습니다.
+    청크를 하나씩 add하므로 DB 구축(dedup_child_chunks)과 스트리밍 수집이 같은 기준으로 중복을 합칩니다.
+    """
+    def __init__(self, max_hamming=3):
+        self.max_hamming = max_hamming
+        self.doc_ids = []      # 위치 → 남긴 청크의 부모 doc_id
+        self.alt_doc_ids = []  # 위치 → 합쳐진 다른 청크들의 부모 doc_id
+        self.stats = {'exact': 0, 'near': 0, 'text_bytes': 0}
+        self._by_digest = {}
+        self._bands = [dict() for _ in range(max_hamming + 1)]  # 비둘기집 원리: 거리 <= k면 k+1개 구간 중 하나는 같음
+        self._band_bits = 64 // len(self._bands)
+
+    def add(self, text, doc_id, alt_doc_ids=(), merge=True):
+        """
+        새 청크면 위치를 등록하고 None을, 이미 있는 청크와 합쳐졌으면 그 청크의 위치를 돌려줍니다.
+        merge=False이면 중복이어도 합치지 않고 등록만 합니다. (이미 저장된 청크로 색인을 채울 때)
+        """
+        target, kind, signature = self._match(text) if merge else (None, None, self._signature(text))
+        if target is None:
+            digest, fingerprint, keys = signature
+            if fingerprint is None:
+                fingerprint, keys = self._fingerprint(text)
+            position = len(self.doc_ids)
+            self._by_digest.setdefault(digest, position)
+            amounts = quantities(text)
+            for band, key in zip(self._bands, keys):
+                band.setdefault(key, []).append((position, fingerprint, amounts))
+            self.doc_ids.append(doc_id)
+            self.alt_doc_ids.append([alt for alt in alt_doc_ids if alt])
+            return None
+
+        self.stats[kind] += 1
+        self._by_digest.setdefault(signature[0], target)
+        self.stats['text_bytes'] += len(text.encode('utf-8'))
+        self.link(target, doc_id)
+        return target
+
+    def find(self, text):
+        """합칠 수 있는 기존 청크의 위치 (없으면 None). 색인은 바꾸지 않습니다."""
+        return self._match(text)[0]
+
+    def link(self, target, doc_id):
+        """target 위치의 청크에 합쳐진 부모 doc_id를 추가합니다."""
+        if doc_id != self.doc_ids[target] and doc_id not in self.alt_doc_ids[target]:
+            self.alt_doc_ids[target].append(doc_id)
+
+    def _signature(self, text):
+        """(sha1, SimHash, 구간 키). SimHash는 정확 중복이 아닐 때만 필요하므로 아직 계산하지 않음(None)"""
+        normalized = re.sub(r'\s+', ' ', text).strip()
+        return hashlib.sha1(normalized.encode('utf-8')).digest(), None, None
+
+    def _fingerprint(self, text):
+        fingerprint = simhash(re.sub(r'\s+', ' ', text).strip())
+        keys = [(fingerprint >> (i * self._band_bits)) & ((1 << self._band_bits) - 1)
+                for i in range(len(self._bands))]
+        return fingerprint, keys
+
+    def _match(self, text):
+        """(합칠 청크 위치 또는 None, 'exact'/'near', 등록에 쓸 signature)"""
+        digest, _, _ = self._signature(text)
+        target = self._by_digest.get(digest)
+        if target is not None:
+            return target, 'exact', (digest, None, None)
+        fingerprint, keys = self._fingerprint(text)
+        amounts = quantities(text)
+        for band, key in zip(self._bands, keys):
+            for candidate, candidate_fp, candidate_amounts in band.get(key, ()):
+                if bin(fingerprint ^ candidate_fp).count('1') <= self.max_hamming and candidate_amounts == amounts:
+                    return candidate, 'near', (digest, fingerprint, keys)
+        return None, None, (digest, fingerprint, keys)
+
+def dedup_child_chunks(children, max_hamming=3):
+    """
+    내용이 같거나(해시) 거의 같은(SimHash 해밍 거리 <= max_hamming, 수량 표기는 같은) 자식 청크를 하나로 합친다.
+    남은 청크의 메타데이터 'alt_doc_ids'에 합쳐진 청크들의 부모 doc_id를 콤마로 이어 저장하고,
+    검색 시 리트리버가 이 부모들까지 함께 펼친다.
+
+    Returns:
+        Tuple[List[Document], dict]: (임베딩할 청크, {'exact': 정확 중복 수, 'near': 유사 중복 수,
+                                     'text_bytes': 합쳐져 저장하지 않게 된 본문 바이트 수})
+    """
+    deduplicator = ChunkDeduplicator(max_hamming)
+    kept = [ch for ch in children if deduplicator.add(ch.page_content, ch.metadata["doc_id"]) is None]
+    for ch, alts in zip(kept, deduplicator.alt_doc_ids):
+        if alts:
+            ch.metadata["alt_doc_ids"] = ",".join(alts)
+    return kept, deduplicator.stats
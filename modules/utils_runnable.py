@@ -0,0 +1,46 @@
+# modules/utils_runnable.py
+from typing import Any
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ensure_config
+
+
+class StreamableLambda(Runnable[Any, Any]):
+    """
+    invoke와 stream을 서로 다른 함수로 처리하는 Runnable.
+    RunnableLambda는 stream해도 invoke 결과를 한 번에 내보내므로, 토큰 스트리밍을 유지해야 하는 래퍼
+    (LLM failover, 스케줄러, RAG 체인 래퍼)에 사용합니다.
+
+    Args:
+        invoke_fn (callable): (input, config) → 결과
+        stream_fn (callable): (input, config) → 결과 조각 iterator
+    """
+    def __init__(self, invoke_fn, stream_fn, name=None):
+        self.invoke_fn = invoke_fn
+        self.stream_fn = stream_fn
+        self.name = name or getattr(invoke_fn, "__name__", None)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._call_with_config(self._invoke, input, ensure_config(config), **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.transform(iter([input]), config, **kwargs)
+
+    def transform(self, input, config=None, **kwargs):
+        yield from self._transform_stream_with_config(input, self._transform, ensure_config(config), **kwargs)
+
+    def _invoke(self, input, config):
+        return self.invoke_fn(input, config)
+
+    def _transform(self, chunks, config):
+        # 앞 단계가 조각으로 넘겨준 입력은 모두 합친 뒤 처리 (합칠 수 없으면 마지막 조각)
+        final, received = None, False
+        for chunk in chunks:
+            if not received:
+                final, received = chunk, True
+                continue
+            try:
+                final = final + chunk
+            except TypeError:
+                final = chunk
+        yield from self.stream_fn(final, config)
@@ -2,6 +2,8 @@
 import json
 import os
 import sys
+import time
+import uuid
 import sqlite3
 # 내장 sqlite3 모듈을 pysqlite3로 덮어쓰기
 sys.modules["sqlite3"] = sqlite3
@@ -13,27 +15,38 @@ from langchain.docstore.document import Document
 from langchain.storage import InMemoryStore # --- 추가된 부분 ---
 
 from . import config
-from .utils_docstore import compute_doc_id, register_parent_docs, make_child_chunks
+from .utils_docstore import compute_doc_id, register_parent_docs, make_child_chunks, find_chunk_start, chunk_metadata, dedup_child_chunks
+from .recipe_store import iter_recipes
+from .scheduler import BatchingEmbeddings, INTERACTIVE, BACKGROUND
+from .profiler import substep
 
 class VectorStoreManager:
     """
     전처리된 데이터를 로드하여 벡터 DB를 구축하고 관리하는 클래스.
     """
-    def __init__(self, persist_directory=config.CHROMA_DB_PATH):
+    def __init__(self, persist_directory=config.CHROMA_DB_PATH, scheduler=None):
         self.persist_directory = persist_directory
         self.doc_embedding = UpstageEmbeddings(model="solar-embedding-1-large-passage", api_key=config.UPSTAGE_API_KEY)
         self.query_embedding = UpstageEmbeddings(model="solar-embedding-1-large-query", api_key=config.UPSTAGE_API_KEY)
+        if scheduler is not None:
+            # 질문 임베딩은 짧은 시간 창 동안 모아서 한 번에 요청하고, DB 구축용 임베딩은 낮은 우선순위로 처리
+            self.query_embedding = BatchingEmbeddings(
+                self.query_embedding, scheduler, batch_window=config.EMBEDDING_BATCH_WINDOW,
+                query_priority=INTERACTIVE, document_priority=INTERACTIVE
+            )
+            self.doc_embedding = BatchingEmbeddings(
+                self.doc_embedding, scheduler, batch_window=config.EMBEDDING_BATCH_WINDOW,
+                query_priority=BACKGROUND, document_priority=BACKGROUND
+            )
     
     def _load_documents_from_json(self, json_path):
+        # JSON 배열과 압축 레코드 파일(.rec) 모두 읽을 수 있음 (형식은 파일 앞부분으로 판별)
         if not os.path.exists(json_path):
             print(f"WARNING: '{json_path}' 파일이 존재하지 않습니다.")
             return []
-            
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
         
         documents = []
-        for item in data:
+        for item in iter_recipes(json_path):
             # combined_text를 주 내용으로, 나머지를 메타데이터로 저장
             metadata = {
                 'id': item.get('id', ''),
@@ -49,25 +62,51 @@ class VectorStoreManager:
     def build(self, docstore: InMemoryStore, json_path=config.MERGED_PREPROCESSED_FILE):
         print("INFO: ParentDocumentRetriever용 벡터 DB 구축을 시작합니다...")
         
-        parent_documents = self._load_documents_from_json(json_path)
+        with substep("load_json"):
+            parent_documents = self._load_documents_from_json(json_path)
         if not parent_documents:
             print("ERROR: 벡터 DB를 구축할 문서가 없습니다.")
             return None
 
-        # 부모 문서(원본 레시피)에 고유 ID를 부여하고 docstore에 저장
-        register_parent_docs(docstore, parent_documents)
-        # 자식 문서(잘게 쪼갠 조각) 생성
-        child_documents = make_child_chunks(parent_documents, chunk_size=400, chunk_overlap=60)
+        with substep("split"):
+            # 부모 문서(원본 레시피)에 고유 ID를 부여하고 docstore에 저장
+            register_parent_docs(docstore, parent_documents)
+            # 자식 문서(잘게 쪼갠 조각) 생성
+            child_documents = make_child_chunks(parent_documents, chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)
         
         print(f"INFO: 총 {len(parent_documents)}개의 부모 문서를 {len(child_documents)}개의 자식 청크로 분할했습니다.")
+        if config.USE_CHUNK_DEDUP:
+            # 같은/거의 같은 청크는 하나만 임베딩하고, 나머지 부모는 alt_doc_ids로 연결
+            total = len(child_documents)
+            with substep("chunk_dedup"):
+                child_documents, stats = dedup_child_chunks(child_documents, max_hamming=config.CHUNK_DEDUP_MAX_HAMMING)
+            saved = total - len(child_documents)
+            if saved:
+                # 벡터(float32) 크기 + 청크 본문 크기로 대략 추정
+                saved_bytes = saved * config.EMBEDDING_DIM * 4 + stats['text_bytes']
+                print(f"INFO: 중복 청크 {saved}개(완전 일치 {stats['exact']}개, 유사 {stats['near']}개)를 합쳐 "
+                      f"임베딩 {saved}건({saved / total:.1%})과 색인 약 {saved_bytes / 2**20:.1f} MB를 절약했습니다.")
         print("INFO: 'passage' 모델로 자식 청크 임베딩 및 DB 저장을 진행합니다.")
 
-        # 자식 문서를 벡터DB에 저장 (Langchain의 from_documents는 자동 배치 처리 기능이 있음)
-        vectorstore = Chroma.from_documents(
-            documents=child_documents,
-            embedding=self.doc_embedding,
-            persist_directory=self.persist_directory
-        )
+        # 자식 문서를 벡터DB에 저장 (Chroma.from_documents와 같지만, 프로파일에서 임베딩과 DB 쓰기를 나눠 보도록 직접 처리)
+        texts = [doc.page_content for doc in child_documents]
+        with substep("embed"):
+            embeddings = self.doc_embedding.embed_documents(texts)
+        vectorstore = Chroma(persist_directory=self.persist_directory, embedding_function=self.doc_embedding)
+        with substep("chroma_write"):
+            ids = [str(uuid.uuid4()) for _ in child_documents]
+            batch_size = vectorstore._client.get_max_batch_size()
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                vectorstore._collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=[doc.metadata for doc in child_documents[start:end]],
+                    documents=texts[start:end]
+                )
+        # 새로 구축한 DB는 이미 축소된 메타데이터를 사용하므로 변환 대상이 아님을 표시
+        with open(os.path.join(self.persist_directory, SLIM_METADATA_MARKER), "w", encoding="utf-8") as f:
+            f.write("doc_id, chunk_index, start, end\n")
         print(f"SUCCESS: 벡터 DB 구축 완료. '{self.persist_directory}'에 저장되었습니다.")
         return vectorstore
         
@@ -82,4 +121,116 @@ class VectorStoreManager:
             persist_directory=self.persist_directory,
             embedding_function=self.query_embedding # 👈 질문용 모델 사용
         )
-        return vectorstore
\ No newline at end of file
+        return vectorstore
+
+    def has_slim_metadata(self):
+        """자식 청크 메타데이터가 이미 doc_id + 청크 위치만 남도록 축소되어 있는지"""
+        return os.path.exists(os.path.join(self.persist_directory, SLIM_METADATA_MARKER))
+
+    def migrate_chunk_metadata(self, docstore, batch_size=5000):
+        """
+        예전 방식으로 구축된 DB의 자식 청크 메타데이터(부모의 title/ingredients/url 복사본)를
+        doc_id + 청크 위치만 남도록 한 번만 변환합니다. 임베딩은 다시 계산하지 않습니다.
+        변환 뒤 SQLite 파일을 VACUUM하므로, 같은 DB를 연 다른 클라이언트가 없을 때(main.py에서 색인을
+        불러오기 전) 실행해야 합니다.
+        """
+        if self.has_slim_metadata():
+            return False
+        vectorstore = self.load()
+        if not vectorstore:
+            return False
+        collection = vectorstore._collection
+        size_before = _dir_size(self.persist_directory)
+
+        start_time = time.perf_counter()
+        ids, metadatas, documents = [], [], []
+        offset = 0
+        while True:
+            batch = collection.get(include=["metadatas", "documents"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            metadatas.extend(batch["metadatas"])
+            documents.extend(batch["documents"])
+            offset += len(batch["ids"])
+        load_before = time.perf_counter() - start_time
+
+        migrated = any(set(md or {}) - SLIM_METADATA_KEYS for md in metadatas)
+        if migrated:
+            # 부모 본문에서의 위치로 offset과 청크 순번을 다시 계산
+            doc_ids = list({md["doc_id"] for md in metadatas})
+            parents = dict(zip(doc_ids, docstore.mget(doc_ids)))
+            starts = []
+            for md, text in zip(metadatas, documents):
+                parent = parents.get(md["doc_id"])
+                starts.append(find_chunk_start(parent.page_content, text) if parent is not None else -1)
+            order = sorted(range(len(ids)), key=lambda i: (metadatas[i]["doc_id"], starts[i]))
+            positions, counters = [0] * len(ids), {}
+            for i in order:
+                doc_id = metadatas[i]["doc_id"]
+                positions[i] = counters.get(doc_id, 0)
+                counters[doc_id] = positions[i] + 1
+
+            new_metadatas = []
+            for md, text, position, start in zip(metadatas, documents, positions, starts):
+                slim = chunk_metadata(md["doc_id"], position, start, len(text))
+                # 업데이트는 기존 키와 병합되므로, 없앨 키는 None으로 지정해 삭제
+                slim.update({key: None for key in set(md) - SLIM_METADATA_KEYS})
+                new_metadatas.append(slim)
+            for i in range(0, len(ids), batch_size):
+                collection.update(ids=ids[i:i + batch_size], metadatas=new_metadatas[i:i + batch_size])
+        # VACUUM 전에 이 프로세스의 Chroma 연결을 모두 닫음
+        close_vectorstore(vectorstore)
+
+        if migrated:
+            # 지워진 메타데이터가 차지하던 공간을 반환 (다른 프로세스가 DB를 쓰고 있으면 건너뜀)
+            try:
+                with sqlite3.connect(os.path.join(self.persist_directory, "chroma.sqlite3"), timeout=5) as conn:
+                    conn.execute("VACUUM")
+            except sqlite3.OperationalError as e:
+                print(f"WARNING: 다른 프로세스가 벡터 DB를 사용 중이라 VACUUM을 건너뜁니다: {e}")
+
+            vectorstore = self.load()
+            collection = vectorstore._collection
+            start_time = time.perf_counter()
+            for i in range(0, len(ids), batch_size):
+                collection.get(include=["metadatas", "documents"], limit=batch_size, offset=i)
+            load_after = time.perf_counter() - start_time
+            close_vectorstore(vectorstore)
+            print(f"SUCCESS: 자식 청크 {len(ids)}개의 메타데이터를 축소했습니다. "
+                  f"DB 크기 {size_before / 2**20:.1f} MB → {_dir_size(self.persist_directory) / 2**20:.1f} MB, "
+                  f"전체 청크 조회 {load_before * 1000:.0f} ms → {load_after * 1000:.0f} ms")
+
+        with open(os.path.join(self.persist_directory, SLIM_METADATA_MARKER), "w", encoding="utf-8") as f:
+            f.write("doc_id, chunk_index, start, end\n")
+        return True
+
+
+def close_vectorstore(vectorstore):
+    """
+    Chroma 클라이언트를 닫아 이 경로의 SQLite 연결과 HNSW 색인을 메모리에서 내립니다.
+    chromadb는 경로마다 System을 캐시해 두므로 참조를 버리는 것만으로는 해제되지 않습니다.
+    (같은 경로를 연 클라이언트가 여럿이면 마지막 클라이언트가 닫힐 때 해제됨)
+    """
+    client = getattr(vectorstore, "_client", None)
+    if client is None:
+        return
+    if hasattr(client, "close"):
+        client.close()
+    else:
+        # close()가 없는 이전 chromadb: 캐시에서 System을 꺼내 직접 멈춤
+        system = client._identifier_to_system.pop(client._identifier, None)
+        if system is not None:
+            system.stop()
+
+
+# 자식 청크 메타데이터에 남기는 키 (나머지는 docstore의 부모 문서에서 조회)
+SLIM_METADATA_KEYS = {"doc_id", "chunk_index", "start", "end", "alt_doc_ids"}
+SLIM_METADATA_MARKER = ".slim_chunk_metadata"
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
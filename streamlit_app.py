@@ -1,16 +1,20 @@
 import streamlit as st
 import os
 import sys
+import time
+import functools
+import itertools
 from datetime import datetime
 
 # Add the current directory to Python path to import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from modules import config
-from modules.vector_store import VectorStoreManager
-from modules.retriever import AdvancedRetriever
 from modules.llm_handler import LLMHandler
-from langchain.storage import InMemoryStore
+from modules.shared_store import create_backend
+from modules.scheduler import RequestScheduler
+from modules.index_versions import load_snapshot
+from modules.corpus import CorpusManager
 
 # Page configuration
 st.set_page_config(
@@ -30,19 +34,6 @@ st.markdown("""
         font-weight: bold;
         margin-bottom: 1rem;
     }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 0.5rem 0;
-    }
-    .user-message {
-        background-color: #E3F2FD;
-        border-left: 4px solid #2196F3;
-    }
-    .bot-message {
-        background-color: #FFF3E0;
-        border-left: 4px solid #FF9800;
-    }
     .sidebar-info {
         background-color: #F5F5F5;
         padding: 1rem;
@@ -57,31 +48,25 @@ def initialize_qa_system():
     """Initialize the QA system (cached to avoid reloading)"""
     try:
         with st.spinner("🔄 QA 시스템을 초기화하고 있습니다..."):
-            # Check if vector DB exists
-            if not os.path.exists(config.CHROMA_DB_PATH):
+            # Share one request budget between embedding and LLM calls if enabled
+            scheduler = RequestScheduler.from_config() if config.USE_REQUEST_SCHEDULER else None
+            # Parent documents live in a shared backend if configured (one namespace per index version)
+            backend = create_backend()
+
+            # Each corpus loads the index version its CURRENT points to on first use; later versions are
+            # loaded in the background and swapped in between requests, so no restart is needed after a rebuild.
+            # Least recently used corpora are dropped when the memory budget is exceeded.
+            corpora = CorpusManager(functools.partial(
+                load_snapshot, scheduler=scheduler, backend=backend, use_ingredient_index=False
+            ), in_memory_docstore=backend is None)
+            if not corpora.available():
                 st.error("❌ 벡터 DB가 존재하지 않습니다. 먼저 `python main.py --rebuild-db`를 실행해주세요.")
                 st.stop()
             
-            # Initialize vector store manager
-            vs_manager = VectorStoreManager()
-            vectorstore = vs_manager.load()
-            
-            if not vectorstore:
-                st.error("❌ 벡터 DB 로드에 실패했습니다.")
-                st.stop()
-            
-            # Initialize docstore and load parent documents
-            docstore = InMemoryStore()
-            parent_documents = vs_manager._load_documents_from_json(config.MERGED_PREPROCESSED_FILE)
-            doc_ids = [doc.metadata.get("id", str(i)) for i, doc in enumerate(parent_documents)]
-            docstore.mset(list(zip(doc_ids, parent_documents)))
-            
-            # Initialize retriever
-            adv_retriever = AdvancedRetriever(vectorstore, docstore)
-            retriever = adv_retriever.get_retriever()
-            
             # Initialize LLM handler and create QA chain
-            llm_handler = LLMHandler(retriever=retriever)
+            # (each question is routed to a corpus; the title index for the "<dish> 레시피" fast path
+            # and sidebar autocomplete comes with that corpus' snapshot)
+            llm_handler = LLMHandler(backend=backend, scheduler=scheduler, corpora=corpora)
             qa_chain = llm_handler.create_rag_chain()
             
             return qa_chain, llm_handler
@@ -90,11 +75,36 @@ def initialize_qa_system():
         st.error(f"❌ 시스템 초기화 중 오류가 발생했습니다: {str(e)}")
         st.stop()
 
+AVATARS = {"user": "🤔", "assistant": "👨‍🍳"}
+
+def answer_tokens(chunks):
+    """Yield only the answer text from the RAG chain's streamed chunks"""
+    for chunk in chunks:
+        if chunk.get("answer"):
+            yield chunk["answer"]
+
+def render_message(message):
+    """Render one chat turn with Streamlit's native chat element (markdown, no raw HTML)"""
+    with st.chat_message(message["role"], avatar=AVATARS[message["role"]]):
+        st.markdown(message["content"])
+
+def show_more_messages():
+    st.session_state.visible_messages += config.CHAT_PAGE_SIZE
+
+def reset_conversation():
+    # Runs as a button callback before the script, so no extra st.rerun is needed
+    st.session_state.messages = []
+    st.session_state.visible_messages = config.CHAT_PAGE_SIZE
+    st.session_state.session_id = f"streamlit_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
 def main():
     # Header
     st.markdown('<h1 class="main-header">👨‍🍳 백종원 레시피 챗봇</h1>', unsafe_allow_html=True)
     st.markdown("---")
     
+    # Initialize QA system
+    qa_chain, llm_handler = initialize_qa_system()
+    
     # Sidebar
     with st.sidebar:
         st.markdown("### 📋 사용 방법")
@@ -120,16 +130,35 @@ def main():
             if st.button(f"💬 {question}", key=f"example_{i}"):
                 st.session_state.example_question = question
         
+        # Corpus selector: "auto" routes each question by its keywords, otherwise pin the session to one corpus
+        corpora = llm_handler.corpora
+        available = corpora.available()
+        if len(available) > 1:
+            st.markdown("### 📚 레시피 모음")
+            options = ["자동 선택"] + available
+            choice = st.selectbox("레시피 모음", options, key="corpus_choice",
+                                  format_func=lambda name: name if name == "자동 선택"
+                                  else f"{name} ({corpora.corpora[name].search_query})",
+                                  label_visibility="collapsed")
+            st.session_state.corpus = None if choice == "자동 선택" else choice
+        else:
+            st.session_state.corpus = None
+        
+        title_index = corpora.get(st.session_state.corpus or corpora.default).title_index
+        if title_index is not None:
+            st.markdown("### 🔎 레시피 바로 찾기")
+            prefix = st.text_input("요리 이름", key="title_prefix", placeholder="예: 김치",
+                                   label_visibility="collapsed")
+            for i, title in enumerate(title_index.complete(prefix, limit=5)):
+                if st.button(f"📖 {title}", key=f"title_{i}"):
+                    st.session_state.example_question = f"{title} 레시피"
+            stats = title_index.stats.summary()
+            if stats['requests']:
+                st.caption(f"⚡ 빠른 답변 {stats['hit_rate']:.0%} ({stats['requests']}건 중), "
+                           f"평균 {stats['avg_hit_ms']:.1f} ms")
+        
         st.markdown("---")
-        if st.button("🗑️ 대화 기록 초기화"):
-            if 'messages' in st.session_state:
-                st.session_state.messages = []
-            if 'session_id' in st.session_state:
-                st.session_state.session_id = f"streamlit_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            st.rerun()
-    
-    # Initialize QA system
-    qa_chain, llm_handler = initialize_qa_system()
+        st.button("🗑️ 대화 기록 초기화", on_click=reset_conversation)
     
     # Initialize session state
     if 'messages' not in st.session_state:
@@ -138,70 +167,48 @@ def main():
     if 'session_id' not in st.session_state:
         st.session_state.session_id = f"streamlit_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
-    # Display chat messages
-    chat_container = st.container()
-    with chat_container:
-        for message in st.session_state.messages:
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="chat-message user-message" style="color: black;">
-                        <strong>🤔 질문:</strong> {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="chat-message bot-message" style="color: black;">
-                        <strong>👨‍🍳 백주부:</strong><br>{message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-
+    if 'visible_messages' not in st.session_state:
+        st.session_state.visible_messages = config.CHAT_PAGE_SIZE
+    
+    # Only the latest page of the conversation is sent to the browser; older turns load on demand
+    render_start = time.perf_counter()
+    messages = st.session_state.messages
+    hidden = max(0, len(messages) - st.session_state.visible_messages)
+    if hidden:
+        st.button(f"⬆️ 이전 대화 더 보기 ({hidden}개 숨김)", on_click=show_more_messages)
+    for message in messages[hidden:]:
+        render_message(message)
+    render_ms = (time.perf_counter() - render_start) * 1000
     
-    # Handle example question clicks
+    # Example/title buttons in the sidebar were handled earlier in this run
+    user_input = st.chat_input("예: 김치찌개 만드는 법 알려줘")
     if 'example_question' in st.session_state:
-        user_input = st.session_state.example_question
-        del st.session_state.example_question
-        process_user_input = True
-    else:
-        process_user_input = False
+        user_input = st.session_state.pop('example_question')
     
-    # Chat input form
-    with st.form(key="chat_form", clear_on_submit=True):
-        col1, col2 = st.columns([4, 1])
-        
-        with col1:
-            if not process_user_input:
-                user_input = st.text_input(
-                    "질문을 입력하세요:",
-                    placeholder="예: 김치찌개 만드는 법 알려줘",
-                    label_visibility="collapsed"
-                )
+    if user_input:
+        # Append the new turn below the history in this same run (no st.rerun, so the page renders once per turn)
+        user_message = {"role": "user", "content": user_input}
+        st.session_state.messages.append(user_message)
+        render_message(user_message)
         
-        with col2:
-            send_button = st.form_submit_button("전송", type="primary", use_container_width=True)
-        
-        # Process form submission or example question
-        if (send_button and user_input) or process_user_input:
-            # Add user message to chat history
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            
-            # Get response from QA system
-            with st.spinner("🤔 백종원이 생각하고 있습니다..."):
-                try:
-                    response = qa_chain.invoke(
+        with st.chat_message("assistant", avatar=AVATARS["assistant"]):
+            try:
+                configurable = {"session_id": st.session_state.session_id}
+                if st.session_state.corpus:
+                    configurable["corpus"] = st.session_state.corpus
+                # Wait for the first token under the spinner, then stream the rest into the chat bubble
+                with st.spinner("🤔 백종원이 생각하고 있습니다..."):
+                    tokens = answer_tokens(qa_chain.stream(
                         {"input": user_input},
-                        config={"configurable": {"session_id": st.session_state.session_id}}
-                    )
-                    
-                    bot_response = response['answer']
-                    
-                    # Add bot response to chat history
-                    st.session_state.messages.append({"role": "assistant", "content": bot_response})
-                    
-                    # Rerun to show new messages
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ 답변 생성 중 오류가 발생했습니다: {str(e)}")
+                        config={"configurable": configurable}
+                    ))
+                    first = next(tokens, "")
+                answer = st.write_stream(itertools.chain([first], tokens))
+            except Exception as e:
+                answer = None
+                st.error(f"❌ 답변 생성 중 오류가 발생했습니다: {str(e)}")
+            if answer is not None:
+                st.session_state.messages.append({"role": "assistant", "content": answer})
     
     # Welcome message if no conversation yet
     if not st.session_state.messages:
@@ -212,6 +219,11 @@ def main():
     <p>왼쪽 사이드바의 예시 질문을 클릭하거나 직접 질문을 입력해보세요!</p>
 </div>
 """, unsafe_allow_html=True)
+    else:
+        # hidden was computed before this turn was appended, so count against the page size instead
+        shown = min(len(messages), st.session_state.visible_messages)
+        st.sidebar.caption(f"🖥️ 대화 {len(st.session_state.messages)}개 중 {shown}개 표시, "
+                           f"렌더링 {render_ms:.1f} ms")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+# tests/bench_chat_render.py
+"""
+Streamlit 채팅 화면의 대화 한 턴 처리 시간을 대화 길이별로 잽니다. (pytest가 수집하지 않는 벤치마크 스크립트)
+실제 색인/LLM 대신 고정된 답변을 조각으로 돌려주는 체인을 쓰므로, 화면 렌더링 비용만 비교할 수 있습니다.
+사이드바의 '대화 N개 중 M개 표시'가 페이지 크기(CHAT_PAGE_SIZE)를 넘는 턴에서도 맞는지 함께 확인합니다.
+
+사용법: python tests/bench_chat_render.py [대화 길이 ...]
+"""
+import os
+import re
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+from modules import config
+import modules.corpus
+import modules.llm_handler
+
+ANSWER = "자, 이렇게 하면 돼유. " * 20 + "\n\n출처: https://www.10000recipe.com/recipe/1"
+
+
+class FakeChain:
+    """답변을 몇 글자씩 나눠 스트리밍하는 RAG 체인 대역"""
+    def stream(self, inputs, config=None):
+        yield {"corpus": "baek"}
+        for start in range(0, len(ANSWER), 16):
+            yield {"answer": ANSWER[start:start + 16]}
+
+
+class FakeHandler:
+    def __init__(self, **kwargs):
+        snapshot = types.SimpleNamespace(title_index=None)
+        self.corpora = types.SimpleNamespace(available=lambda: ['baek'], default='baek', get=lambda name=None: snapshot)
+
+    def create_rag_chain(self):
+        return FakeChain()
+
+
+class FakeCorpusManager:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def available(self):
+        return ['baek']
+
+
+def history(n):
+    return [{"role": "user", "content": f"질문 {i}"} if i % 2 == 0 else {"role": "assistant", "content": ANSWER}
+            for i in range(n)]
+
+
+def run_turn(n):
+    """대화 n개가 쌓인 세션에서 질문 하나를 보내고 (걸린 시간(ms), 사이드바 표시 수, 전체 메시지 수)를 돌려줌"""
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=60)
+    app.session_state.messages = history(n)
+    app.session_state.session_id = "bench"
+    app.run()
+    start = time.perf_counter()
+    app.chat_input[0].set_value("김치찌개 만드는 법").run()
+    elapsed = (time.perf_counter() - start) * 1000
+    assert not app.exception, app.exception
+    caption = next(c.value for c in app.sidebar.caption if c.value.startswith("🖥️"))
+    shown = int(re.search(r"중 (\d+)개 표시", caption).group(1))
+    return elapsed, shown, len(app.session_state.messages)
+
+
+def main(lengths):
+    modules.llm_handler.LLMHandler = FakeHandler
+    modules.corpus.CorpusManager = FakeCorpusManager
+    page = config.CHAT_PAGE_SIZE
+    # 페이지 크기를 넘기는 턴(page - 1 → page + 1)도 포함해 표시 수가 페이지 크기를 넘지 않는지 확인
+    for n in sorted({page - 1, *lengths}):
+        runs = [run_turn(n) for _ in range(3)]
+        _, shown, total = runs[0]
+        assert shown == min(total, page), f"대화 {total}개 중 {shown}개 표시 (페이지 크기 {page})"
+        print(f"대화 {n:>4}개: 한 턴 {min(ms for ms, _, _ in runs):7.0f} ms (표시 {shown}/{total})")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 300, 600])
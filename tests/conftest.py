@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# 프로젝트 루트의 modules 패키지를 가져올 수 있도록 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+# tests/test_corpus.py
+import os
+import subprocess
+import sys
+
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain.storage import InMemoryStore
+from langchain_chroma import Chroma
+
+from modules import index_versions
+from modules.corpus import Corpus, CorpusManager
+
+
+def _corpus(tmp_path, name):
+    corpus = Corpus(name, name)
+    corpus.versions_dir = str(tmp_path / name / "index_versions")
+    corpus.current_file = os.path.join(corpus.versions_dir, "CURRENT")
+    corpus.legacy_chroma_path = None
+    version = index_versions.create_version(corpus)
+    vectorstore = Chroma(persist_directory=version.chroma_path)
+    vectorstore._collection.add(ids=[str(i) for i in range(200)], embeddings=[[float(i), 1.0] for i in range(200)],
+                                documents=["양파 볶음"] * 200)
+    vectorstore._client.close()
+    index_versions.publish(version)
+    return corpus
+
+
+def _load(version):
+    vectorstore = Chroma(persist_directory=version.chroma_path)
+    vectorstore._collection.query(query_embeddings=[[1.0, 1.0]], n_results=1)  # HNSW 색인을 메모리에 올림
+    return index_versions.IndexSnapshot(version, vectorstore, InMemoryStore(), retriever=None)
+
+
+def _open_paths():
+    return {os.path.realpath(path) for path in SharedSystemClient._identifier_to_system}
+
+
+def test_evicted_corpus_releases_its_chroma_clients(tmp_path):
+    corpora = {name: _corpus(tmp_path, name) for name in ("a", "b")}
+    manager = CorpusManager(_load, corpora=corpora, default="a", memory_budget_mb=0, release_grace=0)
+
+    first = manager.get("a")
+    assert os.path.realpath(first.version.chroma_path) in _open_paths()
+    manager.get("b")  # 한도(0 MB)를 넘으므로 오래 안 쓴 'a'를 내림
+
+    assert manager.loaded() == ["b"]
+    # chromadb가 경로별로 캐시한 System까지 닫혀야 메모리가 실제로 해제됨
+    assert os.path.realpath(first.version.chroma_path) not in _open_paths()
+    assert os.path.realpath(manager.get("b").version.chroma_path) in _open_paths()
+
+
+def _import_config(**env):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run([sys.executable, "-c", "import modules.config"], cwd=root, capture_output=True,
+                          text=True, env={**os.environ, **env})
+
+
+def test_missing_corpora_fails_with_a_config_error():
+    result = _import_config(CORPORA="", DEFAULT_CORPUS="")
+    assert result.returncode != 0
+    assert "ValueError: CORPORA" in result.stderr and "StopIteration" not in result.stderr
+
+    result = _import_config(CORPORA="baek=백종원", DEFAULT_CORPUS="lee")
+    assert "ValueError: DEFAULT_CORPUS 'lee'" in result.stderr
+
+    assert _import_config(CORPORA=" baek = 백종원 , lee=이연복", DEFAULT_CORPUS="").returncode == 0
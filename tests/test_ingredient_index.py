@@ -0,0 +1,60 @@
+# tests/test_ingredient_index.py
+from modules.ingredient_index import IngredientIndex, parse_ingredients
+from modules.utils_docstore import compute_doc_id
+
+RECIPES = [
+    {'id': '1', 'title': '감자볶음', 'ingredients': '감자, 2개, 양파, 1/2개, 다진 마늘, 약간, 소금',
+     'url': 'https://example.com/recipe/1'},
+    {'id': '2', 'title': '고추장찌개', 'ingredients': '돼지고기 200g, 감자, 양파, 대파 or 쪽파, 고추장(태양초), 1큰술',
+     'url': 'https://example.com/recipe/2'},
+    {'id': '3', 'title': '파무침', 'ingredients': '양파, 대파, 고기', 'url': 'https://example.com/recipe/3'},
+]
+DOC_IDS = [compute_doc_id(recipe) for recipe in RECIPES]
+
+
+def test_parse_ingredients_pairs_names_with_quantities():
+    assert parse_ingredients(RECIPES[0]['ingredients']) == [
+        {'name': '감자', 'quantity': '2', 'unit': '개'},
+        {'name': '양파', 'quantity': '1/2', 'unit': '개'},
+        {'name': '다진 마늘', 'quantity': '약간', 'unit': ''},
+        {'name': '소금', 'quantity': None, 'unit': ''},
+    ]
+    records = parse_ingredients(RECIPES[1]['ingredients'])
+    assert records[0] == {'name': '돼지고기', 'quantity': '200', 'unit': 'g'}
+    assert records[-1] == {'name': '고추장(태양초)', 'quantity': '1', 'unit': '큰술'}
+    assert [record['quantity'] for record in records[1:4]] == [None, None, None]
+
+
+def test_bitset_query_intersects_and_orders_by_ingredient_count():
+    index = IngredientIndex.build(RECIPES)
+    assert len(index) == 3
+    assert index.postings['양파'] == 0b111 and index.postings['감자'] == 0b011
+
+    assert index.query(['감자', '양파']) == [DOC_IDS[0], DOC_IDS[1]]
+    assert index.query(['양파']) == [DOC_IDS[2], DOC_IDS[0], DOC_IDS[1]]  # 재료가 적은 레시피부터
+    assert index.query(['양파'], limit=1) == [DOC_IDS[2]]
+    # '다진 마늘'은 '마늘'로도, '대파 or 쪽파'는 둘 다로, 괄호 안 설명은 빼고 색인
+    assert index.query(['마늘']) == [DOC_IDS[0]]
+    assert index.query(['쪽파']) == index.query(['고추장']) == [DOC_IDS[1]]
+    assert index.query(['감자', '고추장', '마늘']) == []
+    assert index.query([]) == [] and index.query(['없는재료']) == []
+
+
+def test_match_names_prefers_longer_names():
+    index = IngredientIndex.build(RECIPES)
+    assert sorted(index.match_names("감자랑 양파로 뭐 해먹지?")) == ['감자', '양파']
+    # '돼지고기' 안의 '고기'는 따로 잡지 않음
+    assert index.match_names("돼지고기 요리") == ['돼지고기']
+    assert sorted(index.match_names("고기랑 대파")) == ['고기', '대파']
+
+
+def test_save_and_load_keep_the_bitsets(tmp_path):
+    index = IngredientIndex.build(RECIPES)
+    path = str(tmp_path / "ingredient_index.json")
+    index.save(path)
+    loaded = IngredientIndex.load(path)
+    assert loaded.postings == index.postings
+    assert loaded.records == index.records
+    assert loaded.query(['양파', '대파']) == index.query(['양파', '대파']) == [DOC_IDS[2], DOC_IDS[1]]
+    assert loaded.match_names("돼지고기 요리") == ['돼지고기']
+    assert IngredientIndex.load(str(tmp_path / "missing.json")) is None
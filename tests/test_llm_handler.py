@@ -0,0 +1,168 @@
+# tests/test_llm_handler.py
+import itertools
+
+from langchain.docstore.document import Document
+from langchain.storage import InMemoryStore
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+
+from modules.index_versions import IndexSnapshot
+from modules.llm_handler import LLMHandler
+from modules.title_index import TitleIndex
+
+
+class FakeLLMClient:
+    def __init__(self, responses):
+        self.model = FakeListChatModel(responses=responses)
+
+    def as_runnable(self):
+        return self.model
+
+
+class StaticRetriever(BaseRetriever):
+    documents: list
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.documents
+
+
+class Version:
+    def __init__(self, name):
+        self.name = name
+        self.published_at = name
+
+
+def _snapshot(version):
+    docstore = InMemoryStore()
+    document = Document(page_content=f"{version} 본문", metadata={'doc_id': f'{version}-doc', 'title': '김치찌개',
+                                                               'url': f'https://example.com/{version}'})
+    docstore.mset([(f'{version}-doc', document)])
+    title_index = TitleIndex()
+    title_index.add(f'{version}-doc', '김치찌개')
+    return IndexSnapshot(Version(version), None, docstore, StaticRetriever(documents=[document]), title_index)
+
+
+class SwappingCorpora:
+    """get()을 부를 때마다 새 버전이 배포된 것처럼 다른 스냅샷을 돌려주는 CorpusManager"""
+    default = 'baek'
+
+    def __init__(self):
+        self.versions = itertools.count(1)
+        self.calls = 0
+
+    def route(self, query, corpus=None):
+        return corpus or self.default
+
+    def get(self, name=None):
+        self.calls += 1
+        return _snapshot(f"v{next(self.versions)}")
+
+
+def test_one_request_uses_one_index_version():
+    corpora = SwappingCorpora()
+    handler = LLMHandler(corpora=corpora, llm_client=FakeLLMClient(["답변"]))
+    chain = handler.create_rag_chain()
+
+    # 빠른 경로를 지나 검색까지 가는 질문: 스냅샷은 요청마다 한 번만 정함
+    result = chain.invoke({"input": "양파 볶는 법"}, config={"configurable": {"session_id": "s1"}})
+    assert corpora.calls == 1
+    assert [doc.metadata['doc_id'] for doc in result["context"]] == ["v1-doc"]
+
+    result = chain.invoke({"input": "김치찌개 레시피"}, config={"configurable": {"session_id": "s1"}})
+    assert corpora.calls == 2
+    assert result["context"][0].metadata['doc_id'] == "v2-doc"
+
+
+class PublishingCorpora(SwappingCorpora):
+    """publish()를 부르기 전까지는 같은 버전을 돌려주는 CorpusManager"""
+    def __init__(self):
+        super().__init__()
+        self.current = _snapshot("v1")
+
+    def get(self, name=None):
+        self.calls += 1
+        return self.current
+
+    def publish(self, version):
+        self.current = _snapshot(version)
+
+
+def test_answer_cache_is_scoped_to_the_index_version(tmp_path):
+    from modules.shared_store import SQLiteBackend
+    corpora = PublishingCorpora()
+    llm = FakeLLMClient(["v1 답변", "v2 답변"])
+    handler = LLMHandler(corpora=corpora, backend=SQLiteBackend(str(tmp_path / "store.sqlite3")), llm_client=llm)
+    chain = handler.create_rag_chain()
+
+    def ask(session_id):
+        return chain.invoke({"input": "양파 볶는 법"}, config={"configurable": {"session_id": session_id}})["answer"]
+
+    assert ask("a") == "v1 답변"
+    assert ask("b") == "v1 답변"  # 같은 버전에서는 캐시된 답변
+    corpora.publish("v2")
+    assert ask("c") == "v2 답변"  # 새 버전이 배포되면 다시 생성
+
+
+class RecordingLLMClient:
+    """받은 프롬프트를 기록하고 고정된 답을 돌려주는 LLM"""
+    def __init__(self):
+        self.prompts = []
+
+    def as_runnable(self):
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
+        def respond(prompt):
+            self.prompts.append(prompt.to_messages())
+            return AIMessage(content="답변")
+        return RunnableLambda(respond)
+
+
+def test_persona_follows_the_corpus(monkeypatch):
+    from modules import config
+    monkeypatch.setitem(config.CORPORA, "lee", "이연복")
+    monkeypatch.setitem(config.CORPORA, "plain", "집밥")
+    monkeypatch.setitem(config.CORPUS_PERSONAS, "lee", "이연복")
+    llm = RecordingLLMClient()
+    chain = LLMHandler(corpora=PublishingCorpora(), llm_client=llm).create_rag_chain()
+
+    for corpus in ("baek", "lee", "plain"):
+        chain.invoke({"input": "양파 볶는 법"}, config={"configurable": {"session_id": corpus, "corpus": corpus}})
+    baek, lee, plain = (messages[0].content for messages in llm.prompts)
+    assert "'백종원'" in baek and "어때유" in baek
+    assert "'이연복'" in lee and "어때유" not in lee
+    assert "요리 도우미" in plain and "백종원" not in plain
+
+    # 제목 빠른 경로의 정형화된 답변도 모음의 말투를 따름
+    answers = [chain.invoke({"input": "김치찌개 레시피"},
+                            config={"configurable": {"session_id": f"fast-{corpus}", "corpus": corpus}})["answer"]
+               for corpus in ("baek", "lee")]
+    assert "알려드릴게유" in answers[0] and "알려드릴게요" in answers[1]
+
+
+def test_rag_chain_streams_the_answer(tmp_path):
+    from modules.shared_store import SQLiteBackend
+    handler = LLMHandler(corpora=PublishingCorpora(), backend=SQLiteBackend(str(tmp_path / "store.sqlite3")),
+                         llm_client=FakeLLMClient(["양파는 약불에서 볶아유"]))
+    chain = handler.create_rag_chain()
+
+    chunks = list(chain.stream({"input": "양파 볶는 법"}, config={"configurable": {"session_id": "a"}}))
+    answer = [chunk["answer"] for chunk in chunks if "answer" in chunk]
+    assert len(answer) > 1 and "".join(answer) == "양파는 약불에서 볶아유"
+    assert chunks[0] == {"corpus": "baek"}
+    history = handler.get_session_history("a").messages
+    assert history[-1].content == "양파는 약불에서 볶아유"
+
+    # 끝까지 받은 답변은 캐시되어 다음 세션에서는 한 번에 돌아옴
+    chunks = list(chain.stream({"input": "양파 볶는 법"}, config={"configurable": {"session_id": "b"}}))
+    assert [chunk["answer"] for chunk in chunks if "answer" in chunk] == ["양파는 약불에서 볶아유"]
+
+
+def test_question_with_a_condition_skips_the_title_fast_path():
+    llm = RecordingLLMClient()
+    chain = LLMHandler(corpora=PublishingCorpora(), llm_client=llm).create_rag_chain()
+
+    answer = chain.invoke({"input": "김치찌개 (돼지고기 없이) 만드는 법"},
+                          config={"configurable": {"session_id": "s"}})["answer"]
+    assert answer == "답변" and len(llm.prompts) == 1  # 정형화된 답변 대신 LLM이 조건까지 보고 답함
+    assert llm.prompts[0][-1].content == "김치찌개 (돼지고기 없이) 만드는 법"
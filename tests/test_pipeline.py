@@ -0,0 +1,79 @@
+# tests/test_pipeline.py
+import pytest
+
+from modules.pipeline import Pipeline, Stage
+
+
+def _pipeline(tmp_path, calls, fail_merge=False):
+    """source.txt → (copy) → copied.txt → (merge) → merged.txt 두 단계 파이프라인"""
+    source, copied, merged = tmp_path / "source.txt", tmp_path / "copied.txt", tmp_path / "merged.txt"
+
+    def copy():
+        calls.append("copy")
+        copied.write_text(source.read_text(encoding='utf-8'), encoding='utf-8')
+
+    def merge():
+        calls.append("merge")
+        if fail_merge:
+            merged.write_text("중간까지만", encoding='utf-8')
+            raise RuntimeError("주입된 오류")
+        merged.write_text(copied.read_text(encoding='utf-8') + "!", encoding='utf-8')
+
+    stages = [
+        Stage("copy", copy, inputs=[str(source)], outputs=[str(copied)]),
+        Stage("merge", merge, inputs=[str(copied)], outputs=[str(merged)], deps=["copy"]),
+    ]
+    return Pipeline(stages, cache_dir=str(tmp_path / "cache"))
+
+
+def test_existing_outputs_without_manifest_are_adopted(tmp_path):
+    (tmp_path / "source.txt").write_text("양파", encoding='utf-8')
+    (tmp_path / "copied.txt").write_text("양파", encoding='utf-8')
+    (tmp_path / "merged.txt").write_text("양파!", encoding='utf-8')
+
+    calls = []
+    assert _pipeline(tmp_path, calls).run() == []
+    assert calls == []
+    # 등록된 뒤로는 fingerprint로 비교
+    assert _pipeline(tmp_path, calls).run() == [] and calls == []
+
+
+def test_output_without_manifest_is_rebuilt_when_upstream_ran(tmp_path):
+    (tmp_path / "source.txt").write_text("양파", encoding='utf-8')
+    (tmp_path / "merged.txt").write_text("예전 결과", encoding='utf-8')  # copy 결과가 없으므로 copy는 다시 실행
+
+    assert _pipeline(tmp_path, []).run(dry_run=True) == ["copy", "merge"]
+    calls = []
+    assert _pipeline(tmp_path, calls).run() == ["copy", "merge"]
+    assert calls == ["copy", "merge"]
+    assert (tmp_path / "merged.txt").read_text(encoding='utf-8') == "양파!"
+
+
+def test_upstream_change_invalidates_downstream(tmp_path):
+    (tmp_path / "source.txt").write_text("양파", encoding='utf-8')
+    _pipeline(tmp_path, []).run()
+
+    (tmp_path / "source.txt").write_text("대파", encoding='utf-8')
+    # dry-run은 아무것도 실행하지 않고, 상위 단계가 바뀌면 하위도 다시 만든다고 봄
+    calls = []
+    assert _pipeline(tmp_path, calls).run(dry_run=True) == ["copy", "merge"]
+    assert calls == [] and (tmp_path / "merged.txt").read_text(encoding='utf-8') == "양파!"
+
+    assert _pipeline(tmp_path, calls).run() == ["copy", "merge"]
+    assert (tmp_path / "merged.txt").read_text(encoding='utf-8') == "대파!"
+
+    # 상위 결과가 같은 내용으로 다시 만들어졌다면 하위는 캐시를 씀
+    calls = []
+    assert _pipeline(tmp_path, calls).run(force=["copy"]) == ["copy"]
+    assert calls == ["copy"]
+
+
+def test_failed_stage_output_is_not_reused(tmp_path):
+    (tmp_path / "source.txt").write_text("양파", encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        _pipeline(tmp_path, [], fail_merge=True).run()
+    assert (tmp_path / "merged.txt").exists()
+
+    calls = []
+    assert _pipeline(tmp_path, calls).run() == ["merge"]
+    assert calls == ["merge"] and (tmp_path / "merged.txt").read_text(encoding='utf-8') == "양파!"
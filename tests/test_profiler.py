@@ -0,0 +1,81 @@
+# tests/test_profiler.py
+import json
+import pstats
+
+from modules.preprocess import clean_crawl_file, merge_cleaned_files
+from modules.profiler import PipelineProfiler, ProfiledRun, substep
+from modules.scheduler import RequestScheduler
+
+
+def _write_crawl_file(path, titles):
+    recipes = [{'id': str(i), 'title': title, 'ingredients': '양파\n돼지고기', 'steps': '볶는다'}
+               for i, title in enumerate(titles)]
+    path.write_text(json.dumps(recipes, ensure_ascii=False), encoding='utf-8')
+
+
+def test_substeps_are_recorded_per_stage(tmp_path):
+    crawled, cleaned, merged = tmp_path / "crawl.json", tmp_path / "cleaned.json", tmp_path / "merged.json"
+    _write_crawl_file(crawled, ["백종원 김치찌개 레시피", "김치찌개 (초간단)", "된장찌개", "제육볶음"])
+
+    _, clean_profile = ProfiledRun("clean", lambda: clean_crawl_file(str(crawled), str(cleaned)))()
+    _, merge_profile = ProfiledRun("preprocess", lambda: merge_cleaned_files([str(cleaned)], str(merged)))()
+
+    clean_steps = {name: calls for name, _, calls in clean_profile.substeps}
+    assert clean_steps["json.load"] == 1 and clean_steps["clean_title"] == 4
+    merge_steps = [name for name, _, _ in merge_profile.substeps]
+    assert merge_steps[:3] == ["json.load", "dedup", "dedup.SequenceMatcher"]
+    assert "json.dump" in merge_steps
+    assert all(seconds <= merge_profile.wall_seconds for _, seconds, _ in merge_profile.substeps)
+
+    # 측정 중이 아닐 때는 아무것도 기록하지 않음
+    with substep("outside"):
+        pass
+    _, empty = ProfiledRun("empty", lambda: None)()
+    assert empty.substeps == []
+
+    profiler = PipelineProfiler(report_dir=str(tmp_path / "reports"))
+    profiler.profiles = [merge_profile]
+    assert "  - dedup.SequenceMatcher" in profiler.table()
+    assert profiler.profiles[0].to_dict()['substeps'][0]['name'] == "json.load"
+
+
+def _busy_in_scheduler_thread():
+    return sum(i * i for i in range(20000))
+
+
+def test_scheduler_threads_are_in_the_stage_cprofile(tmp_path):
+    scheduler = RequestScheduler(max_workers=2)
+    prof_path = str(tmp_path / "index.prof")
+
+    def run():
+        return scheduler.run(_busy_in_scheduler_thread)
+
+    ProfiledRun("index", run, prof_path)()
+    functions = {name for _, _, name in pstats.Stats(prof_path).stats}
+    assert "_busy_in_scheduler_thread" in functions
+
+
+def test_profile_does_not_force_paid_stages_without_rebuild_db(tmp_path):
+    from main import stages_to_force
+    from modules.pipeline import Pipeline, Stage
+
+    output = tmp_path / "index.txt"
+    calls = []
+
+    def build():
+        calls.append("index")
+        output.write_text("색인", encoding='utf-8')
+
+    stages = [Stage("preprocess", lambda: None), Stage("index", build, outputs=[str(output)])]
+    assert stages_to_force(stages, rebuild_db=False, profile=True) == ["preprocess"]
+    assert stages_to_force(stages, rebuild_db=True, profile=True) == ["preprocess", "index"]
+    assert stages_to_force(stages, rebuild_db=True, profile=False) == ["index"]
+
+    # 캐시를 쓴 색인 단계는 측정하지 않은 단계로 표시
+    Pipeline(stages[1:], cache_dir=str(tmp_path / "cache")).run()
+    profiler = PipelineProfiler(report_dir=str(tmp_path / "reports"))
+    Pipeline(stages, cache_dir=str(tmp_path / "cache"), profiler=profiler).run(
+        force=stages_to_force(stages, rebuild_db=False, profile=True))
+    assert calls == ["index"]
+    assert [p.name for p in profiler.profiles] == ["preprocess"] and profiler.cached == ["index"]
+    assert "cached, not measured" in profiler.table().splitlines()[3]
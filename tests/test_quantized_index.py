@@ -0,0 +1,60 @@
+# tests/test_quantized_index.py
+import hashlib
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.storage import InMemoryStore
+from langchain_core.embeddings import Embeddings
+
+from modules.quantized_index import QuantizedIndex, QuantizedVectorStore
+from modules.retriever import AdvancedRetriever
+
+
+class BigramEmbeddings(Embeddings):
+    """글자 2-gram을 64차원에 해시한 임베딩 (글자가 많이 겹칠수록 가까움)"""
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for i in range(len(text) - 1):
+                vectors[row, hashlib.md5(text[i:i + 2].encode('utf-8')).digest()[0] % 64] += 1.0
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+TEXTS = ["김치찌개는 돼지고기와 신김치를 볶다가 물을 붓고 끓입니다.",
+         "된장찌개는 멸치 육수에 된장을 풀고 애호박과 두부를 넣습니다.",
+         "계란말이는 계란물에 대파와 당근을 넣고 돌돌 말아 익힙니다.",
+         "제육볶음은 고추장 양념에 재운 돼지고기를 센 불에 볶습니다."]
+
+
+def test_from_texts_builds_a_searchable_index(tmp_path):
+    store = QuantizedVectorStore.from_texts(TEXTS, BigramEmbeddings(), metadatas=[{"n": i} for i in range(4)],
+                                            path=str(tmp_path / "quantized"),
+                                            persist_directory=str(tmp_path / "chroma"))
+    assert len(store.index) == 4
+    for mode in ("int8", "binary"):
+        store.mode = mode
+        best = store.similarity_search("된장찌개 두부", k=1)[0]
+        assert best.page_content == TEXTS[1] and best.metadata == {"n": 1}
+
+    # 추가한 청크는 색인을 다시 만들지 않고 바로 검색되며, 저장된 색인을 다시 불러와도 남아 있음
+    ids = store.add_texts(["잡채는 당면을 삶아 시금치와 버섯을 간장에 볶아 버무립니다."], metadatas=[{"n": 4}])
+    assert len(store.index) == 5 and store.index.ids[-1] == ids[0]
+    assert store.similarity_search("잡채 당면", k=1)[0].metadata == {"n": 4}
+    reloaded = QuantizedIndex.load(str(tmp_path / "quantized"))
+    assert reloaded.ids == store.index.ids
+    assert np.allclose(reloaded.vectors, store.index.vectors)
+
+
+def test_parent_document_retriever_can_add_through_the_quantized_store(tmp_path):
+    store = QuantizedVectorStore.from_texts(TEXTS, BigramEmbeddings(), path=str(tmp_path / "quantized"),
+                                            persist_directory=str(tmp_path / "chroma"))
+    docstore = InMemoryStore()
+    retriever = AdvancedRetriever(store, docstore).get_retriever()
+    parent = Document(page_content="닭볶음탕은 닭고기와 감자를 고추장 양념에 졸입니다.")
+    retriever.add_documents([parent], ids=["parent-1"])
+
+    assert len(store.index) == 5
+    assert retriever.invoke("닭볶음탕 감자")[0].page_content == parent.page_content
@@ -0,0 +1,62 @@
+# tests/test_recipe_store.py
+import json
+
+import pytest
+
+from modules.recipe_store import (MAGIC, RecipeRecordReader, build_combined_text, is_record_file, iter_recipes,
+                                  write_records)
+
+RECIPES = [
+    {'id': '101', 'title': '백종원 김치찌개', 'ingredients': '김치, 돼지고기', 'steps': '볶고 끓인다\n"간"을 본다',
+     'url': 'https://www.10000recipe.com/recipe/101'},
+    {'id': 202, 'title': '계란말이 🍳', 'ingredients': '', 'steps': '말아서 익힌다'},
+    {'id': '303', 'title': '된장찌개', 'ingredients': '된장, 두부', 'steps': '끓인다', 'url': '',
+     'combined_text': '저장되지 않는 값'},
+]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_records_round_trip_in_order(tmp_path, compress):
+    path = str(tmp_path / "recipes.rec")
+    assert write_records(RECIPES, path, compress=compress) == 3
+    assert is_record_file(path)
+
+    loaded = list(iter_recipes(path))
+    assert [recipe['id'] for recipe in loaded] == ['101', 202, '303']
+    for original, recipe in zip(RECIPES, loaded):
+        for field in ('title', 'ingredients', 'steps'):
+            assert recipe[field] == original[field]
+        assert recipe['url'] == original.get('url', '')
+        # combined_text는 저장하지 않고 읽을 때 다시 만듦
+        assert recipe['combined_text'] == build_combined_text(original)
+
+
+def test_id_index_reads_single_records(tmp_path):
+    path = str(tmp_path / "recipes.rec")
+    write_records(RECIPES, path, compress=True)
+    with RecipeRecordReader(path) as reader:
+        assert len(reader) == 3
+        assert sorted(reader.index) == ['101', '202', '303']
+        assert reader.get('303')['title'] == '된장찌개'
+        assert reader.get(202)['title'] == '계란말이 🍳'  # 숫자 id도 문자열 키로 찾음
+        assert reader.get('404') is None
+        # 임의 접근 뒤에도 순차 읽기는 처음부터 진행
+        assert [recipe['title'] for recipe in reader] == [recipe['title'] for recipe in RECIPES]
+
+
+def test_json_files_and_broken_files(tmp_path):
+    json_path = tmp_path / "recipes.json"
+    json_path.write_text(json.dumps(RECIPES[:1], ensure_ascii=False), encoding='utf-8')
+    assert not is_record_file(str(json_path))
+    assert not is_record_file(str(tmp_path / "missing.rec"))
+    assert next(iter_recipes(str(json_path)))['combined_text'] == build_combined_text(RECIPES[0])
+
+    with pytest.raises(ValueError):
+        RecipeRecordReader(str(json_path))
+    broken = tmp_path / "broken.rec"
+    path = tmp_path / "recipes.rec"
+    write_records(RECIPES, str(path))
+    broken.write_bytes(path.read_bytes()[:-2])  # 끝부분(MAGIC)이 잘린 파일
+    assert broken.read_bytes().startswith(MAGIC)
+    with pytest.raises(ValueError):
+        RecipeRecordReader(str(broken))
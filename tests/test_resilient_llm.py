@@ -0,0 +1,193 @@
+# tests/test_resilient_llm.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from modules.resilient_llm import CircuitBreaker, LLMUnavailableError, Provider, ResilientLLM
+from modules.scheduler import RequestScheduler, scheduled_runnable
+
+
+class FakeProvider:
+    """
+    실제 API 대신 쓰는 LLM. 지연 시간과 오류를 주입해 헤지/failover/차단기 동작을 확인합니다.
+
+    Args:
+        latency (float): 응답(stream이면 첫 조각)까지 걸리는 시간(초)
+        fail (bool): True면 응답 대신 예외를 던짐
+    """
+    def __init__(self, name, latency=0.01, fail=False, chunks=("자, ", "이렇게 ", "하면 돼유")):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.chunks = chunks
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise ConnectionError("주입된 오류")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def invoke(self, inputs, config=None):
+        self._start()
+        return AIMessage(content=f"[{self.name}] 응답")
+
+    def stream(self, inputs, config=None):
+        self._start()
+        for text in self.chunks:
+            yield AIMessageChunk(content=text)
+
+
+def _llm(*fakes, max_in_flight=8, **kwargs):
+    kwargs.setdefault("hedge_percentile", 0)
+    providers = [Provider(fake.name, fake, max_in_flight=max_in_flight) for fake in fakes]
+    return ResilientLLM(providers, **kwargs)
+
+
+def _free_slots(provider):
+    """지금 비어 있는 요청 자리 수"""
+    free = 0
+    while provider.slots.acquire(blocking=False):
+        free += 1
+    for _ in range(free):
+        provider.slots.release()
+    return free
+
+
+def test_deadline_raises_without_waiting_for_the_slow_call():
+    slow = FakeProvider("slow", latency=0.5)
+    llm = _llm(slow, max_in_flight=2, timeout=0.1)
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        llm.invoke("질문")
+    assert time.monotonic() - start < 0.3
+    assert llm.summary()["timeouts"] == 1
+
+    # 시간 초과된 요청은 끝날 때까지 자리를 차지하다가 끝나면 돌려줌
+    assert _free_slots(llm.providers[0]) == 1
+    time.sleep(0.6)
+    assert _free_slots(llm.providers[0]) == 2
+
+
+def test_hedge_request_wins_over_the_slow_primary():
+    slow, fast = FakeProvider("slow", latency=1.0), FakeProvider("fast", latency=0.02)
+    llm = _llm(slow, fast, timeout=2, hedge_percentile=95, hedge_min_delay=0.05)
+
+    start = time.monotonic()
+    result = llm.invoke("질문")
+    assert time.monotonic() - start < 0.5
+    assert result.response_metadata["provider"] == "fast"
+    assert llm.summary()["hedges"] == 1 and llm.summary()["hedge_wins"] == 1
+
+
+def test_failover_to_the_next_provider():
+    broken, backup = FakeProvider("broken", fail=True), FakeProvider("backup")
+    llm = _llm(broken, backup, timeout=1)
+
+    assert llm.invoke("질문").response_metadata["provider"] == "backup"
+    assert llm.summary()["providers"]["broken"]["failures"] == 1
+
+    with pytest.raises(LLMUnavailableError):
+        _llm(broken, FakeProvider("also-broken", fail=True), timeout=1).invoke("질문")
+
+
+def test_circuit_breaker_opens_and_allows_one_trial_after_cooldown():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # 시험 요청은 하나만
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN  # 시험이 실패하면 cooldown을 다시 셈
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_open_circuit_skips_the_provider():
+    broken, backup = FakeProvider("broken", fail=True), FakeProvider("backup")
+    llm = ResilientLLM([Provider("broken", broken, CircuitBreaker(failure_threshold=2, cooldown=60)),
+                        Provider("backup", backup)], timeout=1, hedge_percentile=0)
+    for _ in range(5):
+        assert llm.invoke("질문").response_metadata["provider"] == "backup"
+    assert broken.calls == 2
+    assert llm.summary()["providers"]["broken"]["circuit"] == CircuitBreaker.OPEN
+
+
+def test_saturated_provider_does_not_take_more_requests():
+    slow, fast = FakeProvider("slow", latency=0.3), FakeProvider("fast", latency=0.02)
+    llm = ResilientLLM([Provider("slow", slow, max_in_flight=2), Provider("fast", fast)], timeout=1, hedge_percentile=0)
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(llm.invoke, [f"질문 {i}" for i in range(6)]))
+    served = [result.response_metadata["provider"] for result in results]
+    assert served.count("slow") == 2 and served.count("fast") == 4
+    assert slow.max_active == 2
+    assert llm.summary()["providers"]["slow"]["saturated"] == 4
+    assert len(llm.providers[0].executor._threads) <= 2
+
+
+def test_busy_providers_wait_for_a_slot_until_the_deadline():
+    fake = FakeProvider("only", latency=0.1)
+    llm = _llm(fake, max_in_flight=1, timeout=1)
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(llm.invoke, ["질문"] * 3))
+    assert len(results) == 3 and fake.max_active == 1
+
+    llm = _llm(FakeProvider("only", latency=0.5), max_in_flight=1, timeout=0.2)
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(llm.invoke, "질문") for _ in range(2)]
+    errors = [future.exception() for future in futures]
+    assert all(isinstance(error, TimeoutError) for error in errors)
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    broken, backup = FakeProvider("broken", fail=True), FakeProvider("backup")
+    llm = _llm(broken, backup, timeout=1)
+
+    chunks = list(llm.as_runnable().stream("질문"))
+    assert [chunk.content for chunk in chunks] == ["자, ", "이렇게 ", "하면 돼유"]
+    assert chunks[0].response_metadata["provider"] == "backup"
+    assert _free_slots(llm.providers[0]) == 8 and _free_slots(llm.providers[1]) == 8
+    # invoke는 조각을 나누지 않고 한 번에 돌려줌
+    assert llm.as_runnable().invoke("질문").content == "[backup] 응답"
+
+
+def test_stream_first_chunk_deadline():
+    llm = _llm(FakeProvider("slow", latency=0.5), timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(llm.stream("질문"))
+    assert time.monotonic() - start < 0.3
+    time.sleep(0.6)
+    assert _free_slots(llm.providers[0]) == 8
+
+
+def test_scheduled_runnable_keeps_streaming():
+    model = scheduled_runnable(FakeListChatModel(responses=["안녕하세유"]), RequestScheduler(max_workers=1))
+    chunks = list(model.stream("질문"))
+    assert len(chunks) > 1
+    assert "".join(chunk.content for chunk in chunks) == "안녕하세유"
+    assert model.invoke("질문").content == "안녕하세유"
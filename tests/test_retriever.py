@@ -0,0 +1,51 @@
+# tests/test_retriever.py
+from langchain.docstore.document import Document
+from langchain.storage import InMemoryStore
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from modules.retriever import ExpandingParentDocumentRetriever
+
+WORDS = ["김치", "된장", "계란", "두부"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """단어마다 한 축을 쓰는 임베딩 (같은 단어가 많을수록 가까움)"""
+    def embed_documents(self, texts):
+        return [[float(text.count(word)) + 0.01 for word in WORDS] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _retriever(tmp_path, **kwargs):
+    vectorstore = Chroma(collection_name="children", embedding_function=KeywordEmbeddings(),
+                         collection_metadata={"hnsw:space": "cosine"},
+                         persist_directory=str(tmp_path / "chroma"))
+    docstore = InMemoryStore()
+    docstore.mset([(f"p{i}", Document(page_content=f"부모 {i}")) for i in range(8)])
+    # 중복 제거로 합쳐진 청크: 원래 부모 하나에 합쳐진 부모 여럿
+    vectorstore.add_texts(["김치 김치 김치", "김치 김치 된장", "계란 두부"],
+                          metadatas=[{"doc_id": "p0", "alt_doc_ids": "p2,p3,p4"},
+                                     {"doc_id": "p1", "alt_doc_ids": "p5,p6"},
+                                     {"doc_id": "p7"}],
+                          ids=["c0", "c1", "c2"])
+    return ExpandingParentDocumentRetriever(vectorstore=vectorstore, docstore=docstore,
+                                            child_splitter=RecursiveCharacterTextSplitter(chunk_size=500),
+                                            id_key="doc_id", **kwargs)
+
+
+def test_parents_are_capped_at_k_with_primary_parents_first(tmp_path):
+    retriever = _retriever(tmp_path, search_kwargs={"k": 2})
+    docs = retriever.invoke("김치")
+    # 검색된 두 청크의 원래 부모가 자리를 모두 채우고, 합쳐진 부모(alt_doc_ids)는 들어오지 않음
+    assert [doc.page_content for doc in docs] == ["부모 0", "부모 1"]
+
+
+def test_alt_parents_fill_the_remaining_slots(tmp_path):
+    retriever = _retriever(tmp_path, search_kwargs={"k": 2}, max_parents=4)
+    assert [doc.page_content for doc in retriever.invoke("김치")] == ["부모 0", "부모 1", "부모 2", "부모 3"]
+    # 청크가 하나만 검색돼도 합쳐진 부모 때문에 max_parents를 넘지 않음
+    retriever = _retriever(tmp_path / "one", search_kwargs={"k": 1}, max_parents=2)
+    assert [doc.page_content for doc in retriever.invoke("김치")] == ["부모 0", "부모 2"]
@@ -0,0 +1,82 @@
+# tests/test_scheduler.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+from modules.scheduler import BACKGROUND, INTERACTIVE, BatchingEmbeddings, RateLimiter, RequestScheduler
+
+
+class FakeEmbeddingProvider(Embeddings):
+    """실제 API 대신 쓰는 임베딩 제공자. 요청마다 (시작 시각, 배치 크기)를 기록합니다."""
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append((time.monotonic(), len(texts)))
+        time.sleep(self.latency)
+        return [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_concurrent_queries_are_micro_batched():
+    provider = FakeEmbeddingProvider(latency=0.05)
+    embeddings = BatchingEmbeddings(provider, RequestScheduler(max_workers=2), batch_window=0.05)
+    texts = [f"질문 {i}" * (i + 1) for i in range(24)]
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(len(texts)) as pool:
+        vectors = list(pool.map(embeddings.embed_query, texts))
+    elapsed = time.monotonic() - start
+
+    # 각 질문은 자기 텍스트의 임베딩을 돌려받음
+    assert vectors == [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+    sizes = [size for _, size in provider.calls]
+    assert sum(sizes) == len(texts)
+    assert len(sizes) <= 4 and max(sizes) > 1
+    # 요청 24개를 따로 보냈다면 24 * 50ms를 두 작업 스레드로 나눠도 600ms 이상 걸림
+    assert elapsed < 0.5
+
+
+def test_rate_limiter_reports_wait_without_consuming_budget():
+    now = [0.0]
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=lambda: now[0])
+    assert limiter.try_acquire(600) == 0.0
+    wait = limiter.try_acquire(10)
+    assert wait == 1.0  # 초당 10토큰이 다시 채워짐
+    now[0] += 0.5
+    assert limiter.try_acquire(10) == 0.5  # 기다리기만 한 요청은 예산을 차감하지 않음
+    now[0] += 0.5
+    assert limiter.try_acquire(10) == 0.0
+
+
+def test_requests_over_budget_are_spaced_out():
+    provider = FakeEmbeddingProvider(latency=0.0)
+    scheduler = RequestScheduler(requests_per_minute=120, max_workers=4)
+    futures = [scheduler.submit(provider.embed_documents, ["a"]) for _ in range(123)]
+    for future in futures:
+        future.result(timeout=10)
+    starts = sorted(t for t, _ in provider.calls)
+    # 처음 120건은 바로, 나머지 3건은 초당 2건 속도로 나감
+    assert starts[119] - starts[0] < 0.3
+    assert 1.2 < starts[-1] - starts[0] < 2.5
+
+
+def test_background_job_waiting_for_budget_does_not_block_interactive():
+    scheduler = RequestScheduler(tokens_per_minute=600, max_workers=1)
+    scheduler.run(lambda: None, priority=BACKGROUND, tokens=600)  # 토큰 예산을 모두 소진
+    background = scheduler.submit(lambda: "background", priority=BACKGROUND, tokens=600)  # 약 60초 대기 필요
+    time.sleep(0.1)  # 작업 스레드가 배치 작업을 꺼내 예산을 기다리는 상태
+
+    start = time.monotonic()
+    assert scheduler.run(lambda: "interactive", priority=INTERACTIVE, tokens=1) == "interactive"
+    # 대화 요청은 배치 작업 뒤에서 60초를 기다리지 않고 자기 토큰(0.1초 분량)만큼만 기다림
+    assert time.monotonic() - start < 1.0
+    assert not background.done()
+    assert background.cancel()
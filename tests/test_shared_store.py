@@ -0,0 +1,100 @@
+# tests/test_shared_store.py
+import multiprocessing
+import random
+import tracemalloc
+
+from langchain.docstore.document import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from modules.shared_store import AnswerCache, SharedChatMessageHistory, SharedDocStore, SQLiteBackend
+
+WORKERS = 4
+TURNS = 30
+SESSIONS = 3
+PARENTS = 2000
+PARENT_TEXT = "양파를 채 썰고 돼지고기를 볶다가 고추장을 넣어 졸입니다. " * 60  # 부모 문서 하나에 약 5KB
+
+
+def _worker(path, worker_id):
+    """Streamlit 워커 하나처럼 동작: 공유 세션에 대화를 쌓고, 필요한 부모 문서만 docstore에서 읽음"""
+    backend = SQLiteBackend(path)
+    for turn in range(TURNS):
+        history = SharedChatMessageHistory(backend, f"session-{turn % SESSIONS}")
+        history.add_messages([HumanMessage(content=f"w{worker_id}-{turn} 질문"),
+                              AIMessage(content=f"w{worker_id}-{turn} 답변")])
+
+    docstore = SharedDocStore(backend)
+    rng = random.Random(worker_id)
+    tracemalloc.start()
+    for _ in range(50):
+        docs = docstore.mget([f"doc-{rng.randrange(PARENTS)}" for _ in range(4)])
+        assert all(doc is not None for doc in docs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seen = {f"session-{s}": [m.content for m in SharedChatMessageHistory(backend, f"session-{s}").messages]
+            for s in range(SESSIONS)}
+    return peak, seen
+
+
+def _populate(path):
+    backend = SQLiteBackend(path)
+    SharedDocStore(backend).mset([
+        (f"doc-{i}", Document(page_content=PARENT_TEXT, metadata={"title": f"레시피 {i}"})) for i in range(PARENTS)
+    ])
+    return backend
+
+
+def test_history_is_consistent_across_worker_processes(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    backend = _populate(path)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(WORKERS) as pool:
+        results = pool.starmap(_worker, [(path, i) for i in range(WORKERS)])
+
+    for session in range(SESSIONS):
+        contents = [m.content for m in SharedChatMessageHistory(backend, f"session-{session}").messages]
+        expected = {f"w{w}-{t} {kind}" for w in range(WORKERS) for t in range(session, TURNS, SESSIONS)
+                    for kind in ("질문", "답변")}
+        # 유실/중복 없이 모든 워커의 메시지가 한 번씩
+        assert sorted(contents) == sorted(expected)
+        for w in range(WORKERS):
+            # 워커별 메시지 순서가 유지되고, 질문 바로 뒤에 같은 턴의 답변이 붙어 있음
+            own = [c for c in contents if c.startswith(f"w{w}-")]
+            assert own == [f"w{w}-{t} {kind}" for t in range(session, TURNS, SESSIONS) for kind in ("질문", "답변")]
+            for i in range(0, len(own), 2):
+                assert contents.index(own[i]) + 1 == contents.index(own[i + 1])
+
+    # 각 워커가 마지막에 읽은 기록은 모든 쓰기가 끝난 뒤의 기록의 앞부분(prefix)과 같음
+    for _, seen in results:
+        for key, contents in seen.items():
+            final = [m.content for m in SharedChatMessageHistory(backend, key).messages]
+            assert final[:len(contents)] == contents
+
+
+def test_worker_memory_does_not_grow_with_corpus(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    _populate(path)
+    corpus_bytes = PARENTS * len(PARENT_TEXT.encode("utf-8"))
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(WORKERS) as pool:
+        peaks = [peak for peak, _ in pool.starmap(_worker, [(path, i) for i in range(WORKERS)])]
+
+    # 워커는 요청한 부모 문서만 읽으므로 말뭉치(약 10MB) 크기와 상관없이 작은 메모리만 사용
+    assert max(peaks) < 1 * 2**20 < corpus_bytes / 8
+
+
+def test_answer_cache_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    AnswerCache(SQLiteBackend(path)).put("김치찌개  레시피", "자, 이렇게 하면 돼유.")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        cached = pool.apply(_cached_answer, (path, "김치찌개 레시피"))
+    assert cached == "자, 이렇게 하면 돼유."
+
+
+def _cached_answer(path, question):
+    return AnswerCache(SQLiteBackend(path)).get(question)
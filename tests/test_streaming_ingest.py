@@ -0,0 +1,236 @@
+# tests/test_streaming_ingest.py
+import os
+import threading
+import time
+
+from langchain.docstore.document import Document
+from langchain.storage import InMemoryStore
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from modules import index_versions
+from modules.corpus import Corpus
+from modules.preprocess import TitleSimilarityIndex, similarity
+from modules.streaming_ingest import StreamingIngestor
+from modules.title_index import TitleIndex
+from modules.utils_docstore import register_parent_docs
+
+# 줄마다 청크 하나가 되도록 300자 정도의 서로 다른 조리 단계
+STEPS = "\n".join(f"{n}단계: " + f"냄비에 물 {n}컵을 붓고 양파와 대파를 넣어 {n}분 끓인 뒤 간장으로 간을 맞춥니다. " * 6
+                  for n in range(1, 5))
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text)), float(sum(map(ord, text)) % 997), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """처음 failures번은 예외를 던지는 임베딩 모델"""
+    def __init__(self, failures):
+        self.failures = failures
+
+    def embed_documents(self, texts):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("주입된 오류")
+        return super().embed_documents(texts)
+
+
+class FakeCrawler:
+    """준비된 레시피를 순서대로 돌려주는 크롤러"""
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def iter_recipes(self, start_page, end_page, skip_ids=()):
+        return iter([recipe for recipe in self.recipes if recipe['id'] not in skip_ids])
+
+
+def _recipe(i, title, steps=STEPS):
+    return {'id': str(i), 'title': title, 'ingredients': '양파, 대파, 간장', 'steps': steps,
+            'url': f'https://example.com/recipe/{i}'}
+
+
+def _chunks(vectorstore):
+    return vectorstore._collection.get(include=["documents", "metadatas"])
+
+
+def test_streamed_chunks_are_merged_into_existing_duplicates(tmp_path):
+    vectorstore = Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=FakeEmbeddings())
+    docstore = InMemoryStore()
+    recipes = [_recipe(1, '양파국'), _recipe(2, '대파 된장국'), _recipe(3, '양파국 '),
+               _recipe(4, '콩나물국', steps="콩나물을 씻어 냄비에 담고 물을 부어 뚜껑을 덮고 끓입니다. " * 6)]
+    ingestor = StreamingIngestor(vectorstore, docstore, FakeEmbeddings(), crawler=FakeCrawler(recipes[:2]),
+                                 batch_window=0.01)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+
+    # 두 레시피의 조리 과정이 같으므로 같은 청크는 한 번만 저장되고 두 번째 부모는 alt_doc_ids로 연결됨
+    stored = _chunks(vectorstore)
+    doc_ids = list(docstore.yield_keys())
+    assert len(doc_ids) == 2
+    alts = [md.get("alt_doc_ids") for md in stored["metadatas"] if md.get("alt_doc_ids")]
+    assert alts and all(alt in doc_ids for alt in alts)
+    assert len(stored["ids"]) == 4 + 1  # 첫 레시피 4개 + 제목이 들어간 두 번째 레시피의 첫 청크
+    count_after_first = len(stored["ids"])
+
+    # 이미 저장된 청크로 색인을 채운 새 수집기도 같은 기준으로 합치고, 제목이 비슷한 레시피는 건너뜀
+    ingestor = StreamingIngestor(vectorstore, docstore, FakeEmbeddings(), crawler=FakeCrawler(recipes[2:]),
+                                 batch_window=0.01)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+    assert ingestor.duplicates == 1
+    stored = _chunks(vectorstore)
+    new_doc_id = next(key for key in docstore.yield_keys() if key not in doc_ids)
+    own = [md for md in stored["metadatas"] if md["doc_id"] == new_doc_id]
+    assert own and len(stored["ids"]) == count_after_first + len(own)
+    # 겹치는 내용이 없는 레시피는 다른 청크에 합쳐지지 않음
+    assert all(new_doc_id not in (md.get("alt_doc_ids") or "") for md in stored["metadatas"])
+
+
+def test_failed_batch_is_rolled_back_and_indexed_on_the_next_crawl(tmp_path):
+    vectorstore = Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=FakeEmbeddings())
+    docstore = InMemoryStore()
+    recipes = [_recipe(1, '양파국')]
+    ingestor = StreamingIngestor(vectorstore, docstore, FlakyEmbeddings(failures=10), crawler=FakeCrawler(recipes),
+                                 batch_window=0.01, retries=1, retry_delay=0)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+
+    # 재시도까지 실패하면 아무것도 등록하지 않음
+    assert ingestor.failed == 1 and ingestor.collected == [] and ingestor.latencies == []
+    assert list(docstore.yield_keys()) == [] and _chunks(vectorstore)["ids"] == []
+    assert '1' not in ingestor._known_ids and not ingestor._titles.is_duplicate('양파국')
+    assert all(alts == [] for alts in ingestor._chunks.alt_doc_ids) and ingestor._chunks.doc_ids == []
+
+    # 되돌린 레시피는 다음 수집 때 건너뛰지 않고 색인되며, 같은 내용의 레시피도 실패한 청크에 합쳐지지 않음
+    recipes.append(_recipe(2, '대파 된장국'))
+    ingestor = StreamingIngestor(vectorstore, docstore, FlakyEmbeddings(failures=1), crawler=FakeCrawler(recipes),
+                                 batch_window=0.01, retries=1, retry_delay=0)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+    assert ingestor.failed == 0 and len(ingestor.collected) == 2
+    stored = _chunks(vectorstore)
+    doc_ids = list(docstore.yield_keys())
+    assert len(doc_ids) == 2 and len(stored["ids"]) == 4 + 1
+    assert {md["doc_id"] for md in stored["metadatas"]} <= set(doc_ids)
+
+
+def _publish_version(corpus, name, recipe):
+    """recipe 하나를 색인한 버전을 만들어 배포"""
+    version = index_versions.IndexVersion(name, corpus=corpus)
+    os.makedirs(version.path)
+    vectorstore = Chroma(persist_directory=version.chroma_path, embedding_function=FakeEmbeddings())
+    ingestor = StreamingIngestor(vectorstore, InMemoryStore(), FakeEmbeddings(), crawler=FakeCrawler([recipe]),
+                                 batch_window=0.01)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+    vectorstore._client.close()
+    index_versions.publish(version)
+    return version
+
+
+def _count(chroma_path):
+    vectorstore = Chroma(persist_directory=chroma_path)
+    count = vectorstore._collection.count()
+    vectorstore._client.close()
+    return count
+
+
+def _load(version):
+    vectorstore = Chroma(persist_directory=version.chroma_path, embedding_function=FakeEmbeddings())
+    return index_versions.IndexSnapshot(version, vectorstore, InMemoryStore(), retriever=None)
+
+
+def _other_steps(n):
+    return f"{n}번 레시피: 프라이팬에 기름을 두르고 재료를 넣어 {n}분 동안 센 불에 볶아 줍니다. " * 5
+
+
+def test_ingestor_writes_to_a_working_copy_and_follows_version_swaps(tmp_path):
+    corpus = Corpus("test", "테스트")
+    corpus.versions_dir = str(tmp_path / "index_versions")
+    corpus.current_file = os.path.join(corpus.versions_dir, "CURRENT")
+    published = [_publish_version(corpus, "v1", _recipe(1, '양파국', steps=_other_steps(1)))]
+    published_counts = [_count(published[0].chroma_path)]
+
+    reloader = index_versions.HotReloader(_load, corpus=corpus, poll_interval=0.01, writable=True)
+    snapshot = reloader.load_current()
+    assert snapshot.version.source.name == "v1" and snapshot.version.chroma_path != published[0].chroma_path
+    ingestor = StreamingIngestor(snapshot.vectorstore, snapshot.docstore, FakeEmbeddings(),
+                                 crawler=FakeCrawler([_recipe(2, '대파 된장국', steps=_other_steps(2))]),
+                                 batch_window=0.01)
+    ingestor.start([(1, 1)])
+    ingestor.join()
+    streamed_doc_id = next(iter(snapshot.docstore.yield_keys()))
+    forks = [snapshot.version]
+
+    reloader.start(on_swap=lambda new: ingestor.retarget(new.vectorstore, new.docstore))
+    # 두 번 넘게 교체돼도(직전 스냅샷이 닫혀도) 수집기는 항상 현재 버전의 복사본에 씀
+    for i in range(2, 5):
+        published.append(_publish_version(corpus, f"v{i}", _recipe(10 + i, f'요리 {i}', steps=_other_steps(10 + i))))
+        published_counts.append(_count(published[-1].chroma_path))
+        deadline = time.monotonic() + 5
+        # 이미 수집한 레시피는 새 복사본에 다시 색인됨
+        while (reloader.current.version.source.name != f"v{i}"
+               or streamed_doc_id not in set(reloader.current.docstore.yield_keys())) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        current = reloader.current
+        assert current.version.source.name == f"v{i}"
+        assert streamed_doc_id in set(current.docstore.yield_keys())
+        forks.append(current.version)
+    reloader.stop()
+
+    ingestor.crawler = FakeCrawler([_recipe(3, '콩나물국', steps=_other_steps(3))])
+    ingestor.start([(1, 1)])
+    ingestor.join()
+    assert ingestor.failed == 0 and len(ingestor.collected) == 2
+    stored = _chunks(reloader.current.vectorstore)
+    assert {md["doc_id"] for md in stored["metadatas"]} == set(reloader.current.docstore.yield_keys()) | {
+        md["doc_id"] for md in _chunks(_load(published[-1]).vectorstore)["metadatas"]}
+
+    # 배포된 버전은 그대로이고, 해제된 복사본은 지워짐
+    assert [_count(version.chroma_path) for version in published] == published_counts
+    assert [os.path.exists(fork.path) for fork in forks] == [False, False, True, True]
+    reloader.close()
+    assert not any(os.path.exists(fork.path) for fork in forks)
+
+
+def test_title_similarity_index_matches_full_scan():
+    titles = ['김치찌개', '김치 찌개', '돼지고기 김치찌개', '', '', '된장찌개', '된장 찌개 ', '계란말이', '계란 말이',
+              '참치김치찌개', 'a', 'ab', '스팸 김치볶음밥', '김치볶음밥']
+    index, kept_fast, kept_full = TitleSimilarityIndex(0.8), [], []
+    for title in titles:
+        if not index.is_duplicate(title):
+            index.add(title)
+            kept_fast.append(title)
+        if not any(similarity(title, other) > 0.8 for other in kept_full):
+            kept_full.append(title)
+    assert kept_fast == kept_full
+
+
+def test_title_index_can_be_read_while_streaming_adds_titles():
+    docstore = InMemoryStore()
+    register_parent_docs(docstore, [Document(page_content="", metadata={'title': f'기본 요리 {i}'}) for i in range(50)])
+    index = TitleIndex.from_docstore(docstore)
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(300):
+                index.lookup('기본 요리 7 레시피')
+                index.complete('추가')
+        except Exception as e:  # 순회 중 크기가 바뀌면 RuntimeError
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(3000):
+        index.add(f'new-{i}', f'추가 요리 {i}')
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(index.complete('추가 요리', limit=5)) == 5
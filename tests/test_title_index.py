@@ -0,0 +1,41 @@
+# tests/test_title_index.py
+import pytest
+
+from modules.title_index import TitleIndex, normalize_question, normalize_title
+
+
+@pytest.fixture
+def index():
+    index = TitleIndex()
+    for doc_id, title in [('d1', '백종원 김치찌개 (초간단)'), ('d2', '제육볶음#밥도둑'), ('d3', '된장찌개')]:
+        index.add(doc_id, title)
+    return index
+
+
+@pytest.mark.parametrize('question, doc_id', [
+    ('김치찌개 레시피', 'd1'),
+    ('백종원 김치찌개 만드는 법 알려줘', 'd1'),
+    ('김치 찌개 만드는법 좀 알려주세요!', 'd1'),
+    ('제육볶음 레시피?', 'd2'),
+    ('된장찌개', 'd3'),
+])
+def test_dish_name_questions_take_the_fast_path(index, question, doc_id):
+    assert index.lookup(question).doc_id == doc_id
+
+
+@pytest.mark.parametrize('question', [
+    '김치찌개 (돼지고기 없이) 만드는 법',
+    '김치찌개 #칼로리 얼마야',
+    '김치찌개 레시피 알려줘~ 근데 몇 인분이야?',
+    '김치찌개 [비건] 레시피',
+    '김치찌개랑 된장찌개 차이',
+    '된장찌개 맵게 만드는 법',
+])
+def test_questions_with_extra_conditions_are_not_answered_from_the_title(index, question):
+    assert index.lookup(question) is None
+
+
+def test_question_normalizer_keeps_what_title_cleaning_drops():
+    # 제목 정리는 '#' 뒤와 괄호 안을 버리지만, 질문은 그 내용까지 남겨 비교
+    assert normalize_title('김치찌개 (돼지고기 없이) #칼로리') == '김치찌개'
+    assert normalize_question('김치찌개 (돼지고기 없이) #칼로리') == '김치찌개돼지고기없이칼로리'
@@ -0,0 +1,64 @@
+# tests/test_utils_docstore.py
+from langchain.docstore.document import Document
+
+from modules.utils_docstore import ChunkDeduplicator, dedup_child_chunks, quantities, simhash
+
+# 실제 청크 길이(수백 자)의 조리 과정. {sugar}만 바꿔 수량만 다른 청크를 만듦
+CHUNK = ("만드는 법: 1. 냄비에 물 500ml를 붓고 멸치와 다시마를 넣어 10분 끓여 육수를 냅니다. "
+         "2. 애호박, 두부, 양파를 한입 크기로 썹니다. 3. 육수에 된장 2큰술을 풀고 {sugar} 넣은 뒤 채소를 넣어 "
+         "5분 더 끓입니다. 4. 대파와 청양고추를 넣고 한소끔 끓이면 완성입니다. 5. 기호에 따라 고춧가루를 약간 "
+         "넣어도 좋습니다. 6. 밥과 함께 뜨겁게 내면 됩니다. 된장은 집된장과 시판 된장을 섞으면 맛이 깊어집니다.")
+
+
+def _hamming(a, b):
+    return bin(simhash(a) ^ simhash(b)).count('1')
+
+
+def test_exact_and_near_duplicates_are_merged():
+    text = CHUNK.format(sugar="설탕 1큰술")
+    deduplicator = ChunkDeduplicator(max_hamming=3)
+    assert deduplicator.add(text, "a") is None
+    assert deduplicator.add("  " + text.replace(" ", "\n", 3), "b") == 0  # 공백만 다름 → 완전 일치
+    near = text.replace("완성입니다.", "완성입니다!")  # 문장 부호 하나만 다름
+    assert 0 < _hamming(text, near) <= 3
+    assert deduplicator.add(near, "c") == 0
+    assert deduplicator.add(text, "a") == 0  # 같은 부모는 alt_doc_ids에 다시 넣지 않음
+    assert deduplicator.doc_ids == ["a"] and deduplicator.alt_doc_ids == [["b", "c"]]
+    assert deduplicator.stats['exact'] == 2 and deduplicator.stats['near'] == 1
+
+
+def test_chunks_that_differ_only_in_quantities_are_not_merged():
+    deduplicator = ChunkDeduplicator(max_hamming=3)
+    first = CHUNK.format(sugar="설탕 1큰술")
+    assert deduplicator.add(first, "a") is None
+    merged_by_simhash_alone = 0
+    for sugar in ("설탕 3큰술", "설탕 10큰술", "설탕 1작은술", "설탕 2컵"):
+        other = CHUNK.format(sugar=sugar)
+        merged_by_simhash_alone += _hamming(first, other) <= 3
+        assert quantities(other) != quantities(first)
+        assert deduplicator.find(other) is None
+        assert deduplicator.add(other, sugar) is None
+    # SimHash 거리만으로는 합쳐졌을 청크가 있어야 이 검사가 의미 있음
+    assert merged_by_simhash_alone > 0
+    assert len(deduplicator.doc_ids) == 5 and deduplicator.stats['near'] == 0
+
+
+def test_find_does_not_register_and_merge_false_only_registers():
+    text = CHUNK.format(sugar="설탕 1큰술")
+    deduplicator = ChunkDeduplicator()
+    assert deduplicator.add(text, "a", alt_doc_ids=["", "x"], merge=False) is None
+    assert deduplicator.add(text, "b", merge=False) is None  # 이미 저장된 중복 청크도 그대로 등록
+    assert deduplicator.find(text) == 0
+    assert deduplicator.doc_ids == ["a", "b"] and deduplicator.alt_doc_ids == [["x"], []]
+    deduplicator.link(0, "c")
+    deduplicator.link(0, "c")
+    assert deduplicator.alt_doc_ids[0] == ["x", "c"]
+
+
+def test_dedup_child_chunks_links_merged_parents():
+    children = [Document(page_content=CHUNK.format(sugar=sugar), metadata={"doc_id": doc_id})
+                for doc_id, sugar in (("a", "설탕 1큰술"), ("b", "설탕 1큰술"), ("c", "설탕 3큰술"), ("d", "설탕 1큰술"))]
+    kept, stats = dedup_child_chunks(children, max_hamming=3)
+    assert [child.metadata["doc_id"] for child in kept] == ["a", "c"]
+    assert kept[0].metadata["alt_doc_ids"] == "b,d" and "alt_doc_ids" not in kept[1].metadata
+    assert stats['exact'] == 2 and stats['text_bytes'] == 2 * len(children[1].page_content.encode('utf-8'))
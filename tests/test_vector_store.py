@@ -0,0 +1,79 @@
+# tests/test_vector_store.py
+import os
+
+import pytest
+from langchain.docstore.document import Document
+from langchain.storage import InMemoryStore
+from langchain_chroma import Chroma
+
+from modules import config
+from modules.utils_docstore import make_child_chunks, register_parent_docs
+from modules.vector_store import SLIM_METADATA_KEYS, SLIM_METADATA_MARKER, VectorStoreManager
+
+STEPS = " ".join(f"{n}. 냄비에 물을 붓고 재료를 넣어 {n}분 동안 끓입니다." for n in range(1, 30))
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # 임베딩 API는 호출하지 않지만 모델 객체를 만들 때 키가 필요함
+    monkeypatch.setattr(config, "UPSTAGE_API_KEY", "unused")
+    return VectorStoreManager(persist_directory=str(tmp_path / "chroma"))
+
+
+def _parents():
+    return [Document(page_content=f"요리 제목: {title}\n필요한 재료: 양파\n만드는 법: {STEPS}",
+                     metadata={'id': str(i), 'title': title, 'ingredients': '양파', 'url': f'https://example.com/{i}'})
+            for i, title in enumerate(["양파국", "양파볶음"])]
+
+
+def test_child_chunks_keep_only_the_parent_id_and_position():
+    parents = _parents()
+    register_parent_docs(InMemoryStore(), parents)
+    children = make_child_chunks(parents, chunk_size=200, chunk_overlap=30)
+    assert len(children) > len(parents)
+    for child in children:
+        assert set(child.metadata) <= SLIM_METADATA_KEYS
+        parent = next(p for p in parents if p.metadata['doc_id'] == child.metadata['doc_id'])
+        start, end = child.metadata['start'], child.metadata['end']
+        assert parent.page_content[start:end] == child.page_content
+    first_doc_id = parents[0].metadata['doc_id']
+    first = [child.metadata['chunk_index'] for child in children if child.metadata['doc_id'] == first_doc_id]
+    assert first == list(range(len(first)))
+
+
+def test_migrate_chunk_metadata_slims_old_databases_once(manager):
+    parents = _parents()
+    docstore = InMemoryStore()
+    register_parent_docs(docstore, parents)
+    children = make_child_chunks(parents, chunk_size=200, chunk_overlap=30)
+    # 예전 방식: 청크마다 부모의 제목/재료/URL을 복사해 저장
+    by_doc_id = {parent.metadata['doc_id']: parent for parent in parents}
+    old_metadatas = [dict(by_doc_id[child.metadata['doc_id']].metadata) for child in children]
+    old_metadatas[0]['alt_doc_ids'] = parents[1].metadata['doc_id']
+    vectorstore = Chroma(persist_directory=manager.persist_directory)
+    vectorstore._collection.add(ids=[f"chunk-{i}" for i in range(len(children))],
+                                embeddings=[[float(i), 1.0] for i in range(len(children))],
+                                documents=[child.page_content for child in children], metadatas=old_metadatas)
+    vectorstore._client.close()
+    assert not manager.has_slim_metadata()
+
+    assert manager.migrate_chunk_metadata(docstore) is True
+    assert manager.has_slim_metadata()
+    assert os.path.exists(os.path.join(manager.persist_directory, SLIM_METADATA_MARKER))
+
+    vectorstore = Chroma(persist_directory=manager.persist_directory)
+    stored = vectorstore._collection.get(ids=[f"chunk-{i}" for i in range(len(children))],
+                                         include=["metadatas", "embeddings"])
+    vectorstore._client.close()
+    by_id = dict(zip(stored["ids"], stored["metadatas"]))
+    for i, child in enumerate(children):
+        md = by_id[f"chunk-{i}"]
+        assert set(md) <= SLIM_METADATA_KEYS
+        # 위치는 부모 본문 기준으로 다시 계산되고, 합쳐진 부모(alt_doc_ids)는 남음
+        expected = {key: child.metadata[key] for key in ('doc_id', 'chunk_index', 'start', 'end')}
+        assert {key: md[key] for key in expected} == expected
+    assert by_id["chunk-0"]["alt_doc_ids"] == parents[1].metadata['doc_id']
+    assert [list(vector) for vector in stored["embeddings"][:2]] == [[0.0, 1.0], [1.0, 1.0]]
+
+    # 표시 파일이 있으면 다시 변환하지 않음
+    assert manager.migrate_chunk_metadata(docstore) is False